@@ -1,31 +1,152 @@
+import argparse
+
 import pandas as pd
 
-# Load the dataset
-dataset_path = "agentic_ai_performance_dataset_20250622.csv"
-data = pd.read_csv(dataset_path)
+import metrics
+import schema
+import storage
+from parallel import map_rows
+from stats import QuantileSketch, describe, merge_summaries, save_summary, summarize
+from storage import load_dataset, save_stage
+
+# Key metrics compared to find the weakest capability of each agent
+KEY_METRICS = ['success_rate', 'accuracy_score', 'efficiency_score']
 
-# Display basic information about the dataset
-print("Dataset Info:")
-data.info()
 
-# Display the first few rows of the dataset
-print("\nFirst 5 Rows:")
-print(data.head())
+# Identify the weakest capability for each agent based on key metrics
+def weakest_metric(data):
+    return data[KEY_METRICS].idxmin(axis=1)
 
-# Check for missing values
-print("\nMissing Values:")
-print(data.isnull().sum())
 
-# Summary statistics
-print("\nSummary Statistics:")
-print(data.describe())
+def analyze(data, workers=1):
+    # Display basic information about the dataset
+    print("Dataset Info:")
+    data.info()
 
-# Identify the weakest capability for each agent based on key metrics
-key_metrics = ['success_rate', 'accuracy_score', 'efficiency_score']
-data['weakest_metric'] = data[key_metrics].idxmin(axis=1)
-print("\nWeakest Metric for Each Agent:")
-print(data[['agent_id', 'weakest_metric']].head())
-
-# Save the processed dataset with weakest_metric column
-data.to_csv("processed_dataset.csv", index=False)
-print("\nProcessed dataset saved as processed_dataset.csv")
\ No newline at end of file
+    # Display the first few rows of the dataset
+    print("\nFirst 5 Rows:")
+    print(data.head())
+
+    # Check for missing values
+    print("\nMissing Values:")
+    print(data.isnull().sum())
+
+    # Summary statistics
+    print("\nSummary Statistics:")
+    with metrics.span('analyze_dataset.describe'):
+        print(data.describe())
+
+    # Keep mergeable summary statistics so ingestion can update them incrementally
+    with metrics.span('analyze_dataset.summary'):
+        save_summary(summarize(data))
+
+    # Identify the weakest capability for each agent based on key metrics
+    with metrics.span('analyze_dataset.weakest_metric'):
+        data['weakest_metric'] = map_rows(weakest_metric, data[KEY_METRICS], workers)
+    print("\nWeakest Metric for Each Agent:")
+    print(data[['agent_id', 'weakest_metric']].head())
+
+    # Save the weakest_metric column, keyed by agent_id and timestamp
+    with metrics.span('analyze_dataset.save'):
+        path = save_stage('processed', data, ['weakest_metric'])
+    print(f"\nProcessed columns saved to {path}")
+
+
+# Count, mean, earliest and latest of timestamps seen chunk by chunk. The mean
+# is kept as an exact total of nanoseconds, which overflows int64 after a few
+# timestamps, so chunks are summed in high and low 32-bit halves.
+class TimestampStats:
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.minimum = self.maximum = pd.NaT
+
+    def update(self, values):
+        values = values.dropna()
+        if not len(values):
+            return
+        self.count += len(values)
+        nanoseconds = values.astype('int64').to_numpy()
+        self.total += int((nanoseconds >> 32).sum()) * (1 << 32) + int((nanoseconds & 0xFFFFFFFF).sum())
+        self.minimum = values.min() if self.minimum is pd.NaT else min(self.minimum, values.min())
+        self.maximum = values.max() if self.maximum is pd.NaT else max(self.maximum, values.max())
+
+    def describe(self):
+        mean = pd.Timestamp(self.total // self.count) if self.count else pd.NaT
+        return pd.Series({'count': self.count, 'mean': mean, 'min': self.minimum, 'max': self.maximum})
+
+
+# Same report and outputs as analyze(), computed one chunk of the CSV at a
+# time so memory stays bounded by the chunk size. Counts, means, deviations
+# and extremes match the in-memory run up to float rounding; quartiles come
+# from a QuantileSketch and are approximate (see stats.py for the error), and
+# none are given for timestamps.
+def analyze_in_chunks(source, chunksize):
+    rows, head, nulls, summary, sketches = 0, None, None, {}, {}
+    timestamps = TimestampStats()
+    for number, chunk in enumerate(schema.read_csv(source, chunksize=chunksize)):
+        span = metrics.span('analyze_dataset.chunk')
+        chunk = chunk.reset_index(drop=True)
+        rows += len(chunk)
+        head = chunk.head() if head is None else head
+        nulls = chunk.isnull().sum() if nulls is None else nulls + chunk.isnull().sum()
+        timestamps.update(chunk['timestamp'])
+        chunk_summary = summarize(chunk)
+        summary = merge_summaries(summary, chunk_summary)
+        for column in chunk_summary:
+            sketches.setdefault(column, QuantileSketch()).update(chunk[column].to_numpy(dtype=float, na_value=float('nan')))
+
+        # Each chunk becomes a part of the columnar dataset and of the stage output
+        chunk['weakest_metric'] = weakest_metric(chunk)
+        if number == 0:
+            storage.write_dataset(chunk[list(schema.SCHEMA)], source)
+            path = save_stage('processed', chunk, ['weakest_metric'])
+        else:
+            storage.append_dataset(chunk[list(schema.SCHEMA)], source)
+            storage.append_stage('processed', chunk, ['weakest_metric'])
+        span.end()
+        metrics.increment('rows_processed_total', len(chunk), stage='analyze')
+    if head is None:
+        raise ValueError(f"{source} has no rows")
+
+    print("Dataset Info:")
+    print(f"{rows} entries, {len(head.columns)} columns")
+    print(pd.DataFrame({'Non-Null Count': rows - nulls, 'Dtype': head.dtypes.astype(str)}))
+
+    print("\nFirst 5 Rows:")
+    print(head)
+
+    print("\nMissing Values:")
+    print(nulls)
+
+    print("\nSummary Statistics (quartiles approximate):")
+    table = describe(summary, sketches)
+    table['timestamp'] = timestamps.describe()
+    print(table[[column for column in head.columns if column in table]])
+
+    save_summary(summary)
+
+    print("\nWeakest Metric for Each Agent:")
+    print(head.assign(weakest_metric=weakest_metric(head))[['agent_id', 'weakest_metric']])
+
+    print(f"\nProcessed columns saved to {path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyze the agent performance dataset")
+    parser.add_argument("--chunksize", type=int,
+                        help="stream the CSV in chunks of this many rows instead of loading it whole "
+                             "(quartiles are then approximate, and not given for timestamps)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="worker processes computing the weakest metric (in-memory mode)")
+    args = parser.parse_args()
+    metrics.profile_script('analyze_dataset')
+
+    if args.chunksize:
+        analyze_in_chunks(storage.SOURCE_PATH, args.chunksize)
+    else:
+        # Load the dataset (from its columnar cache, converted from the CSV on first use)
+        with metrics.span('analyze_dataset.load'):
+            data = load_dataset()
+        analyze(data, args.workers)
+        metrics.increment('rows_processed_total', len(data), stage='analyze')
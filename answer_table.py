@@ -0,0 +1,135 @@
+import argparse
+import gzip
+import hashlib
+import itertools
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+import metrics
+import similarity
+import storage
+from gap_analysis import (AGENT_FIELDS, MIN_SIMILARITY, agent_records, agents_context, has_similar_agents,
+                          recommendation_summary, recommendation_text)
+
+# Gzipped JSON: the answers repeat the same field texts, which compress about 10x
+ANSWERS_PATH = os.path.join(storage.CACHE_DIR, "answers.json.gz")
+
+QUERY_COLUMNS = ['task_complexity', 'autonomy_level', 'task_category']
+
+# Agents per answer
+K = 5
+
+# Bump when the layout of an answer changes, so stored tables are rebuilt
+FORMAT_VERSION = 1
+
+
+# Lookup key of a sidebar query
+def answer_key(query):
+    return f"{int(query['task_complexity'])}|{int(query['autonomy_level'])}|{query['task_category']}"
+
+
+# Content hash of everything an answer depends on: the columns the ranking
+# reads and the answers show, in row order, plus the scoring parameters
+def dataset_fingerprint(data, k=K):
+    sha256 = hashlib.sha256()
+    sha256.update(json.dumps({
+        'format': FORMAT_VERSION,
+        'k': k,
+        'weights': [similarity.COMPLEXITY_WEIGHT, similarity.AUTONOMY_WEIGHT, similarity.CATEGORY_BONUS],
+        'min_similarity': MIN_SIMILARITY,
+    }).encode('utf-8'))
+    columns = list(dict.fromkeys(QUERY_COLUMNS + AGENT_FIELDS))
+    sha256.update(pd.util.hash_pandas_object(data[columns], index=False).to_numpy().tobytes())
+    return sha256.hexdigest()
+
+
+# Every query the sidebar can produce: the product of the dataset's values
+def reachable_queries(data):
+    values = [sorted(data[column].unique().tolist()) for column in QUERY_COLUMNS]
+    return [dict(zip(QUERY_COLUMNS, combination)) for combination in itertools.product(*values)]
+
+
+# The recommendation message and summary shown by "Get Recommendations", and
+# the agent context given to the chat, from records of AGENT_FIELDS
+def _answer(records):
+    return {
+        'text': recommendation_text(records),
+        'summary': recommendation_summary(records),
+        'context': agents_context(records),
+    }
+
+
+# Answer for one query's top-k agents (None if none is similar), for queries
+# outside the table
+def answer_from_agents(similar_agents):
+    return _answer(agent_records(similar_agents)) if has_similar_agents(similar_agents) else None
+
+
+# Answers for every reachable query; queries without similar agents map to
+# None. The bucket index ranks like a scan of every row, but only reads the
+# buckets it needs, so a query costs little however many rows there are.
+def build(data, k=K, index=None):
+    index = index if index is not None else similarity.BucketIndex(data)
+    queries = reachable_queries(data)
+    ranked = [index.top_k(query, k) for query in queries]
+    records = agent_records(data.iloc[np.concatenate([positions for positions, _ in ranked])]) if ranked else []
+    answers, start = {}, 0
+    for query, (positions, scores) in zip(queries, ranked):
+        stop = start + len(positions)
+        if not len(scores) or scores.max() <= MIN_SIMILARITY:
+            answers[answer_key(query)] = None
+        else:
+            answers[answer_key(query)] = _answer(records[start:stop])
+        start = stop
+    return answers
+
+
+def save(answers, fingerprint, path=ANSWERS_PATH):
+    with storage.atomic_write(path) as tmp_path, gzip.open(tmp_path, 'wt', encoding='utf-8') as file:
+        json.dump({'fingerprint': fingerprint, 'answers': answers}, file, ensure_ascii=False, separators=(',', ':'))
+
+
+# The stored table, or None if it is missing or unreadable
+def load(path=ANSWERS_PATH):
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, EOFError, ValueError):
+        return None
+
+
+# Answers for the given dataset, rebuilt and stored only if the stored
+# table was built from a different dataset (or none exists). A bucket index
+# of the data, if the caller has one, saves building another.
+def ensure(data, path=ANSWERS_PATH, force=False, index=None):
+    fingerprint = dataset_fingerprint(data)
+    table = None if force else load(path)
+    if table is not None and table['fingerprint'] == fingerprint:
+        metrics.increment('answer_table_total', result='current')
+        return table['answers']
+    metrics.increment('answer_table_total', result='rebuilt')
+    with metrics.span('answer_table.build'):
+        answers = build(data, index=index)
+    save(answers, fingerprint, path)
+    return answers
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute recommendations for every sidebar preference combination")
+    parser.add_argument("--source", default=storage.SOURCE_PATH, help="dataset CSV")
+    parser.add_argument("--force", action="store_true", help="rebuild even if the dataset is unchanged")
+    args = parser.parse_args()
+
+    columns = list(dict.fromkeys(QUERY_COLUMNS + AGENT_FIELDS))
+    data = storage.load_dataset(columns=columns, source=args.source)
+    stored = load()
+    rebuilt = args.force or stored is None or stored['fingerprint'] != dataset_fingerprint(data)
+    start = time.perf_counter()
+    answers = ensure(data, force=args.force)
+    seconds = time.perf_counter() - start
+    print(f"{len(answers)} preference combinations, {'rebuilt' if rebuilt else 'up to date'} in {seconds:.2f} s "
+          f"({os.path.getsize(ANSWERS_PATH) / 1024:.0f} KB at {ANSWERS_PATH})")
@@ -0,0 +1,134 @@
+import copy
+import threading
+
+import pandas as pd
+import streamlit as st
+
+import answer_table
+import metrics
+import schema
+import storage
+import trends
+from neighbors import PROFILE_COLUMNS, ProfileIndex
+from similarity import BucketIndex
+
+DATASET_PATH = "agentic_ai_performance_dataset_20250622.csv"
+
+# Columns offered as sidebar choices
+PREFERENCE_COLUMNS = ['task_complexity', 'autonomy_level', 'task_category']
+
+
+# Dataset and similarity index shared by every session of the server process
+class _SharedDataset:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.mtime = None
+        self.parts = 0
+        self.data = None
+        self.index = None
+        self.answers = None
+        self.answers_version = None
+        self.trends = None
+        self.trends_version = None
+        self.profiles = None
+        self.profiles_mtime = None
+
+
+@st.cache_resource(show_spinner=False)
+def _shared_dataset(path):
+    return _SharedDataset()
+
+
+# Bring the shared dataset up to date. A newer CSV reloads everything; parts
+# appended by ingestion are read alone and added to a copy of the index.
+# The shared DataFrame and index are replaced together, never mutated, so
+# sessions holding the previous pair keep a consistent view of it.
+def _refresh(shared, path):
+    mtime = storage.source_mtime(path)
+    with shared.lock:
+        if shared.mtime != mtime:
+            metrics.increment('dataset_refresh_total', result='reload')
+            with metrics.span('app_data.reload'):
+                parts = storage.table_parts(storage.convert(path))
+                shared.data = storage.read_parts([part['path'] for part in parts])
+                shared.index = BucketIndex(shared.data)
+                shared.mtime, shared.parts = mtime, len(parts)
+        else:
+            parts = storage.table_parts(storage.dataset_path(path))
+            if len(parts) > shared.parts:
+                metrics.increment('dataset_refresh_total', result='append')
+                with metrics.span('app_data.append'):
+                    delta = storage.read_parts([part['path'] for part in parts[shared.parts:]])
+                    index = shared.index.copy()
+                    index.extend(delta)
+                    shared.data = schema.apply_schema(pd.concat([shared.data, delta], ignore_index=True))
+                    shared.index = index
+                    shared.parts = len(parts)
+            else:
+                metrics.increment('dataset_refresh_total', result='current')
+        return shared.data, shared.index, (shared.mtime, shared.parts)
+
+
+# Sorted sidebar choices and default positions of the sidebar's sliders and
+# profile inputs for one dataset version
+@st.cache_data(max_entries=1, show_spinner=False)
+def _load_vocabularies(path, version):
+    data, _ = load_dataset(path)
+    vocabularies = {column: sorted(data[column].unique().tolist()) for column in PREFERENCE_COLUMNS}
+    medians = {column: data[column].astype(float).median() for column in PROFILE_COLUMNS}
+    return vocabularies, medians
+
+
+# Load the dataset and its similarity index (raises FileNotFoundError if missing)
+def load_dataset(path=DATASET_PATH):
+    data, index, _ = _refresh(_shared_dataset(path), path)
+    return data, index
+
+
+# Precomputed recommendations for every sidebar combination, shared like the
+# dataset. The stored table is reused while the dataset fingerprint matches;
+# otherwise it is rebuilt once for the new dataset version.
+def load_answers(path=DATASET_PATH):
+    shared = _shared_dataset(path)
+    data, index, version = _refresh(shared, path)
+    with shared.lock:
+        if shared.answers_version != version:
+            shared.answers = answer_table.ensure(data, index=index)
+            shared.answers_version = version
+        return shared.answers
+
+
+# Time-windowed trend aggregates, shared like the dataset and brought up to
+# date with the parts appended since they were last stored
+def load_trends(path=DATASET_PATH):
+    shared = _shared_dataset(path)
+    _, _, version = _refresh(shared, path)
+    with shared.lock:
+        if shared.trends_version != version:
+            shared.trends = trends.refresh(path)
+            shared.trends_version = version
+        return shared.trends
+
+
+# The dataset and the k-NN index of its agents' numeric profiles, shared like
+# the dataset. The index is rebuilt when the dataset is reloaded; appended
+# rows extend a copy, which replaces it.
+def load_profile_index(path=DATASET_PATH):
+    shared = _shared_dataset(path)
+    data, _, (mtime, _) = _refresh(shared, path)
+    with shared.lock:
+        if shared.profiles_mtime != mtime:
+            with metrics.span('app_data.profile_index'):
+                shared.profiles = ProfileIndex(data)
+            shared.profiles_mtime = mtime
+        elif len(shared.profiles) < len(data):
+            profiles = copy.copy(shared.profiles)
+            profiles.extend(data.iloc[len(profiles):])
+            shared.profiles = profiles
+        return data, shared.profiles
+
+
+# Load the categorical vocabularies and medians used by the sidebar controls
+def load_vocabularies(path=DATASET_PATH):
+    _, _, version = _refresh(_shared_dataset(path), path)
+    return _load_vocabularies(path, version)
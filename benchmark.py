@@ -0,0 +1,128 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import resource
+import subprocess
+import tempfile
+import time
+
+import numpy as np
+
+import storage
+import synthetic
+from analyze_dataset import weakest_metric
+from recommendation_model import recommend
+from similarity import BucketIndex, encode_agents, top_k_batch
+
+# Time and memory of each processing step on synthetic datasets of several
+# sizes, written as JSON so runs on different commits can be compared.
+parser = argparse.ArgumentParser(description="Benchmark the processing steps on synthetic datasets")
+parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000],
+                    help="dataset sizes in rows (10^7 and more need several GB of memory and disk)")
+parser.add_argument("--seed", type=int, default=0)
+parser.add_argument("--queries", type=int, default=100, help="top-k similarity queries per size")
+parser.add_argument("--repeat", type=int, default=1, help="report the best of this many runs of each step")
+parser.add_argument("--workdir", help="directory for the generated files (default: a temporary directory)")
+parser.add_argument("--output", help="JSON file to write (default: cache/benchmarks/<commit>.json)")
+parser.add_argument("--compare", help="earlier JSON results to compare with")
+args = parser.parse_args()
+
+
+def _memory_mb(field):
+    # Current (VmRSS) or peak (VmHWM) resident memory of this process
+    try:
+        with open('/proc/self/status', encoding='utf-8') as status:
+            for line in status:
+                if line.startswith(field):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _reset_peak():
+    # Linux resets VmHWM to the current RSS; elsewhere the peak covers the whole run
+    try:
+        with open('/proc/self/clear_refs', 'w', encoding='utf-8') as clear_refs:
+            clear_refs.write('5')
+    except OSError:
+        pass
+
+
+def measure(rows, step, run):
+    timings, added = [], []
+    for _ in range(args.repeat):
+        gc.collect()
+        before = _memory_mb('VmRSS')
+        _reset_peak()
+        start = time.perf_counter()
+        result = run()
+        timings.append(time.perf_counter() - start)
+        added.append(max(0.0, _memory_mb('VmHWM') - before))
+    results.append({'rows': rows, 'step': step, 'seconds': min(timings), 'peak_mb': max(added)})
+    print(f"{rows:>12} {step:<16} {min(timings) * 1000:>10.1f} ms {max(added):>9.1f} MB", flush=True)
+    return result
+
+
+def commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+results = []
+profile = synthetic.load_profile()
+print(f"{'Rows':>12} {'Step':<16} {'Time':>13} {'Peak memory':>12}")
+with tempfile.TemporaryDirectory(dir=args.workdir) as workdir:
+    storage.CACHE_DIR = os.path.join(workdir, "cache")
+    for rows in args.sizes:
+        source = os.path.join(workdir, f"synthetic_{rows}.csv")
+        measure(rows, 'generate', lambda: synthetic.write_csv(source, rows, args.seed, profile))
+        measure(rows, 'convert', lambda: storage.convert(source, force=True))
+        data = measure(rows, 'load', lambda: storage.load_dataset(source=source))
+        data['weakest_metric'] = measure(rows, 'weakest_metric', lambda: weakest_metric(data))
+        data['recommendations'] = measure(rows, 'recommend', lambda: recommend(data))
+        # The statistics evaluate_model.py reports
+        measure(rows, 'evaluate', lambda: data['weakest_metric'].value_counts(normalize=True))
+
+        queries = data.sample(min(args.queries, rows), random_state=args.seed)[
+            ['task_complexity', 'autonomy_level', 'task_category']].to_dict(orient='records')
+        measure(rows, 'top_k_batch', lambda: top_k_batch(encode_agents(data), queries, 5))
+        index = measure(rows, 'index_build', lambda: BucketIndex(data))
+        measure(rows, 'top_k_index', lambda: [index.top_k(query, 5) for query in queries])
+
+        del data, index
+        for path in [source, storage.dataset_path(source), storage.manifest_path(storage.dataset_path(source))]:
+            os.remove(path)
+
+report = {
+    'commit': commit(),
+    'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    'python': platform.python_version(),
+    'numpy': np.__version__,
+    'platform': platform.platform(),
+    'cpus': os.cpu_count(),
+    'seed': args.seed,
+    'queries': args.queries,
+    'results': results,
+}
+output = args.output or os.path.join("cache", "benchmarks", f"{report['commit']}.json")
+os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+with open(output, 'w', encoding='utf-8') as file:
+    json.dump(report, file, indent=2)
+print(f"Results written to {output}")
+
+if args.compare:
+    with open(args.compare, encoding='utf-8') as file:
+        baseline = json.load(file)
+    earlier = {(result['rows'], result['step']): result for result in baseline['results']}
+    print(f"\nCompared with {baseline['commit']} (time ratio > 1 is slower)")
+    for result in results:
+        before = earlier.get((result['rows'], result['step']))
+        if before:
+            print(f"{result['rows']:>12} {result['step']:<16} {result['seconds'] / before['seconds']:>7.2f}x time"
+                  f" {result['peak_mb'] - before['peak_mb']:>+9.1f} MB")
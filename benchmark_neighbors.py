@@ -0,0 +1,52 @@
+import argparse
+import time
+
+import numpy as np
+
+import synthetic
+from neighbors import ProfileIndex, recall
+
+# Recall and latency of approximate profile search against the exact scan,
+# on synthetic datasets of several sizes. Queries are sampled agents, each
+# excluded from its own results as in "find agents like this one". Synthetic
+# rows are bootstrapped from the 5,000-row export, so they are jittered more
+# than by default; otherwise every query's neighbours are near-copies of it.
+parser = argparse.ArgumentParser(description="Benchmark exact and approximate profile search")
+parser.add_argument("--sizes", type=int, nargs="+", default=[1_000_000, 2_000_000])
+parser.add_argument("--seed", type=int, default=0)
+parser.add_argument("--queries", type=int, default=200)
+parser.add_argument("--jitter", type=float, default=0.5, help="noise of float columns, as a fraction of their std")
+parser.add_argument("-k", type=int, default=10)
+parser.add_argument("--probes", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64],
+                    help="probed list counts to measure besides the tuned one")
+args = parser.parse_args()
+
+profile = synthetic.load_profile()
+print(f"{'Rows':>10} {'Search':<14} {'Recall@' + str(args.k):>9} {'ms/query':>9} {'Rows scanned':>13}")
+for rows in args.sizes:
+    data = synthetic.generate(rows, args.seed, profile, args.jitter)
+    start = time.perf_counter()
+    index = ProfileIndex(data, seed=args.seed)
+    print(f"{rows:>10} {'build':<14} {'':>9} {'':>9} {'':>13}  {time.perf_counter() - start:.1f} s, "
+          f"{len(index.centroids)} lists, tuned to {index.probes} probes")
+
+    sample = np.random.default_rng(args.seed).choice(rows, args.queries, replace=False)
+    queries = index.vectors[index._internal(sample)]
+
+    start = time.perf_counter()
+    truth, _ = index.search(queries, args.k, exact=True, exclude=sample)
+    seconds = time.perf_counter() - start
+    print(f"{rows:>10} {'exact':<14} {1:>9.3f} {seconds / args.queries * 1000:>9.2f} {rows:>13}")
+
+    for probes in sorted(set(args.probes + [index.probes])):
+        if probes > len(index.centroids):
+            continue
+        start = time.perf_counter()
+        found, _ = index.search(queries, args.k, probes=probes, exclude=sample)
+        seconds = time.perf_counter() - start
+        label = f"ivf {probes}" + (" (tuned)" if probes == index.probes else "")
+        # Lists hold rows / lists rows on average
+        scanned = rows * probes // len(index.centroids)
+        print(f"{rows:>10} {label:<14} {recall(found, truth):>9.3f} {seconds / args.queries * 1000:>9.2f} "
+              f"{'~' + str(scanned):>13}")
+    del data, index
@@ -0,0 +1,66 @@
+import argparse
+import os
+import time
+from functools import partial
+
+import pandas as pd
+
+import storage
+from analyze_dataset import KEY_METRICS, weakest_metric
+from parallel import map_rows, top_k_batch_parallel
+from recommendation_model import recommend
+from similarity import encode_agents, top_k_batch
+
+# Time the sharded stages with 1 to N worker processes and check that every
+# run gives the serial result. --scale replicates the dataset rows to
+# simulate larger exports.
+parser = argparse.ArgumentParser(description="Benchmark multi-core execution of the processing stages")
+parser.add_argument("--source", default=storage.SOURCE_PATH)
+parser.add_argument("--scale", type=int, default=100, help="replicate the dataset rows this many times")
+parser.add_argument("--workers", type=int, default=os.cpu_count(), help="largest worker count to try")
+parser.add_argument("--queries", type=int, default=200, help="similarity queries per run")
+parser.add_argument("--repeat", type=int, default=3, help="report the best of this many runs")
+args = parser.parse_args()
+
+
+def best_time(run):
+    timings = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        result = run()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+data = storage.load_dataset(source=args.source)
+data['weakest_metric'] = weakest_metric(data)
+data = pd.concat([data] * args.scale, ignore_index=True)
+encoded = encode_agents(data)
+queries = data.sample(min(args.queries, len(data)), random_state=0)[['task_complexity', 'autonomy_level', 'task_category']]
+
+expected = {
+    'weakest metric': weakest_metric(data[KEY_METRICS]),
+    'recommendations': recommend(data),
+    'similarity top-5': top_k_batch(encoded, queries, 5),
+}
+stages = {
+    'weakest metric': lambda workers: map_rows(weakest_metric, data[KEY_METRICS], workers),
+    'recommendations': lambda workers: map_rows(partial(recommend), data, workers),
+    'similarity top-5': lambda workers: top_k_batch_parallel(encoded, queries, 5, workers),
+}
+
+
+def same(result, serial):
+    if isinstance(serial, tuple):
+        return all((part == serial_part).all() for part, serial_part in zip(result, serial))
+    return bool((pd.Series(result) == pd.Series(serial)).all())
+
+
+print(f"Rows: {len(data)}, CPUs: {os.cpu_count()}")
+print(f"{'Stage':<18} {'Workers':>7} {'Time':>10} {'Speedup':>8}  Identical")
+for name, run in stages.items():
+    baseline = None
+    for workers in range(1, max(1, args.workers) + 1):
+        seconds, result = best_time(lambda: run(workers))
+        baseline = baseline or seconds
+        print(f"{name:<18} {workers:>7} {seconds * 1000:>7.1f} ms {baseline / seconds:>7.2f}x  {same(result, expected[name])}")
@@ -0,0 +1,99 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Cold-start costs of the apps, each measured in a fresh interpreter so that
+# nothing is imported yet. Import times are shown alone and on top of
+# Streamlit, which `streamlit run` has loaded before any app code runs (it
+# brings numpy, pandas and pyarrow with it). App runs report, for the first
+# run of a script, the time until its page shell is sent (first paint), the
+# whole run, and which of the heavy packages and data modules the run imported.
+MODULES = ['streamlit', 'openai', 'pandas', 'pyarrow.feather', 'metrics', 'llm_client', 'service_client',
+           'app_data', 'neighbors', 'pareto', 'trends']
+WATCHED_MODULES = ['openai', 'pandas', 'numpy', 'pyarrow', 'app_data', 'trends']
+
+IMPORT_CODE = """
+import time
+{prelude}
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+"""
+
+# The script runs under AppTest with metrics collected in process; spans
+# named <script>.first_paint and <script>.rerun time the first run
+APP_CODE = """
+import json
+import re
+import sys
+
+import metrics
+from streamlit.testing.v1 import AppTest
+
+metrics.enable()
+before = set(sys.modules)
+app = AppTest.from_file({script!r}, default_timeout=120).run()
+spans = dict(re.findall(r'_span_seconds_sum{{span="([^"]+)"}} (\\S+)', metrics.render()))
+print(json.dumps({{
+    'spans': {{name: float(value) for name, value in spans.items()}},
+    'imported': [name for name in {watched!r} if name in sys.modules and name not in before],
+    'errors': [element.value for element in app.error] + [str(element.value) for element in app.exception],
+}}))
+"""
+
+
+def run_python(code, env=None):
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                            env={**os.environ, **(env or {})})
+    if result.returncode:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return result.stdout.strip().splitlines()[-1]
+
+
+def import_seconds(module, after_streamlit, repeat):
+    prelude = "import streamlit" if after_streamlit else ""
+    return statistics.median(float(run_python(IMPORT_CODE.format(prelude=prelude, module=module)))
+                             for _ in range(repeat))
+
+
+def first_run(script, env, repeat):
+    code = APP_CODE.format(script=script, watched=WATCHED_MODULES)
+    runs = [json.loads(run_python(code, env)) for _ in range(repeat)]
+    name = os.path.splitext(os.path.basename(script))[0]
+    return {
+        'first_paint': statistics.median(run['spans'].get(f'{name}.first_paint', float('nan')) for run in runs),
+        'first_run': statistics.median(run['spans'].get(f'{name}.rerun', float('nan')) for run in runs),
+        'imported': runs[0]['imported'],
+        'errors': runs[0]['errors'],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure import times and time to first paint of the apps")
+    parser.add_argument("--repeat", type=int, default=3, help="fresh interpreters per measurement (median)")
+    parser.add_argument("--modules", nargs="+", default=MODULES)
+    parser.add_argument("--apps", nargs="+", default=['streamlit_app.py'])
+    parser.add_argument("--service", help="also run the apps as thin clients of the service at this URL")
+    args = parser.parse_args()
+
+    print(f"{'Module':<18} {'alone ms':>9} {'after streamlit ms':>19}")
+    for module in args.modules:
+        alone = import_seconds(module, False, args.repeat) * 1000
+        after = import_seconds(module, True, args.repeat) * 1000 if module != 'streamlit' else 0
+        print(f"{module:<18} {alone:>9.0f} {after:>19.0f}")
+
+    # The apps stop early without a key. streamlit_app.py makes no LLM request on
+    # a first run; task_gap_agent.py does, so time it against `service.py --fake-llm`.
+    env = {'OPENAI_API_KEY': os.environ.get('OPENAI_API_KEY') or 'unused', 'AGENT_SERVICE_URL': ''}
+    modes = [('local', env)] + ([('service', {**env, 'AGENT_SERVICE_URL': args.service})] if args.service else [])
+    print(f"\n{'App':<22} {'Mode':<8} {'first paint ms':>15} {'first run ms':>13}  Imported by the run")
+    for script in args.apps:
+        for mode, mode_env in modes:
+            result = first_run(script, mode_env, args.repeat)
+            print(f"{script:<22} {mode:<8} {result['first_paint'] * 1000:>15.1f} {result['first_run'] * 1000:>13.1f}  "
+                  f"{', '.join(result['imported']) or '-'}")
+            for error in result['errors']:
+                print(f"    error: {error}")
@@ -0,0 +1,51 @@
+import argparse
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+import storage
+
+# Compare load times of the CSV source against the columnar cache.
+# --scale replicates the source rows to simulate larger exports.
+parser = argparse.ArgumentParser(description="Benchmark dataset load times")
+parser.add_argument("--source", default=storage.SOURCE_PATH)
+parser.add_argument("--scale", type=int, default=1, help="replicate the source rows this many times")
+parser.add_argument("--repeat", type=int, default=5, help="report the best of this many runs")
+args = parser.parse_args()
+
+
+def best_time(load):
+    timings = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        load()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+with tempfile.TemporaryDirectory() as workdir:
+    source = args.source
+    if args.scale > 1:
+        source = os.path.join(workdir, os.path.basename(args.source))
+        pd.concat([pd.read_csv(args.source)] * args.scale, ignore_index=True).to_csv(source, index=False)
+    storage.CACHE_DIR = os.path.join(workdir, "cache")
+
+    start = time.perf_counter()
+    storage.convert(source, force=True)
+    conversion = time.perf_counter() - start
+
+    rows = len(storage.load_dataset(columns=['agent_id'], source=source))
+    results = {
+        "pd.read_csv (all columns)": best_time(lambda: pd.read_csv(source)),
+        "storage (all columns)": best_time(lambda: storage.load_dataset(source=source)),
+        "storage (3 columns)": best_time(lambda: storage.load_dataset(
+            columns=['task_complexity', 'autonomy_level', 'task_category'], source=source)),
+    }
+
+print(f"Rows: {rows}")
+print(f"One-time conversion: {conversion * 1000:.1f} ms")
+baseline = results["pd.read_csv (all columns)"]
+for name, seconds in results.items():
+    print(f"{name:<28} {seconds * 1000:>10.1f} ms  {baseline / seconds:>6.1f}x")
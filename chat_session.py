@@ -0,0 +1,93 @@
+import collections
+
+# Messages kept verbatim; older ones are folded into the rolling summary
+WINDOW_MESSAGES = 40
+
+# Characters of rolling summary kept; its oldest lines are dropped first
+SUMMARY_CHARS = 1500
+SUMMARY_LINE_CHARS = 160
+
+# Token budget of a prompt built by ChatSession.prompt()
+PROMPT_TOKENS = 1500
+
+# Token counts are estimated from text length (about 4 characters per token
+# of English text) plus a fixed overhead per message of the chat format
+CHARS_PER_TOKEN = 4
+MESSAGE_TOKENS = 4
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + MESSAGE_TOKENS
+
+
+# One line of text standing for a message: its summary if it has one,
+# otherwise its content on one line, cut to at most `limit` characters
+def preview(message, limit=SUMMARY_LINE_CHARS):
+    text = message.get('summary') or ' '.join(message['content'].split())
+    return text if len(text) <= limit else f"{text[:limit - 1]}…"
+
+
+# Chat messages of one session, held as {'role', 'content'} dicts in the
+# format of the chat API. Only the latest `window` messages are kept; older
+# ones are folded into a rolling summary of one line each, so memory and
+# rendering cost stay bounded however long the conversation runs.
+class ChatSession:
+    def __init__(self, window=WINDOW_MESSAGES, summary_chars=SUMMARY_CHARS):
+        self.window = window
+        self.summary_chars = summary_chars
+        self.messages = collections.deque()
+        self.summarized = 0
+        self._summary_lines = collections.deque()
+        self._summary_size = 0
+
+    def __len__(self):
+        return self.summarized + len(self.messages)
+
+    # Add a message; `summary` replaces its content once it leaves the window
+    def add(self, role, content, summary=None):
+        message = {'role': role, 'content': content}
+        if summary:
+            message['summary'] = summary
+        self.messages.append(message)
+        while len(self.messages) > self.window:
+            self._fold(self.messages.popleft())
+        return message
+
+    def _fold(self, message):
+        line = f"{'User' if message['role'] == 'user' else 'Assistant'}: {preview(message)}"
+        self._summary_lines.append(line)
+        self._summary_size += len(line) + 1
+        while self._summary_size > self.summary_chars and len(self._summary_lines) > 1:
+            self._summary_size -= len(self._summary_lines.popleft()) + 1
+        self.summarized += 1
+
+    @property
+    def summary(self):
+        return '\n'.join(self._summary_lines)
+
+    # The latest n messages, oldest first
+    def recent(self, n):
+        return list(self.messages)[-n:] if n > 0 else []
+
+    # Messages for the chat API: the system prompt, a system message with the
+    # summary of earlier turns and the given context, then as many recent
+    # messages as fit in the token budget. The latest message is always sent.
+    def prompt(self, system, context=None, budget=PROMPT_TOKENS):
+        messages = [{'role': 'system', 'content': system}]
+        background = []
+        if self._summary_lines:
+            background.append(f"Summary of the earlier conversation:\n{self.summary}")
+        if context:
+            background.append(context)
+        if background:
+            messages.append({'role': 'system', 'content': '\n\n'.join(background)})
+
+        used = sum(estimate_tokens(message['content']) for message in messages)
+        turns = []
+        for message in reversed(self.messages):
+            tokens = estimate_tokens(message['content'])
+            if turns and used + tokens > budget:
+                break
+            turns.append({'role': message['role'], 'content': message['content']})
+            used += tokens
+        return messages + turns[::-1]
@@ -1,22 +1,215 @@
+import argparse
+import json
+import os
+
+import numpy as np
 import pandas as pd
-from sklearn.metrics import classification_report, accuracy_score
 
-# Load the dataset with recommendations
-dataset_path = "recommendations_dataset.csv"
-data = pd.read_csv(dataset_path)
+import metrics
+import storage
+
+# Ground truth: a CSV of agent_id and the true value of the evaluated column
+# (e.g. the weakest metric found by a review), kept apart from the dataset
+LABELS_PATH = "labels.csv"
+REPORT_PATH = os.path.join(storage.CACHE_DIR, "evaluation_metrics.json")
+
+# Evaluated columns and the processing stage that produces each
+PREDICTION_STAGES = {'weakest_metric': 'processed', 'recommendations': 'recommendations'}
+
+# Label rows read at a time
+CHUNK_ROWS = 1_000_000
+
+# Bootstrap replicates, drawn this many at a time
+BOOTSTRAP_SAMPLES = 1000
+BOOTSTRAP_BATCH = 250
+CONFIDENCE = 0.95
+
+
+# Counts of (true, predicted) class pairs, accumulated over batches of rows.
+# Classes are numbered in order of appearance; rows are truth, columns predictions.
+class ConfusionMatrix:
+    def __init__(self, classes=()):
+        self.classes = []
+        self._codes = {}
+        self.counts = np.zeros((0, 0), dtype=np.int64)
+        self._add(classes)
+
+    def _add(self, classes):
+        for name in classes:
+            if name not in self._codes:
+                self._codes[name] = len(self.classes)
+                self.classes.append(name)
+        if len(self.classes) > len(self.counts):
+            counts = np.zeros((len(self.classes), len(self.classes)), dtype=np.int64)
+            counts[:len(self.counts), :len(self.counts)] = self.counts
+            self.counts = counts
+
+    # Class codes of a batch of values (-1 for missing ones), adding new classes
+    def codes(self, values):
+        values = pd.Categorical(values)
+        categories = [str(category) for category in values.categories]
+        self._add(categories)
+        mapping = np.array([self._codes[category] for category in categories] + [-1], dtype=np.int64)
+        return mapping[values.codes]
+
+    def update(self, truth, predicted):
+        classes = len(self.classes)
+        self.counts += np.bincount(truth * classes + predicted, minlength=classes * classes).reshape(classes, classes)
+
+
+# Precision, recall and F1 per class and their averages, from confusion
+# matrices of shape (..., classes, classes). Classes in `observed` are
+# averaged; a ratio with nothing to divide is 0, as in scikit-learn.
+def scores(counts, observed):
+    correct = np.diagonal(counts, axis1=-2, axis2=-1).astype(np.float64)
+    support = counts.sum(axis=-1)
+    predicted = counts.sum(axis=-2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = np.where(predicted > 0, correct / predicted, 0.0)
+        recall = np.where(support > 0, correct / support, 0.0)
+        f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+    weights = support[..., observed] / support[..., observed].sum(axis=-1, keepdims=True)
+    return {
+        'accuracy': correct.sum(axis=-1) / support.sum(axis=-1),
+        'macro_precision': precision[..., observed].mean(axis=-1),
+        'macro_recall': recall[..., observed].mean(axis=-1),
+        'macro_f1': f1[..., observed].mean(axis=-1),
+        'weighted_f1': (f1[..., observed] * weights).sum(axis=-1),
+        'precision': precision,
+        'recall': recall,
+        'f1': f1,
+    }
+
+
+# Stratified bootstrap of the scores: every replicate resamples the rows of
+# each true class with replacement. The scores depend on rows only through
+# the confusion matrix, so resampling a class's rows is a multinomial draw
+# from its row of the matrix: a batch of replicates costs O(classes^2) per
+# replicate, however many rows were evaluated.
+def bootstrap(counts, observed, samples=BOOTSTRAP_SAMPLES, seed=0, batch=BOOTSTRAP_BATCH):
+    random = np.random.default_rng(seed)
+    support = counts.sum(axis=1)
+    replicates = []
+    for start in range(0, samples, batch):
+        size = min(batch, samples - start)
+        resampled = np.zeros((size,) + counts.shape, dtype=np.int64)
+        for truth in np.flatnonzero(support):
+            resampled[:, truth] = random.multinomial(support[truth], counts[truth] / support[truth], size=size)
+        replicates.append(scores(resampled, observed))
+    return {name: np.concatenate([replicate[name] for replicate in replicates]) for name in replicates[0]}
+
+
+# The evaluated column of every agent, from its latest row
+def load_predictions(column, source=storage.SOURCE_PATH):
+    data = storage.load_dataset(columns=['agent_id', 'timestamp'], stages=[PREDICTION_STAGES[column]], source=source)
+    data = data.sort_values('timestamp', kind='stable').drop_duplicates('agent_id', keep='last')
+    return pd.Index(data['agent_id'].astype(str)), data[column]
+
+
+# Confusion matrix of the predictions against the labels file, read in
+# chunks so label sets of any size fit in memory. Returns the matrix and
+# the number of label rows without a known agent or without a label.
+def evaluate(labels_path, column, label_column=None, source=storage.SOURCE_PATH, chunksize=CHUNK_ROWS):
+    label_column = label_column or column
+    with metrics.span('evaluate_metrics.load'):
+        agents, predictions = load_predictions(column, source)
+    confusion = ConfusionMatrix()
+    predicted_codes = confusion.codes(predictions)
+    unmatched = unlabeled = 0
+    with metrics.span('evaluate_metrics.confusion'):
+        for chunk in pd.read_csv(labels_path, usecols=['agent_id', label_column], chunksize=chunksize,
+                                 dtype={'agent_id': str, label_column: 'category'}):
+            positions = agents.get_indexer(chunk['agent_id'])
+            truth = confusion.codes(chunk[label_column])
+            known = (positions >= 0) & (truth >= 0)
+            unmatched += int((positions < 0).sum())
+            unlabeled += int(((positions >= 0) & (truth < 0)).sum())
+            known[known] = predicted_codes[positions[known]] >= 0
+            confusion.update(truth[known], predicted_codes[positions[known]])
+            metrics.increment('rows_processed_total', len(chunk), stage='evaluate_metrics')
+    return confusion, unmatched, unlabeled
+
+
+# Scores with bootstrap confidence intervals, as a JSON-ready report
+def report(confusion, samples=BOOTSTRAP_SAMPLES, seed=0, confidence=CONFIDENCE):
+    counts = confusion.counts
+    observed = (counts.sum(axis=0) + counts.sum(axis=1)) > 0
+    point = scores(counts, observed)
+    with metrics.span('evaluate_metrics.bootstrap'):
+        replicates = bootstrap(counts, observed, samples, seed)
+    tail = (1 - confidence) / 2 * 100
+
+    def interval(name):
+        low, high = np.percentile(replicates[name], [tail, 100 - tail], axis=0)
+        return {'value': point[name], 'low': low, 'high': high}
+
+    classes = [name for name, seen in zip(confusion.classes, observed) if seen]
+    per_class = {name: interval(name) for name in ['precision', 'recall', 'f1']}
+    return {
+        'rows': int(counts.sum()),
+        'classes': classes,
+        'confusion': counts[np.ix_(observed, observed)].tolist(),
+        'confidence': confidence,
+        'bootstrap_samples': samples,
+        **{name: {key: float(value) for key, value in interval(name).items()}
+           for name in ['accuracy', 'macro_precision', 'macro_recall', 'macro_f1', 'weighted_f1']},
+        'per_class': {
+            name: {
+                'support': int(counts[position].sum()),
+                **{score: {key: float(values[position]) for key, values in per_class[score].items()}
+                   for score in per_class},
+            }
+            for name, position in zip(classes, np.flatnonzero(observed))
+        },
+    }
+
+
+def print_report(result):
+    def with_interval(score):
+        return f"{score['value']:.3f} [{score['low']:.3f}, {score['high']:.3f}]"
 
-# Simulate ground truth for evaluation (for demonstration purposes)
-# In a real scenario, replace this with actual ground truth labels
-data['ground_truth'] = data['weakest_metric']
+    rows = {name: {'precision': with_interval(class_scores['precision']),
+                   'recall': with_interval(class_scores['recall']),
+                   'f1-score': with_interval(class_scores['f1']), 'support': class_scores['support']}
+            for name, class_scores in result['per_class'].items()}
+    print(f"\nClassification Report ({result['confidence']:.0%} bootstrap intervals, "
+          f"{result['bootstrap_samples']} stratified replicates):")
+    print(pd.DataFrame(rows).T.to_string())
+    print()
+    for name in ['accuracy', 'macro_precision', 'macro_recall', 'macro_f1', 'weighted_f1']:
+        print(f"{name.replace('_', ' ').capitalize():<16} {with_interval(result[name])}")
+    print("\nConfusion Matrix (rows: labels, columns: predictions):")
+    print(pd.DataFrame(result['confusion'], index=result['classes'], columns=result['classes']).to_string())
 
-# Evaluate the model's predictions against the ground truth
-predictions = data['weakest_metric']
-ground_truth = data['ground_truth']
 
-# Calculate classification metrics
-print("\nClassification Report:")
-print(classification_report(ground_truth, predictions))
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate predictions against held-out labels")
+    parser.add_argument("--labels", default=LABELS_PATH, help="CSV with agent_id and the true value per agent")
+    parser.add_argument("--column", choices=list(PREDICTION_STAGES), default='weakest_metric',
+                        help="evaluated column")
+    parser.add_argument("--label-column", help="column of the labels file (default: the evaluated column)")
+    parser.add_argument("--source", default=storage.SOURCE_PATH, help="dataset CSV")
+    parser.add_argument("--samples", type=int, default=BOOTSTRAP_SAMPLES, help="bootstrap replicates")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunksize", type=int, default=CHUNK_ROWS, help="label rows read at a time")
+    parser.add_argument("--output", default=REPORT_PATH, help="JSON report to write")
+    args = parser.parse_args()
+    metrics.profile_script('evaluate_metrics')
 
-# Calculate accuracy
-accuracy = accuracy_score(ground_truth, predictions)
-print(f"\nAccuracy: {accuracy:.2f}")
\ No newline at end of file
+    if not os.path.exists(args.labels):
+        print(f"No labels at {args.labels}: nothing to evaluate. "
+              f"Provide a CSV of agent_id and {args.label_column or args.column}.")
+    else:
+        confusion, unmatched, unlabeled = evaluate(args.labels, args.column, args.label_column, args.source,
+                                                   args.chunksize)
+        if not confusion.counts.sum():
+            raise SystemExit(f"No label in {args.labels} matches an agent of the dataset")
+        result = report(confusion, args.samples, args.seed)
+        result.update({'labels': args.labels, 'column': args.column, 'unmatched': unmatched, 'unlabeled': unlabeled})
+        print(f"Evaluated {result['rows']} labels ({unmatched} without a known agent, "
+              f"{unlabeled} without a value)")
+        print_report(result)
+        os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(result, file, indent=2)
+        print(f"\nReport saved to {args.output}")
@@ -1,8 +1,13 @@
 import pandas as pd
 
-# Load the dataset with recommendations
-dataset_path = "recommendations_dataset.csv"
-data = pd.read_csv(dataset_path)
+import metrics
+from storage import load_dataset
+
+metrics.profile_script('evaluate_model')
+
+# Load the weakest metric and recommendations of each agent
+with metrics.span('evaluate_model.load'):
+    data = load_dataset(columns=['agent_id'], stages=['processed', 'recommendations'])
 
 # Evaluate the interpretability of recommendations
 print("\nSample Recommendations:")
@@ -14,7 +19,8 @@ print(data['weakest_metric'].value_counts())
 
 # Evaluate the usefulness of recommendations
 # For simplicity, we assume that the usefulness is proportional to the clarity of the weakest metric
-usefulness_score = data['weakest_metric'].value_counts(normalize=True)
+with metrics.span('evaluate_model.evaluate'):
+    usefulness_score = data['weakest_metric'].value_counts(normalize=True)
 print("\nUsefulness Score (Proportion of Weakest Metrics):")
 print(usefulness_score)
 
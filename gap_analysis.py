@@ -0,0 +1,64 @@
+# Agent fields shown in recommendations and sent to the LLM for research suggestions
+AGENT_FIELDS = [
+    'agent_type', 'task_category', 'model_architecture',
+    'accuracy_score', 'cost_per_task_cents', 'human_intervention_required',
+]
+
+# Agents scoring at or below this are not considered similar to the query
+MIN_SIMILARITY = -10
+
+
+# Whether a top-k result contains agents close enough to recommend
+def has_similar_agents(similar_agents):
+    return not similar_agents.empty and similar_agents['similarity'].max() > MIN_SIMILARITY
+
+
+# Plain records of the recommended agents; float columns (float32 scores) are
+# rounded back to the precision of the source file so prompts stay readable and stable
+def agent_records(similar_agents, fields=AGENT_FIELDS):
+    agents = similar_agents[fields]
+    floats = [column for column in fields if agents[column].dtype.kind == 'f']
+    agents = agents.astype({column: float for column in floats}).round({column: 4 for column in floats})
+    return agents.astype({column: str for column in fields if agents[column].dtype == 'category'}).to_dict(orient='records')
+
+
+# Prompt asking the LLM for research directions for the given agents
+def research_prompt(similar_agents):
+    return research_prompt_from_records(agent_records(similar_agents))
+
+
+# Same prompt, built from records of AGENT_FIELDS
+def research_prompt_from_records(records):
+    return (
+        f"Based on the following agent data: {records}, "
+        f"suggest research directions or projects to improve the performance of these agents."
+    )
+
+
+# Agent records as context for a chat prompt, one line per agent
+def agents_context(records):
+    lines = ["Agents matching the user's current preferences:"]
+    for number, agent in enumerate(records, 1):
+        lines.append(
+            f"{number}. {agent['agent_type']} for {agent['task_category']} ({agent['model_architecture']}), "
+            f"accuracy {agent['accuracy_score']:.2f}, cost ${agent['cost_per_task_cents']:.4f} per task, "
+            f"human intervention {'required' if agent['human_intervention_required'] else 'not required'}"
+        )
+    return '\n'.join(lines)
+
+
+# Chat message listing recommended agents, from records of AGENT_FIELDS
+def recommendation_text(records):
+    text = "Here are the top agent recommendations based on your preferences:\n\n"
+    for number, agent in enumerate(records, 1):
+        text += f"{number}. {agent['agent_type']} for {agent['task_category']}\n"
+        text += f"   • Model: {agent['model_architecture']}\n"
+        text += f"   • Accuracy: {agent['accuracy_score']:.2f}\n"
+        text += f"   • Cost: ${agent['cost_per_task_cents']:.4f} per task\n"
+        text += f"   • Human Intervention: {'Yes' if agent['human_intervention_required'] else 'No'}\n\n"
+    return text
+
+
+# One-line stand-in for a recommendation message in a chat summary
+def recommendation_summary(records):
+    return "Recommended " + "; ".join(f"{agent['agent_type']} ({agent['model_architecture']})" for agent in records)
@@ -0,0 +1,113 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+import metrics
+import storage
+from gap_analysis import AGENT_FIELDS, MIN_SIMILARITY, agent_records, research_prompt_from_records
+from llm_client import get_client
+from parallel import top_k_batch_parallel
+from similarity import encode_agents
+
+QUERY_FIELDS = ['task_complexity', 'autonomy_level', 'task_category']
+
+
+# Read {task_complexity, autonomy_level, task_category} queries, one JSON object per line
+def read_queries(path):
+    queries = []
+    with open(path, encoding='utf-8') as file:
+        for line_number, line in enumerate(file, 1):
+            if not line.strip():
+                continue
+            query = json.loads(line)
+            missing = [field for field in QUERY_FIELDS if field not in query]
+            if missing:
+                raise ValueError(f"{path}:{line_number}: query is missing {missing}")
+            queries.append(query)
+    return queries
+
+
+# Score every query against the dataset in one vectorized pass
+def analyze(data, queries, k=5, workers=1):
+    positions, scores = top_k_batch_parallel(encode_agents(data), queries, k, workers)
+    # Convert the agents of all queries to records at once, then split them per query
+    agents = data.iloc[positions.ravel()].copy()
+    agents['similarity'] = scores.ravel()
+    records = agent_records(agents, ['agent_id'] + AGENT_FIELDS + ['similarity'])
+
+    results = []
+    for number, query in enumerate(queries):
+        result = {'query': query, 'agents': [], 'research_prompt': None}
+        if len(scores[number]) and scores[number].max() > MIN_SIMILARITY:
+            result['agents'] = records[number * positions.shape[1]:(number + 1) * positions.shape[1]]
+            result['research_prompt'] = research_prompt_from_records(
+                [{field: agent[field] for field in AGENT_FIELDS} for agent in result['agents']]
+            )
+        results.append(result)
+    return results
+
+
+# Fetch research suggestions with at most `concurrency` LLM calls in flight.
+# Identical prompts are answered once, by the client's cache and deduplication.
+# A failed call marks its own result with an 'error' and leaves the others be.
+async def suggest(results, concurrency, client=None):
+    client = client or get_client()
+    slots = asyncio.Semaphore(concurrency)
+
+    async def fetch(result):
+        if result['research_prompt'] is None:
+            return
+        async with slots:
+            try:
+                result['research_suggestion'] = await client.complete(
+                    [{"role": "user", "content": result['research_prompt']}]
+                )
+            except Exception as error:
+                result['error'] = f"{type(error).__name__}: {error}"
+                metrics.increment('gap_batch_errors_total')
+
+    await asyncio.gather(*(fetch(result) for result in results))
+
+
+def write_results(results, path):
+    with open(path, 'w', encoding='utf-8') as file:
+        for result in results:
+            file.write(json.dumps(result) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run gap analysis for a batch of preference queries")
+    parser.add_argument("queries", help="JSONL file of {task_complexity, autonomy_level, task_category}")
+    parser.add_argument("output", help="JSONL file to write one result per query to")
+    parser.add_argument("--k", type=int, default=5, help="number of agents per query")
+    parser.add_argument("--source", default=storage.SOURCE_PATH, help="dataset CSV")
+    parser.add_argument("--llm", action="store_true", help="also fetch research suggestions from the LLM")
+    parser.add_argument("--concurrency", type=int, default=8, help="maximum concurrent LLM calls")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes ranking agents")
+    args = parser.parse_args()
+    metrics.profile_script('gap_batch')
+
+    queries = read_queries(args.queries)
+    columns = list(dict.fromkeys(['agent_id'] + QUERY_FIELDS + AGENT_FIELDS))
+    with metrics.span('gap_batch.load'):
+        data = storage.load_dataset(columns=columns, source=args.source)
+    with metrics.span('gap_batch.analyze'):
+        results = analyze(data, queries, args.k, args.workers)
+    # Results are written even if the run is interrupted, with the suggestions fetched so far
+    try:
+        if args.llm:
+            import openai
+
+            openai.api_key = os.getenv("OPENAI_API_KEY")
+            with metrics.span('gap_batch.suggest'):
+                asyncio.run(suggest(results, args.concurrency))
+    finally:
+        write_results(results, args.output)
+    failed = sum('error' in result for result in results)
+    print(f"Wrote {len(results)} results to {args.output}" + (f", {failed} with an error" if failed else ""))
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
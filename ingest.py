@@ -0,0 +1,80 @@
+import argparse
+import contextlib
+import os
+
+import pandas as pd
+
+import metrics
+import pipeline
+import schema
+import storage
+from analyze_dataset import weakest_metric
+from recommendation_model import recommend, stage_rules
+from stats import load_summary, merge_summaries, save_summary, summarize
+
+
+# Rows of a delta whose (agent_id, timestamp) key is not stored yet. Only parts
+# whose timestamp range overlaps the delta are read, so for time-ordered
+# exports the check costs in proportion to the delta, not the history.
+def new_rows(delta, source=storage.SOURCE_PATH):
+    delta = delta.drop_duplicates(storage.KEY_COLUMNS)
+    if delta.empty:
+        return delta
+    earliest, latest = delta['timestamp'].min(), delta['timestamp'].max()
+    for part in storage.table_parts(storage.convert(source)):
+        if 'min_timestamp' in part and (pd.Timestamp(part['max_timestamp']) < earliest
+                                        or pd.Timestamp(part['min_timestamp']) > latest):
+            continue
+        stored = storage.read_parts([part['path']], storage.KEY_COLUMNS)
+        stored = stored[stored['timestamp'].between(earliest, latest)]
+        seen = pd.MultiIndex.from_frame(delta[storage.KEY_COLUMNS]).isin(
+            pd.MultiIndex.from_frame(stored[storage.KEY_COLUMNS]))
+        delta = delta[~seen]
+    return delta
+
+
+# Add new rows to the stored dataset: compute their weakest metric and
+# recommendations (with the rules the recommend stage used), append them and
+# their stage columns as new parts, merge their statistics into the summary
+# and, if given, add them to a live similarity index. Stages of pipeline.py
+# that were up to date stay so. Returns the rows that were actually added.
+def ingest(delta, source=storage.SOURCE_PATH, index=None):
+    for stage in ['processed', 'recommendations']:
+        if not os.path.exists(storage.stage_path(stage)):
+            raise FileNotFoundError(f"{storage.stage_path(stage)} not found; run pipeline.py first")
+
+    with metrics.span('ingest.new_rows'):
+        delta = new_rows(schema.validate(schema.apply_schema(delta)), source).reset_index(drop=True)
+    if delta.empty:
+        return delta
+    with metrics.span('ingest.process'):
+        delta['weakest_metric'] = weakest_metric(delta)
+        delta['recommendations'] = recommend(delta, stage_rules())
+
+    # The pipeline's stages produce the dataset of SOURCE_PATH only
+    recorded = pipeline.appending() if source == storage.SOURCE_PATH else contextlib.nullcontext()
+    with metrics.span('ingest.append'), recorded:
+        storage.append_dataset(delta[list(schema.SCHEMA)], source)
+        storage.append_stage('processed', delta, ['weakest_metric'])
+        storage.append_stage('recommendations', delta, ['recommendations'])
+    metrics.increment('rows_processed_total', len(delta), stage='ingest')
+    try:
+        summary = merge_summaries(load_summary(), summarize(delta[list(schema.SCHEMA)]))
+    except FileNotFoundError:
+        summary = summarize(storage.load_dataset(source=source))
+    save_summary(summary)
+    if index is not None:
+        index.extend(delta)
+    return delta
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Append new agent performance records to the stored dataset")
+    parser.add_argument("path", help="CSV export with the dataset's columns")
+    parser.add_argument("--source", default=storage.SOURCE_PATH, help="dataset the records are added to")
+    args = parser.parse_args()
+    metrics.profile_script('ingest')
+
+    delta = schema.read_csv(args.path)
+    added = ingest(delta, args.source)
+    print(f"Added {len(added)} new rows, skipped {len(delta) - len(added)} already stored")
@@ -0,0 +1,293 @@
+import asyncio
+import concurrent.futures
+import functools
+import hashlib
+import json
+import os
+import threading
+import time
+
+import metrics
+
+DEFAULT_MODEL = "gpt-3.5-turbo"
+CACHE_DIR = os.path.join("cache", "llm")
+CACHE_TTL_SECONDS = 7 * 24 * 3600
+CACHE_MAX_ENTRIES = 10000
+
+
+# Content address of a request: identical model, messages and parameters share a key
+def request_key(model, messages, **params):
+    payload = json.dumps({'model': model, 'messages': messages, 'params': params}, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+# On-disk response cache with a time-to-live and a least-recently-used entry limit.
+# Each response is one JSON file named by its request key; a file's mtime is
+# refreshed on every hit and serves as its last-used time.
+class ResponseCache:
+    def __init__(self, directory=CACHE_DIR, ttl=CACHE_TTL_SECONDS, max_entries=CACHE_MAX_ENTRIES):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = None
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _files(self):
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith('.json'):
+                    yield os.path.join(root, name)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, encoding='utf-8') as file:
+                entry = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if time.time() - entry['created'] > self.ttl:
+            self._remove(path)
+            return None
+        os.utime(path)
+        return entry['content']
+
+    # Store a response. The response has already been received, so a failed
+    # write (a full disk, or another thread evicting files being listed) is
+    # counted and otherwise ignored: the caller still gets its answer.
+    def set(self, key, content):
+        path = self._path(key)
+        try:
+            is_new = not os.path.exists(path)
+            # Imported here: storage loads pandas and pyarrow, which the apps defer
+            import storage
+            with storage.atomic_write(path) as tmp_path, open(tmp_path, 'w', encoding='utf-8') as file:
+                json.dump({'created': time.time(), 'content': content}, file)
+            if self._entries is None:
+                self._entries = sum(1 for _ in self._files())
+            elif is_new:
+                self._entries += 1
+            if self._entries > self.max_entries:
+                self._evict()
+        except OSError:
+            metrics.increment('llm_cache_write_errors_total')
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            return
+        if self._entries is not None:
+            self._entries -= 1
+
+    # Drop the least recently used entries down to 90% of the limit
+    def _evict(self):
+        files = sorted(self._files(), key=os.path.getmtime)
+        for path in files[:len(files) - int(self.max_entries * 0.9)]:
+            self._remove(path)
+
+    def clear(self):
+        for path in list(self._files()):
+            self._remove(path)
+
+
+# Chat completions through the OpenAI API. api_base can point at a local stub server.
+class OpenAIBackend:
+    def __init__(self, api_base=None):
+        self.api_base = api_base
+
+    async def complete(self, model, messages, **params):
+        import openai
+
+        if self.api_base:
+            params['api_base'] = self.api_base
+        response = await openai.ChatCompletion.acreate(model=model, messages=messages, **params)
+        usage = response.get('usage') or {}
+        metrics.increment('llm_tokens_total', usage.get('prompt_tokens', 0), kind='prompt')
+        metrics.increment('llm_tokens_total', usage.get('completion_tokens', 0), kind='completion')
+        return response['choices'][0]['message']['content']
+
+    async def stream(self, model, messages, **params):
+        import openai
+
+        if self.api_base:
+            params['api_base'] = self.api_base
+        response = await openai.ChatCompletion.acreate(model=model, messages=messages, stream=True, **params)
+        async for chunk in response:
+            token = chunk['choices'][0]['delta'].get('content')
+            if token:
+                # The API streams one token per chunk
+                metrics.increment('llm_tokens_total', kind='completion')
+                yield token
+
+
+# Offline backend for tests: answers with a fixed text (or a function of the
+# request) after an optional delay, and records every call it receives
+class FakeBackend:
+    def __init__(self, response="This is a canned response.", delay=0.0):
+        self.response = response
+        self.delay = delay
+        self.calls = []
+
+    async def complete(self, model, messages, **params):
+        self.calls.append({'model': model, 'messages': messages, **params})
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if callable(self.response):
+            return self.response(model, messages)
+        return self.response
+
+    # Stream the response word by word once the delay has passed
+    async def stream(self, model, messages, **params):
+        content = await self.complete(model, messages, **params)
+        words = content.split(' ')
+        for position, word in enumerate(words):
+            yield word if position == len(words) - 1 else f"{word} "
+
+
+# Async LLM access with response caching and in-flight deduplication:
+# identical concurrent requests share a single backend call. One client may
+# serve several event loops (complete_sync runs a loop per call, from any
+# thread), so calls in flight are thread-safe futures that callers on any
+# loop can await, not tasks of the loop that started them.
+class LLMClient:
+    def __init__(self, backend=None, cache=None):
+        self.backend = backend or OpenAIBackend()
+        self.cache = cache if cache is not None else ResponseCache()
+        self.stats = {'hits': 0, 'misses': 0, 'coalesced': 0}
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    # Cached response to a request, or None if it would need a backend call
+    def cached(self, messages, model=DEFAULT_MODEL, **params):
+        content = self.cache.get(request_key(model, messages, **params))
+        if content is not None:
+            self.stats['hits'] += 1
+            metrics.increment('llm_requests_total', result='hit')
+        return content
+
+    async def complete(self, messages, model=DEFAULT_MODEL, **params):
+        cached = self.cached(messages, model, **params)
+        if cached is not None:
+            return cached
+
+        key = request_key(model, messages, **params)
+        with self._lock:
+            future = self._in_flight.get(key)
+            started = future is None
+            if started:
+                future = self._in_flight[key] = concurrent.futures.Future()
+            self.stats['misses' if started else 'coalesced'] += 1
+        metrics.increment('llm_requests_total', result='miss' if started else 'coalesced')
+        if started:
+            task = asyncio.ensure_future(self._fetch(key, model, messages, params))
+            task.add_done_callback(functools.partial(self._settle, key, future))
+        # Shield the shared call so one cancelled caller does not cancel it for the others
+        return await asyncio.shield(asyncio.wrap_future(future))
+
+    # Pass the outcome of a backend call to every caller waiting for it
+    def _settle(self, key, future, task):
+        with self._lock:
+            self._in_flight.pop(key, None)
+        if task.cancelled():
+            future.cancel()
+        elif task.exception() is not None:
+            future.set_exception(task.exception())
+        else:
+            future.set_result(task.result())
+
+    async def _fetch(self, key, model, messages, params):
+        with metrics.span('llm.complete'):
+            content = await self.backend.complete(model, messages, **params)
+        self.cache.set(key, content)
+        return content
+
+    # Yield the response as it is generated; a cached response arrives as one piece
+    async def stream(self, messages, model=DEFAULT_MODEL, **params):
+        key = request_key(model, messages, **params)
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.stats['hits'] += 1
+            metrics.increment('llm_requests_total', result='hit')
+            yield cached
+            return
+
+        self.stats['misses'] += 1
+        metrics.increment('llm_requests_total', result='miss')
+        parts = []
+        span = metrics.span('llm.stream')
+        async for token in self.backend.stream(model, messages, **params):
+            parts.append(token)
+            yield token
+        span.end()
+        self.cache.set(key, ''.join(parts))
+
+    # Blocking variant for scripts without an event loop
+    def complete_sync(self, messages, model=DEFAULT_MODEL, **params):
+        return asyncio.run(self.complete(messages, model=model, **params))
+
+    # Blocking iterator over a streamed response
+    def stream_sync(self, messages, model=DEFAULT_MODEL, **params):
+        loop = asyncio.new_event_loop()
+        tokens = self.stream(messages, model=model, **params)
+        try:
+            while True:
+                try:
+                    yield loop.run_until_complete(tokens.__anext__())
+                except StopAsyncIteration:
+                    break
+        finally:
+            loop.run_until_complete(tokens.aclose())
+            loop.close()
+
+
+# Streams a response on a background thread, so the request outlives a
+# Streamlit rerun and is neither repeated nor dropped by it. Readers poll
+# the text received so far with wait().
+class BackgroundStream:
+    def __init__(self, client, messages, model=DEFAULT_MODEL, **params):
+        self.text = ''
+        self.done = False
+        self.error = None
+        self.time_to_first_token = None
+        self.elapsed = None
+        self._started = time.perf_counter()
+        self._changed = threading.Condition()
+        self._thread = threading.Thread(target=self._run, args=(client, messages, model, params), daemon=True)
+        self._thread.start()
+
+    def _run(self, client, messages, model, params):
+        try:
+            for token in client.stream_sync(messages, model=model, **params):
+                with self._changed:
+                    if self.time_to_first_token is None:
+                        self.time_to_first_token = time.perf_counter() - self._started
+                        metrics.observe('llm.first_token', self.time_to_first_token)
+                    self.text += token
+                    self._changed.notify_all()
+        except Exception as error:
+            self.error = error
+        finally:
+            with self._changed:
+                self.elapsed = time.perf_counter() - self._started
+                self.done = True
+                self._changed.notify_all()
+
+    # Wait up to timeout seconds for new text; returns (text so far, finished)
+    def wait(self, timeout=0.1):
+        with self._changed:
+            if not self.done:
+                self._changed.wait(timeout)
+            return self.text, self.done
+
+
+_default_client = None
+
+
+# Process-wide client backed by the OpenAI API and the default cache
+def get_client():
+    global _default_client
+    if _default_client is None:
+        _default_client = LLMClient()
+    return _default_client
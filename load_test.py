@@ -0,0 +1,117 @@
+import argparse
+import asyncio
+import collections
+import json
+import random
+import time
+from urllib.parse import urlencode, urlsplit
+
+import numpy as np
+
+from service_client import ServiceClient
+
+# Share of requests per endpoint
+MIX = {'recommendations': 0.6, 'similar': 0.3, 'research': 0.1}
+
+
+# One keep-alive HTTP/1.1 connection to the service
+class Connection:
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = self.writer = None
+
+    async def get(self, target):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self.writer.write(f"GET {target} HTTP/1.1\r\nHost: {self.host}\r\n\r\n".encode('latin-1'))
+        await self.writer.drain()
+        status = int((await self.reader.readline()).split()[1])
+        length, keep_alive = 0, True
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            if name.lower() == 'content-length':
+                length = int(value)
+            elif name.lower() == 'connection':
+                keep_alive = value.strip().lower() != 'close'
+        await self.reader.readexactly(length)
+        if not keep_alive:
+            self.close()
+        return status
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+
+# Queries drawn from the sidebar vocabularies. Fewer distinct queries mean
+# more identical requests in flight, which the service coalesces.
+def make_queries(vocabularies, distinct, seed):
+    generator = np.random.default_rng(seed)
+    return [{column: values[generator.integers(len(values))] for column, values in vocabularies.items()}
+            for _ in range(distinct)]
+
+
+async def user(host, port, queries, deadline, seed, results):
+    generator = random.Random(seed)
+    connection = Connection(host, port)
+    endpoints, weights = list(MIX), list(MIX.values())
+    try:
+        while time.perf_counter() < deadline:
+            endpoint = generator.choices(endpoints, weights)[0]
+            target = f"/{endpoint}?{urlencode(generator.choice(queries))}"
+            start = time.perf_counter()
+            try:
+                status = await connection.get(target)
+            except (OSError, ValueError, IndexError, asyncio.IncompleteReadError):
+                connection.close()
+                status = 'error'
+            results.append((endpoint, status, time.perf_counter() - start))
+    finally:
+        connection.close()
+
+
+async def run(url, concurrency, duration, queries, seed):
+    address = urlsplit(url)
+    deadline = time.perf_counter() + duration
+    results = []
+    await asyncio.gather(*(user(address.hostname, address.port, queries, deadline, seed + number, results)
+                           for number in range(concurrency)))
+    return results
+
+
+def print_results(results, duration):
+    print(f"{len(results)} requests in {duration:.1f} s: {len(results) / duration:.0f} requests/s\n")
+    print(f"{'Endpoint':<16} {'Requests':>9} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8}  Statuses")
+    by_endpoint = collections.defaultdict(list)
+    for endpoint, status, seconds in results:
+        by_endpoint[endpoint].append((status, seconds))
+    for endpoint, rows in sorted(by_endpoint.items()):
+        statuses = collections.Counter(str(status) for status, _ in rows)
+        # Latency of answered requests; rejections return at once and would flatter it
+        seconds = [seconds for status, seconds in rows if status == 200] or [float('nan')]
+        p50, p90, p99 = np.percentile(seconds, [50, 90, 99]) * 1000
+        print(f"{endpoint:<16} {len(rows):>9} {p50:>8.1f} {p90:>8.1f} {p99:>8.1f}  "
+              + ", ".join(f"{status}: {count}" for status, count in sorted(statuses.items())))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the gap analysis service with concurrent users")
+    parser.add_argument("--url", default="http://127.0.0.1:8600")
+    parser.add_argument("--concurrency", type=int, default=50, help="simulated users, each one request at a time")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds")
+    parser.add_argument("--queries", type=int, default=20, help="distinct preference combinations requested")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    service = ServiceClient(args.url)
+    vocabularies, _ = service.vocabularies()
+    queries = make_queries(vocabularies, args.queries, args.seed)
+    start = time.perf_counter()
+    results = asyncio.run(run(args.url, args.concurrency, args.duration, queries, args.seed))
+    print_results(results, time.perf_counter() - start)
+    print("\nService:", json.dumps(service.health()))
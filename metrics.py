@@ -0,0 +1,313 @@
+import atexit
+import cProfile
+import collections
+import contextlib
+import errno
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Lightweight instrumentation: latency histograms of named spans, counters,
+# and an optional profiler. Everything is off unless one of these is set:
+#     AGENT_METRICS_DIR   write <program>.prom (Prometheus text format) there
+#     AGENT_METRICS_PORT  serve the same text at http://localhost:<port>/metrics
+#                         (from the first process of a run to bind the port)
+#     AGENT_PROFILE       'cprofile' or 'sample' to profile scripts and app reruns
+#     AGENT_PROFILE_DIR   where profiles go (default cache/profiles)
+# When disabled, span() returns a shared no-op object and increment() returns
+# at once, so instrumented code pays about a function call per use.
+PREFIX = "agents"
+
+# Histogram bucket bounds in seconds
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Interval of the sampling profiler
+SAMPLE_INTERVAL = 0.005
+
+_enabled = False
+_directory = None
+_profile_mode = None
+_profile_dir = os.path.join("cache", "profiles")
+_program = os.path.splitext(os.path.basename(sys.argv[0] if sys.argv and sys.argv[0] else 'python'))[0]
+_lock = threading.Lock()
+_histograms = {}
+_counters = collections.Counter()
+_server = None
+
+
+def enabled():
+    return _enabled
+
+
+# Latency distribution of one span name
+class _Histogram:
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        for position, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[position] += 1
+                break
+        self.count += 1
+        self.sum += seconds
+
+
+# Record a duration for a span name
+def observe(name, seconds):
+    if not _enabled:
+        return
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = _Histogram()
+        histogram.observe(seconds)
+
+
+# Add to a counter, e.g. increment('llm_requests_total', result='hit')
+def increment(name, value=1, **labels):
+    if not _enabled:
+        return
+    with _lock:
+        _counters[(name, tuple(sorted(labels.items())))] += value
+
+
+# Times the code between its creation and end() (or the end of a with block)
+class _Span:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+        self.start = time.perf_counter()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.end()
+
+    def end(self):
+        if self.start is not None:
+            observe(self.name, time.perf_counter() - self.start)
+            self.start = None
+
+
+class _Disabled:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def end(self):
+        pass
+
+
+_DISABLED = _Disabled()
+
+
+# Time a stage: `with metrics.span('app.similarity'): ...`
+def span(name):
+    return _Span(name) if _enabled else _DISABLED
+
+
+# Collapsed stacks of one thread sampled every SAMPLE_INTERVAL, written in the
+# folded format flame graph tools read ("outer;inner count" per line)
+class _Sampler:
+    def __init__(self):
+        self.thread_id = threading.get_ident()
+        self.stacks = collections.Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stopped.wait(SAMPLE_INTERVAL):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self, path):
+        self._stopped.set()
+        self._thread.join()
+        with open(path, 'w', encoding='utf-8') as file:
+            for stack, count in self.stacks.most_common():
+                file.write(f"{stack} {count}\n")
+
+
+# Profiles the code between its creation and end() into AGENT_PROFILE_DIR
+class _Profile:
+    _sequence = 0
+
+    def __init__(self, name):
+        _Profile._sequence += 1
+        self.path = os.path.join(_profile_dir, f"{name}-{os.getpid()}-{_Profile._sequence}")
+        if _profile_mode == 'cprofile':
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        else:
+            self.profiler = _Sampler()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.end()
+
+    def end(self):
+        if self.profiler is None:
+            return
+        os.makedirs(_profile_dir, exist_ok=True)
+        if isinstance(self.profiler, _Sampler):
+            self.profiler.stop(f"{self.path}.folded")
+        else:
+            self.profiler.disable()
+            self.profiler.dump_stats(f"{self.path}.prof")
+        self.profiler = None
+
+
+# Profile a block when AGENT_PROFILE is set: `with metrics.profile('rerun'): ...`
+def profile(name):
+    return _Profile(name) if _profile_mode else _DISABLED
+
+
+# Profile the rest of a script's run
+def profile_script(name):
+    if _profile_mode:
+        atexit.register(_Profile(name).end)
+
+
+# Time, profile (with AGENT_PROFILE) and flush one run of a Streamlit script.
+# The script body goes in the with block, so the run is recorded however it
+# ends, including st.stop() and st.rerun(), which raise to end the run.
+@contextlib.contextmanager
+def rerun(program):
+    try:
+        with span(f'{program}.rerun'), profile(f'{program}.rerun'):
+            yield
+    finally:
+        # A metrics file that cannot be written must not end the page, nor
+        # hide an exception already raised by the run
+        try:
+            flush(program)
+        except OSError as error:
+            print(f"metrics: could not write {program}.prom: {error}", file=sys.stderr)
+
+
+# A label value escaped as the text format requires: backslash, double quote and newline
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in pairs) + '}'
+
+
+# All metrics in the Prometheus text exposition format
+def render():
+    lines = []
+    with _lock:
+        if _histograms:
+            lines.append(f"# TYPE {PREFIX}_span_seconds histogram")
+        for name, histogram in sorted(_histograms.items()):
+            cumulative = 0
+            for bound, count in zip(BUCKETS, histogram.buckets):
+                cumulative += count
+                lines.append(f'{PREFIX}_span_seconds_bucket{_labels([("span", name), ("le", bound)])} {cumulative}')
+            lines.append(f'{PREFIX}_span_seconds_bucket{_labels([("span", name), ("le", "+Inf")])} {histogram.count}')
+            lines.append(f'{PREFIX}_span_seconds_sum{_labels([("span", name)])} {histogram.sum}')
+            lines.append(f'{PREFIX}_span_seconds_count{_labels([("span", name)])} {histogram.count}')
+        typed = set()
+        for (name, labels), value in sorted(_counters.items()):
+            if name not in typed:
+                lines.append(f"# TYPE {PREFIX}_{name} counter")
+                typed.add(name)
+            lines.append(f"{PREFIX}_{name}{_labels(labels)} {value}")
+    return '\n'.join(lines) + '\n'
+
+
+# Write the metrics file of a program (default: the running script's name)
+def flush(program=None):
+    global _program
+    _program = program or _program
+    if not _enabled or _directory is None:
+        return
+    # Imported here: storage loads pyarrow, which metrics alone does not need
+    import storage
+    with storage.atomic_write(os.path.join(_directory, f"{_program}.prom")) as tmp_path, \
+            open(tmp_path, 'w', encoding='utf-8') as file:
+        file.write(render())
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != '/metrics':
+            self.send_error(404)
+            return
+        body = render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+# Serve /metrics on a background thread (once per process). Child processes
+# inherit AGENT_METRICS_PORT (pipeline stages, worker pools), so a process
+# finding the port taken goes on without serving; None is returned then.
+def serve(port):
+    global _server
+    if _server is None:
+        try:
+            _server = ThreadingHTTPServer(('127.0.0.1', port), _MetricsHandler)
+        except OSError as error:
+            if error.errno != errno.EADDRINUSE:
+                raise
+            print(f"metrics: port {port} in use, /metrics not served by this process", file=sys.stderr)
+            return None
+        threading.Thread(target=_server.serve_forever, daemon=True).start()
+    return _server
+
+
+# Collect spans and counters without writing or serving them, for programs
+# that expose render() themselves
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def configure(directory=None, port=None, profile_mode=None, profile_dir=None):
+    global _enabled, _directory, _profile_mode, _profile_dir
+    if profile_mode not in (None, '', 'cprofile', 'sample'):
+        raise ValueError(f"Unknown profiler '{profile_mode}', expected 'cprofile' or 'sample'")
+    _directory = directory or None
+    _profile_mode = profile_mode or None
+    _profile_dir = profile_dir or _profile_dir
+    _enabled = bool(directory or port)
+    if port:
+        serve(int(port))
+
+
+configure(
+    directory=os.environ.get('AGENT_METRICS_DIR'),
+    port=os.environ.get('AGENT_METRICS_PORT'),
+    profile_mode=os.environ.get('AGENT_PROFILE'),
+    profile_dir=os.environ.get('AGENT_PROFILE_DIR'),
+)
+atexit.register(flush)
@@ -0,0 +1,295 @@
+import argparse
+import math
+
+import numpy as np
+import pandas as pd
+
+import metrics
+import schema
+import storage
+
+# Every numeric and boolean column of the dataset makes up an agent's profile
+PROFILE_COLUMNS = [column for column, dtype in schema.SCHEMA.items() if dtype.startswith(('int', 'float', 'bool'))]
+
+# Upper bound on the number of distances held in memory per block, and on
+# the queries searched together
+BLOCK_ELEMENTS = 1 << 22
+QUERY_BLOCK = 256
+
+# Below this many rows an exhaustive scan is fast enough and no inverted
+# lists are built
+APPROXIMATE_ROWS = 100_000
+
+# Approximate searches probe enough lists to find this share of the exact
+# neighbours of sample queries
+TARGET_RECALL = 0.95
+TUNING_QUERIES = 200
+
+# k-means training of the inverted lists
+TRAINING_ROWS_PER_LIST = 64
+TRAINING_ITERATIONS = 10
+
+
+# Mean and standard deviation of each profile column, fixed when an index
+# is built so later rows and queries are scaled the same way
+def fit_scaler(data):
+    values = data[PROFILE_COLUMNS].astype(np.float64)
+    std = values.std().fillna(1.0)
+    return {'mean': values.mean().fillna(0.0), 'std': std.where(std > 0, 1.0)}
+
+
+# Standardized float32 profile vectors of rows (a DataFrame or a list of
+# dicts); missing columns and values count as the mean
+def profile_vectors(rows, scaler):
+    rows = pd.DataFrame(rows) if not isinstance(rows, pd.DataFrame) else rows
+    values = rows.reindex(columns=PROFILE_COLUMNS).astype(np.float64)
+    vectors = ((values - scaler['mean']) / scaler['std']).fillna(0.0)
+    return np.ascontiguousarray(vectors.to_numpy(dtype=np.float32))
+
+
+# Indices of the k smallest distances of each row of a (queries, n) matrix,
+# nearest first (ties by index)
+def _smallest(distances, k):
+    k = min(k, distances.shape[1])
+    if k < distances.shape[1]:
+        candidates = np.argpartition(distances, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.broadcast_to(np.arange(distances.shape[1]), distances.shape)
+    chosen = np.take_along_axis(distances, candidates, axis=1)
+    order = np.lexsort((candidates, chosen), axis=1)
+    return np.take_along_axis(candidates, order, axis=1)
+
+
+# k nearest rows of `vectors` to each query by Euclidean distance, scanning
+# the rows in blocks: ||q - x||^2 = ||x||^2 - 2 q.x + ||q||^2, where the
+# products of a block are one matrix multiplication. Returns (queries, k)
+# arrays of row numbers and squared distances; `exclude` is a row number per
+# query (or -1) left out of its results.
+def exact_search(vectors, norms, queries, k, exclude=None):
+    if len(queries) > QUERY_BLOCK:
+        results = [exact_search(vectors, norms, queries[start:start + QUERY_BLOCK], k,
+                                None if exclude is None else exclude[start:start + QUERY_BLOCK])
+                   for start in range(0, len(queries), QUERY_BLOCK)]
+        return np.concatenate([rows for rows, _ in results]), np.concatenate([distances for _, distances in results])
+    best_rows = np.empty((len(queries), 0), dtype=np.int64)
+    best_distances = np.empty((len(queries), 0), dtype=np.float32)
+    block = max(1, BLOCK_ELEMENTS // max(1, len(queries)))
+    query_norms = (queries * queries).sum(axis=1)[:, None]
+    for start in range(0, len(vectors), block):
+        distances = norms[start:start + block] - 2 * queries @ vectors[start:start + block].T + query_norms
+        if exclude is not None:
+            excluded = (exclude >= start) & (exclude < start + distances.shape[1])
+            distances[excluded, exclude[excluded] - start] = np.inf
+        nearest = _smallest(distances, k)
+        rows = np.concatenate([best_rows, start + nearest], axis=1)
+        distances = np.concatenate([best_distances, np.take_along_axis(distances, nearest, axis=1)], axis=1)
+        # Earlier blocks come first, so equal distances stay in row order
+        chosen = np.argsort(distances, axis=1, kind='stable')[:, :k]
+        best_rows = np.take_along_axis(rows, chosen, axis=1)
+        best_distances = np.take_along_axis(distances, chosen, axis=1)
+    return best_rows, np.maximum(best_distances, 0)
+
+
+# Number of the nearest centroid of each vector, in blocks of vectors
+def nearest_centroid(vectors, centroids):
+    norms = (centroids * centroids).sum(axis=1)
+    block = max(1, BLOCK_ELEMENTS // len(centroids))
+    return np.concatenate([(norms - 2 * vectors[start:start + block] @ centroids.T).argmin(axis=1)
+                           for start in range(0, len(vectors), block)] or [np.empty(0, dtype=np.int64)])
+
+
+# k-means centroids of a sample of the vectors (Lloyd's iterations)
+def train_centroids(vectors, lists, seed=0, iterations=TRAINING_ITERATIONS):
+    random = np.random.default_rng(seed)
+    sample = vectors[random.choice(len(vectors), min(len(vectors), lists * TRAINING_ROWS_PER_LIST), replace=False)]
+    centroids = sample[random.choice(len(sample), lists, replace=False)].copy()
+    for _ in range(iterations):
+        assigned = nearest_centroid(sample, centroids)
+        counts = np.bincount(assigned, minlength=lists)
+        sums = np.column_stack([np.bincount(assigned, weights=sample[:, dimension], minlength=lists)
+                                for dimension in range(sample.shape[1])])
+        # Empty lists keep their centroid
+        filled = counts > 0
+        centroids[filled] = (sums[filled] / counts[filled, None]).astype(np.float32)
+    return centroids
+
+
+# k-NN index over standardized agent profiles. Rows are grouped into inverted
+# lists by their nearest k-means centroid and stored list by list. Exact
+# searches scan every row; approximate ones scan the rows of the `probes`
+# lists whose centroids are nearest to the query (IVF), with `probes` tuned
+# at build time to reach TARGET_RECALL. Small datasets get one list, so
+# every search is exact.
+class ProfileIndex:
+    def __init__(self, data, lists=None, seed=0):
+        self.scaler = fit_scaler(data)
+        if lists is None:
+            lists = int(math.sqrt(len(data))) if len(data) >= APPROXIMATE_ROWS else 1
+        vectors = profile_vectors(data, self.scaler)
+        if lists > 1:
+            self.centroids = train_centroids(vectors, lists, seed)
+        else:
+            self.centroids = np.zeros((1, len(PROFILE_COLUMNS)), dtype=np.float32)
+        self.agent_ids = data['agent_id'].astype(str).to_numpy() if 'agent_id' in data else None
+        self._store(vectors, np.arange(len(data)))
+        self.probes = lists
+        if lists > 1:
+            self.tune(seed=seed)
+
+    # Keep the vectors grouped by list, with the positions of their rows
+    def _store(self, vectors, positions):
+        assigned = self._assign(vectors)
+        order = np.argsort(assigned, kind='stable')
+        self.vectors = vectors[order]
+        self.norms = (self.vectors * self.vectors).sum(axis=1)
+        self.positions = positions[order]
+        self.offsets = np.searchsorted(assigned[order], np.arange(len(self.centroids) + 1))
+        self._rows = None
+
+    def _assign(self, vectors):
+        if len(self.centroids) == 1:
+            return np.zeros(len(vectors), dtype=np.int64)
+        return nearest_centroid(vectors, self.centroids)
+
+    def __len__(self):
+        return len(self.vectors)
+
+    # Add rows appended to the dataset (positions continue after the indexed rows)
+    def extend(self, data):
+        vectors = np.concatenate([self.vectors, profile_vectors(data, self.scaler)])
+        positions = np.concatenate([self.positions, np.arange(len(self), len(self) + len(data))])
+        if self.agent_ids is not None:
+            self.agent_ids = np.concatenate([self.agent_ids, data['agent_id'].astype(str).to_numpy()])
+        self._store(vectors, positions)
+
+    # Row positions and squared distances of the k nearest rows to each query
+    # vector; exact scans every row, otherwise `probes` lists are searched
+    def search(self, queries, k, exact=False, probes=None, exclude=None):
+        probes = len(self.centroids) if exact else min(probes or self.probes, len(self.centroids))
+        if probes == len(self.centroids):
+            internal = None if exclude is None else self._internal(exclude)
+            rows, distances = exact_search(self.vectors, self.norms, queries, k, internal)
+            metrics.increment('profile_rows_scanned_total', len(self) * len(queries), method='exact')
+            return self.positions[rows], distances
+        nearest_lists = exact_search(self.centroids, (self.centroids * self.centroids).sum(axis=1), queries, probes)[0]
+        positions = np.full((len(queries), k), -1, dtype=np.int64)
+        distances = np.full((len(queries), k), np.inf, dtype=np.float32)
+        for number, query in enumerate(queries):
+            rows = np.concatenate([np.arange(self.offsets[probed], self.offsets[probed + 1])
+                                   for probed in nearest_lists[number]])
+            query_distances = self.norms[rows] - 2 * self.vectors[rows] @ query + query @ query
+            if exclude is not None and exclude[number] >= 0:
+                query_distances[self.positions[rows] == exclude[number]] = np.inf
+            chosen = _smallest(query_distances[None], k)[0]
+            positions[number, :len(chosen)] = self.positions[rows[chosen]]
+            distances[number, :len(chosen)] = np.maximum(query_distances[chosen], 0)
+            metrics.increment('profile_rows_scanned_total', len(rows), method='ivf')
+        return positions, distances
+
+    # Stored row numbers of the given positions (-1 stays -1)
+    def _internal(self, positions):
+        if self._rows is None:
+            self._rows = np.empty(len(self.positions), dtype=np.int64)
+            self._rows[self.positions] = np.arange(len(self.positions))
+        return np.where(positions >= 0, self._rows[np.maximum(positions, 0)], -1)
+
+    # Smallest number of probed lists whose results hold TARGET_RECALL of the
+    # exact neighbours of sampled rows: doubled until the target is reached,
+    # then bisected, so few probes are ever tried with many lists. The sample's
+    # recall must reach the target less its standard error (recall_bound), or
+    # probes fitted to the sample fall short on other queries.
+    def tune(self, target=TARGET_RECALL, queries=TUNING_QUERIES, k=10, seed=0):
+        sample = np.random.default_rng(seed).choice(len(self), min(queries, len(self)), replace=False)
+        vectors, exclude = self.vectors[sample], self.positions[sample]
+        truth, _ = self.search(vectors, k, exact=True, exclude=exclude)
+
+        def reaches(probes):
+            return recall_bound(self.search(vectors, k, probes=probes, exclude=exclude)[0], truth) >= target
+
+        probes = 1
+        while probes < len(self.centroids) and not reaches(probes):
+            probes *= 2
+        low, high = probes // 2 + 1, min(probes, len(self.centroids))
+        while low < high:
+            middle = (low + high) // 2
+            if reaches(middle):
+                high = middle
+            else:
+                low = middle + 1
+        self.probes = high
+        return high
+
+    # The k agents nearest to an agent's latest row, itself excluded
+    def like_agent(self, agent_id, k=5, exact=False):
+        matches = np.flatnonzero(self.agent_ids == str(agent_id))
+        if not len(matches):
+            raise KeyError(f"Unknown agent_id '{agent_id}'")
+        position = matches[-1:]
+        return self.search(self.vectors[self._internal(position)], k, exact, exclude=position)
+
+    # The k agents nearest to a profile given as {column: value}
+    def like_profile(self, profile, k=5, exact=False):
+        return self.search(profile_vectors([profile], self.scaler), k, exact)
+
+
+# Share of the exact neighbours found, per (queries, k) arrays of positions
+def recall(found, truth):
+    hits = sum(len(np.intersect1d(row, expected[expected >= 0])) for row, expected in zip(found, truth))
+    return hits / max(1, (truth >= 0).sum())
+
+
+# Lower bound of the recall of further queries like these: the mean recall
+# of the queries less two standard errors of it
+def recall_bound(found, truth):
+    expected = (truth >= 0).sum(axis=1)
+    hits = np.array([len(np.intersect1d(row, row_truth[row_truth >= 0])) for row, row_truth in zip(found, truth)])
+    shares = hits[expected > 0] / expected[expected > 0]
+    if len(shares) < 2:
+        return recall(found, truth)
+    return shares.mean() - 2 * shares.std(ddof=1) / math.sqrt(len(shares))
+
+
+# The found agents with their profile distance in a 'distance' column
+def nearest_agents(data, positions, distances):
+    found = positions >= 0
+    agents = data.iloc[positions[found]].copy()
+    agents['distance'] = np.sqrt(distances[found])
+    return agents
+
+
+# Chat message listing agents found by profile, from nearest_agents()
+def neighbors_text(agents, heading):
+    text = f"{heading}\n\n"
+    for number, agent in enumerate(agents.itertuples(index=False), 1):
+        text += f"{number}. {agent.agent_id}: {agent.agent_type} for {agent.task_category}"
+        text += f" (distance {agent.distance:.2f})\n"
+        text += f"   • Model: {agent.model_architecture}\n"
+        text += f"   • Accuracy: {agent.accuracy_score:.2f}, cost ${agent.cost_per_task_cents:.4f} per task\n"
+        text += f"   • Memory: {agent.memory_usage_mb:.0f} MB, CPU: {agent.cpu_usage_percent:.0f}%\n\n"
+    return text
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find the agents with the most similar numeric profiles")
+    parser.add_argument("--agent", help="agent_id whose profile is the query")
+    parser.add_argument("--profile", nargs="*", default=[], metavar="COLUMN=VALUE",
+                        help="custom profile; columns not given count as the dataset mean")
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--exact", action="store_true", help="scan every row even on large datasets")
+    parser.add_argument("--source", default=storage.SOURCE_PATH, help="dataset CSV")
+    args = parser.parse_args()
+
+    data = storage.load_dataset(source=args.source)
+    index = ProfileIndex(data)
+    if args.agent:
+        positions, distances = index.like_agent(args.agent, args.k, args.exact)
+    else:
+        profile = {}
+        for item in args.profile:
+            column, _, value = item.partition('=')
+            if column not in PROFILE_COLUMNS:
+                parser.error(f"unknown profile column '{column}', expected one of {PROFILE_COLUMNS}")
+            profile[column] = float(value)
+        positions, distances = index.like_profile(profile, args.k, args.exact)
+    agents = nearest_agents(data, positions[0], distances[0])
+    print(agents[['agent_id', 'agent_type', 'model_architecture', 'task_category', 'distance']].to_string(index=False))
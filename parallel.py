@@ -0,0 +1,113 @@
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+import pyarrow.feather as feather
+from pandas.api.types import union_categoricals
+
+import storage
+from similarity import encode_queries, top_k_batch, top_k_encoded
+
+# Shard inputs written for worker processes; removed once their results are merged
+SHARD_DIR = os.path.join(storage.CACHE_DIR, "shards")
+
+ENCODED_COLUMNS = ['task_complexity', 'autonomy_level', 'task_category']
+
+
+# Contiguous [start, stop) row ranges splitting `rows` rows into at most `shards` shards
+def shard_ranges(rows, shards):
+    bounds = np.linspace(0, rows, max(1, min(shards, rows)) + 1).astype(np.int64)
+    return [(int(start), int(stop)) for start, stop in zip(bounds[:-1], bounds[1:])]
+
+
+def _map_shard(function, path, start, stop):
+    # Each worker memory-maps the shared file and converts only its own rows
+    table = feather.read_table(path, memory_map=True).slice(start, stop - start)
+    return function(table.to_pandas(split_blocks=True))
+
+
+# Concatenate shard results in shard order, so the merge is deterministic
+def _merge(results, index):
+    if all(isinstance(result, pd.Categorical) for result in results):
+        # Sorted categories are what the serial run produces from np.unique
+        return union_categoricals(results, sort_categories=True)
+    merged = pd.concat(results, ignore_index=True)
+    merged.index = index
+    return merged
+
+
+# Apply a row-wise function (DataFrame -> Series or Categorical with one value
+# per row) over row shards in a pool of worker processes. The rows are written
+# once to an uncompressed Feather file that workers memory-map, instead of
+# pickling a DataFrame per shard; the result equals function(data).
+# function must be picklable: a module-level function or a functools.partial of one.
+def map_rows(function, data, workers=1):
+    if workers <= 1 or len(data) < 2:
+        return function(data)
+    os.makedirs(SHARD_DIR, exist_ok=True)
+    path = os.path.join(SHARD_DIR, f"{uuid.uuid4().hex}.feather")
+    feather.write_feather(data.reset_index(drop=True), path, compression='uncompressed')
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_map_shard, function, path, start, stop)
+                       for start, stop in shard_ranges(len(data), workers)]
+            results = [future.result() for future in futures]
+    finally:
+        os.remove(path)
+    return _merge(results, data.index)
+
+
+# Copy arrays into one shared memory block. Returns the block and its layout,
+# (name, dtype, shape, offset) per array, from which workers map them without copying.
+def _share(arrays):
+    block = shared_memory.SharedMemory(create=True, size=max(1, sum(array.nbytes for array in arrays.values())))
+    layout, offset = [], 0
+    for name, array in arrays.items():
+        np.ndarray(array.shape, array.dtype, buffer=block.buf, offset=offset)[...] = array
+        layout.append((name, array.dtype.str, array.shape, offset))
+        offset += array.nbytes
+    return block, layout
+
+
+def _top_k_shard(block_name, layout, start, stop, k):
+    block = shared_memory.SharedMemory(name=block_name)
+    try:
+        arrays = {name: np.ndarray(shape, dtype, buffer=block.buf, offset=offset)
+                  for name, dtype, shape, offset in layout}
+        encoded = {column: arrays[column][start:stop] for column in ENCODED_COLUMNS}
+        positions, scores = top_k_encoded(encoded, arrays['query_complexity'], arrays['query_autonomy'],
+                                          arrays['query_category'], k)
+        # The views must be released before the block can be closed
+        del arrays, encoded
+        return positions + start, scores
+    finally:
+        block.close()
+
+
+# top_k_batch over row shards in a pool of worker processes. The encoded
+# agents and queries are placed in shared memory; every worker ranks its own
+# rows and the per-shard candidates are merged by (score, row position), which
+# gives exactly the serial ranking.
+def top_k_batch_parallel(encoded, queries, k=5, workers=1):
+    if workers <= 1:
+        return top_k_batch(encoded, queries, k)
+    complexity, autonomy, category = encode_queries(encoded, queries)
+    arrays = {column: encoded[column] for column in ENCODED_COLUMNS}
+    arrays.update(query_complexity=complexity, query_autonomy=autonomy, query_category=category)
+    block, layout = _share(arrays)
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_top_k_shard, block.name, layout, start, stop, k)
+                       for start, stop in shard_ranges(len(encoded['task_complexity']), workers)]
+            results = [future.result() for future in futures]
+    finally:
+        block.close()
+        block.unlink()
+
+    positions = np.concatenate([result[0] for result in results], axis=1)
+    scores = np.concatenate([result[1] for result in results], axis=1)
+    order = np.lexsort((positions, -scores))[:, :min(k, positions.shape[1])]
+    return np.take_along_axis(positions, order, axis=1), np.take_along_axis(scores, order, axis=1)
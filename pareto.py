@@ -0,0 +1,221 @@
+import argparse
+
+import numpy as np
+
+import metrics
+import storage
+from gap_analysis import agent_records
+from similarity import encode_agents, neighborhood
+
+# Objectives a ranking can trade off, and whether higher or lower is better
+OBJECTIVES = {
+    'accuracy_score': 'max',
+    'success_rate': 'max',
+    'efficiency_score': 'max',
+    'cost_per_task_cents': 'min',
+    'response_latency_ms': 'min',
+    'execution_time_seconds': 'min',
+    'memory_usage_mb': 'min',
+}
+
+# Performance against cost: the agents no other matching agent beats on all three
+DEFAULT_OBJECTIVES = ['accuracy_score', 'cost_per_task_cents', 'response_latency_ms']
+
+# Candidates are the agents scoring within this many similarity points of
+# the best match: at most two more steps of complexity and autonomy from the
+# query than it, one on each axis or both on the same axis
+NEIGHBORHOOD_RADIUS = 4
+
+OBJECTIVE_LABELS = {
+    'accuracy_score': ('Accuracy', '{:.2f}'),
+    'success_rate': ('Success rate', '{:.2f}'),
+    'efficiency_score': ('Efficiency', '{:.2f}'),
+    'cost_per_task_cents': ('Cost', '${:.4f} per task'),
+    'response_latency_ms': ('Latency', '{:.0f} ms'),
+    'execution_time_seconds': ('Execution time', '{:.1f} s'),
+    'memory_usage_mb': ('Memory', '{:.0f} MB'),
+}
+
+
+# Objective values of the given rows as an (n, d) float array in which lower
+# is better for every column
+def objective_matrix(data, objectives):
+    unknown = [objective for objective in objectives if objective not in OBJECTIVES]
+    if unknown:
+        raise ValueError(f"Unknown objectives {unknown}, expected some of {list(OBJECTIVES)}")
+    columns = [data[objective].to_numpy(dtype=np.float64) for objective in objectives]
+    signs = np.array([-1.0 if OBJECTIVES[objective] == 'max' else 1.0 for objective in objectives])
+    return np.column_stack(columns) * signs if columns else np.empty((len(data), 0))
+
+
+# Non-dominated rows of two objectives: after sorting by the first, a row is
+# on the front if its second value beats every row with a smaller first value
+# and is the best among rows sharing its first value. O(n log n).
+def _front_2d(values):
+    order = np.lexsort((values[:, 1], values[:, 0]))
+    first, second = values[order, 0], values[order, 1]
+    starts = np.flatnonzero(np.r_[True, first[1:] != first[:-1]])
+    group_best = second[starts]
+    group = np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, len(order)]))
+    best_before = np.r_[np.inf, np.minimum.accumulate(group_best)[:-1]]
+    mask = np.zeros(len(values), dtype=bool)
+    mask[order] = (second == group_best[group]) & (second < best_before[group])
+    return mask
+
+
+# Non-dominated rows of three objectives (Kung et al.): rows are swept in
+# order of the first objective, and a row is dominated by an earlier one if
+# some earlier row has a second value at most its own and a third value at
+# most its own. A Fenwick tree over the ranks of the second values holds the
+# smallest third value of each prefix, so each row costs O(log n) to check
+# and add, O(n log n) in all. Rows sharing a first value are compared with
+# each other in two dimensions, and added once their group is checked.
+def _front_3d(values):
+    order = np.lexsort((values[:, 2], values[:, 1], values[:, 0]))
+    first = values[order, 0]
+    starts = np.r_[np.flatnonzero(np.r_[True, first[1:] != first[:-1]]), len(order)]
+    # 1-based rank of each row's second value among the distinct second values
+    distinct, ranks = np.unique(values[:, 1], return_inverse=True)
+    ranks = (ranks + 1).tolist()
+    thirds = values[:, 2].tolist()
+    best = [np.inf] * (len(distinct) + 1)
+    mask = np.zeros(len(values), dtype=bool)
+    for start, end in zip(starts[:-1], starts[1:]):
+        rows = order[start:end]
+        survivors = rows[_front_2d(values[rows, 1:])] if len(rows) > 1 else rows
+        kept = []
+        for row in survivors.tolist():
+            position, smallest = ranks[row], np.inf
+            while position:
+                smallest = min(smallest, best[position])
+                position &= position - 1
+            if smallest > thirds[row]:
+                kept.append(row)
+        mask[kept] = True
+        # Dominated rows need not be added: whatever they dominate, so does the row dominating them
+        for row in kept:
+            position, third = ranks[row], thirds[row]
+            while position < len(best):
+                if best[position] > third:
+                    best[position] = third
+                position += position & -position
+    return mask
+
+
+# Non-dominated rows of any number of objectives (sort-filter-skyline): rows
+# sorted by the sum of their values can only be dominated by earlier rows, so
+# each row is checked against the front found so far, a block at a time
+def _dominated(front, points):
+    return np.any(np.all(front[:, None] <= points, axis=2) & np.any(front[:, None] < points, axis=2), axis=0)
+
+
+def _front_nd(values, block=1024):
+    mask = np.zeros(len(values), dtype=bool)
+    front = np.empty((0, values.shape[1]))
+    order = np.argsort(values.sum(axis=1), kind='stable')
+    for start in range(0, len(order), block):
+        rows = order[start:start + block]
+        rows = rows[~_dominated(front, values[rows])]
+        kept = [row for number, row in enumerate(rows)
+                if not _dominated(values[rows[:number]], values[row][None])[0]]
+        front = np.vstack([front, values[kept]])
+        mask[kept] = True
+    return mask
+
+
+# Mask of the rows of an (n, d) array, lower being better in every column,
+# that no other row dominates (is at least as good in every column and better
+# in one). Rows with the same values are kept or dropped together.
+def pareto_front(values):
+    values = np.asarray(values, dtype=np.float64)
+    if not len(values) or values.shape[1] == 0:
+        return np.ones(len(values), dtype=bool)
+    if values.shape[1] == 1:
+        return values[:, 0] == values[:, 0].min()
+    if values.shape[1] == 2:
+        return _front_2d(values)
+    if values.shape[1] == 3:
+        return _front_3d(values)
+    return _front_nd(values)
+
+
+# Weighted score of each row in [0, 1]: objectives are scaled to the range
+# of the given rows, 1 being the best value, and averaged with the weights
+def weighted_scores(values, weights=None):
+    weights = np.ones(values.shape[1]) if weights is None else np.asarray(weights, dtype=np.float64)
+    if len(weights) != values.shape[1] or np.any(weights < 0) or not weights.sum():
+        raise ValueError("Expected one non-negative weight per objective, not all zero")
+    low, high = values.min(axis=0), values.max(axis=0)
+    spread = np.where(high > low, high - low, 1.0)
+    return ((high - values) / spread) @ (weights / weights.sum())
+
+
+# Pareto-optimal agents among those matching the query: candidates are the
+# agents scoring within `radius` similarity points of the best match, pruned
+# to the ones no other candidate dominates on the objectives, and ranked by
+# weighted score (ties by similarity, then row order). Returns up to k rows
+# (all of the front if k is None) with 'similarity' and 'pareto_score' columns.
+def pareto_rank(data, query, objectives=DEFAULT_OBJECTIVES, weights=None, radius=NEIGHBORHOOD_RADIUS, k=None,
+                encoded=None, index=None):
+    with metrics.span('pareto.neighborhood'):
+        if index is not None:
+            positions, scores = index.neighborhood(query, radius)
+        else:
+            if encoded is None:
+                encoded = encode_agents(data)
+            positions, scores = neighborhood(encoded, query, radius)
+    with metrics.span('pareto.front'):
+        values = objective_matrix(data.iloc[positions], objectives)
+        complete = ~np.isnan(values).any(axis=1)
+        positions, scores, values = positions[complete], scores[complete], values[complete]
+        on_front = pareto_front(values)
+        positions, scores, values = positions[on_front], scores[on_front], values[on_front]
+        ranking = weighted_scores(values, weights) if len(values) else np.empty(0)
+        order = np.lexsort((positions, -scores, -ranking))[:k]
+    metrics.increment('pareto_candidates_total', len(complete))
+    front = data.iloc[positions[order]].copy()
+    front['similarity'] = scores[order]
+    front['pareto_score'] = ranking[order]
+    return front
+
+
+# Chat message listing the agents of a Pareto front with their objectives
+def front_text(front, objectives=DEFAULT_OBJECTIVES):
+    names = [OBJECTIVE_LABELS[objective][0].lower() for objective in objectives]
+    names = ' and '.join([', '.join(names[:-1]), names[-1]] if len(names) > 1 else names)
+    text = f"Here are the agents matching your preferences that no other matching agent beats on {names}:\n\n"
+    records = agent_records(front, list(dict.fromkeys(['agent_type', 'task_category', 'model_architecture'] +
+                                                      list(objectives))))
+    for number, (agent, score) in enumerate(zip(records, front['pareto_score']), 1):
+        text += f"{number}. {agent['agent_type']} for {agent['task_category']} (score {score:.2f})\n"
+        text += f"   • Model: {agent['model_architecture']}\n"
+        for objective in objectives:
+            label, value_format = OBJECTIVE_LABELS[objective]
+            text += f"   • {label}: {value_format.format(agent[objective])}\n"
+        text += "\n"
+    return text
+
+
+# One-line stand-in for a Pareto front message in a chat summary
+def front_summary(front):
+    return "Pareto-optimal " + "; ".join(
+        f"{agent_type} ({model})" for agent_type, model in zip(front['agent_type'], front['model_architecture']))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rank the Pareto-optimal agents for a task")
+    parser.add_argument("--complexity", type=int, required=True)
+    parser.add_argument("--autonomy", type=int, required=True)
+    parser.add_argument("--category", required=True)
+    parser.add_argument("--objectives", nargs="+", default=DEFAULT_OBJECTIVES, choices=list(OBJECTIVES))
+    parser.add_argument("--weights", type=float, nargs="+", help="one weight per objective (default: equal)")
+    parser.add_argument("--radius", type=int, default=NEIGHBORHOOD_RADIUS,
+                        help="similarity points below the best match a candidate may score")
+    parser.add_argument("-k", type=int, help="agents to show (default: the whole front)")
+    parser.add_argument("--source", default=storage.SOURCE_PATH, help="dataset CSV")
+    args = parser.parse_args()
+
+    data = storage.load_dataset(source=args.source)
+    query = {'task_complexity': args.complexity, 'autonomy_level': args.autonomy, 'task_category': args.category}
+    front = pareto_rank(data, query, args.objectives, args.weights, args.radius, args.k)
+    print(front_text(front, args.objectives) if len(front) else "No agents match these preferences.")
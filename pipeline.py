@@ -0,0 +1,244 @@
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import metrics
+import storage
+
+STATE_PATH = os.path.join(storage.CACHE_DIR, "pipeline_state.json")
+LOG_DIR = os.path.join(storage.CACHE_DIR, "logs")
+
+# Library modules the stage scripts load their data through
+STORAGE_MODULES = ['storage.py', 'schema.py']
+
+# Manifests change when ingest.py appends rows, so stages reading a table see
+# new rows. They are outputs of the stage writing the table, which makes the
+# stages reading them depend on it.
+DATASET_ROWS = storage.manifest_path(storage.dataset_path())
+PROCESSED_ROWS = storage.manifest_path(storage.stage_path('processed'))
+RECOMMENDATION_ROWS = storage.manifest_path(storage.stage_path('recommendations'))
+INGESTED_ROWS = [DATASET_ROWS, PROCESSED_ROWS, RECOMMENDATION_ROWS]
+
+# Stages of the offline workflow. A stage depends on the stages producing its
+# inputs, and is up to date while its inputs hash to the recorded fingerprint
+# and its outputs are unchanged since it last ran.
+STAGES = [
+    {
+        'name': 'analyze',
+        'command': [sys.executable, 'analyze_dataset.py'],
+        'inputs': [storage.SOURCE_PATH, 'analyze_dataset.py', 'stats.py', 'parallel.py'] + STORAGE_MODULES,
+        'outputs': [storage.dataset_path(), storage.stage_path('processed'), DATASET_ROWS, PROCESSED_ROWS],
+    },
+    {
+        'name': 'recommend',
+        'command': [sys.executable, 'recommendation_model.py'],
+        'inputs': [storage.stage_path('processed'), PROCESSED_ROWS, 'recommendation_model.py', 'parallel.py'] + STORAGE_MODULES,
+        'outputs': [storage.stage_path('recommendations'), RECOMMENDATION_ROWS,
+                    os.path.join(storage.CACHE_DIR, "recommendation_rules.json")],
+    },
+    {
+        'name': 'answers',
+        'command': [sys.executable, 'answer_table.py'],
+        'inputs': [storage.dataset_path(), DATASET_ROWS, 'answer_table.py', 'similarity.py', 'gap_analysis.py']
+                  + STORAGE_MODULES,
+        'outputs': [os.path.join(storage.CACHE_DIR, "answers.json.gz")],
+    },
+    {
+        'name': 'trends',
+        'command': [sys.executable, 'trends.py'],
+        'inputs': [storage.dataset_path(), DATASET_ROWS, 'trends.py', 'stats.py'] + STORAGE_MODULES,
+        'outputs': [os.path.join(storage.CACHE_DIR, "trends.json.gz")],
+    },
+    {
+        'name': 'evaluate_model',
+        'command': [sys.executable, 'evaluate_model.py'],
+        'inputs': [storage.dataset_path(), storage.stage_path('processed'), storage.stage_path('recommendations'),
+                   'evaluate_model.py'] + STORAGE_MODULES + INGESTED_ROWS,
+        'outputs': ['evaluation_results.csv'],
+    },
+    {
+        'name': 'evaluate_metrics',
+        'command': [sys.executable, 'evaluate_metrics.py'],
+        'inputs': [storage.dataset_path(), storage.stage_path('processed'), storage.stage_path('recommendations'),
+                   'evaluate_metrics.py', 'labels.csv'] + STORAGE_MODULES + INGESTED_ROWS,
+        'outputs': [os.path.join(storage.CACHE_DIR, "evaluation_metrics.json")],
+    },
+]
+
+
+# Content hashes of files, memoized on (size, mtime) so unchanged files are not re-read
+class FileHasher:
+    def __init__(self, known=None):
+        self.known = known or {}
+
+    def digest(self, path):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        entry = self.known.get(path)
+        if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            return entry['sha256']
+        sha256 = hashlib.sha256()
+        with open(path, 'rb') as file:
+            for block in iter(lambda: file.read(1 << 20), b''):
+                sha256.update(block)
+        self.known[path] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': sha256.hexdigest()}
+        return self.known[path]['sha256']
+
+
+def fingerprint(stage, hasher):
+    payload = json.dumps({
+        'command': stage['command'][1:],
+        'inputs': {path: hasher.digest(path) for path in stage['inputs']},
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def load_state():
+    try:
+        with open(STATE_PATH, encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {'stages': {}, 'files': {}}
+
+
+def save_state(state):
+    with storage.atomic_write(STATE_PATH) as tmp_path, open(tmp_path, 'w', encoding='utf-8') as file:
+        json.dump(state, file, indent=2)
+
+
+def is_up_to_date(stage, record, current, hasher):
+    return (
+        record is not None
+        and record['fingerprint'] == current
+        and all(hasher.digest(path) == record['outputs'].get(path) for path in stage['outputs'])
+    )
+
+
+# Stage names each stage depends on, derived from inputs and outputs
+def dependencies(stages):
+    producers = {path: stage['name'] for stage in stages for path in stage['outputs']}
+    return {
+        stage['name']: {producers[path] for path in stage['inputs'] if producers.get(path, stage['name']) != stage['name']}
+        for stage in stages
+    }
+
+
+# Run a stage as a child process; returns (exit code, seconds, peak RSS in MB)
+def execute(stage):
+    os.makedirs(LOG_DIR, exist_ok=True)
+    start = time.perf_counter()
+    with open(os.path.join(LOG_DIR, f"{stage['name']}.log"), 'w', encoding='utf-8') as log:
+        process = subprocess.Popen(stage['command'], stdout=log, stderr=subprocess.STDOUT)
+        # wait4 reports the resource usage of this child alone, even with stages running in parallel
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+    return process.returncode, time.perf_counter() - start, usage.ru_maxrss / 1024
+
+
+# Stages whose outputs ingest.py extends with the rows it appends, computed
+# by the same code the stages run
+APPENDED_STAGES = ['analyze', 'recommend']
+
+
+# Keep stages up to date across an incremental append: a stage that was up to
+# date before the block is recorded with its new input and output hashes
+# after it, so the next run does not redo it over the whole history. Stages
+# reading the appended tables see their manifests change and run as usual.
+@contextlib.contextmanager
+def appending(names=APPENDED_STAGES, stages=STAGES):
+    state = load_state()
+    hasher = FileHasher(state['files'])
+    current = [stage for stage in stages if stage['name'] in names
+               and is_up_to_date(stage, state['stages'].get(stage['name']), fingerprint(stage, hasher), hasher)]
+    yield
+    for stage in current:
+        state['stages'][stage['name']] = {
+            'fingerprint': fingerprint(stage, hasher),
+            'outputs': {path: hasher.digest(path) for path in stage['outputs']},
+        }
+    save_state(state)
+
+
+# Run the selected stages and everything upstream of them, skipping stages
+# that are up to date and running independent stages in parallel
+def run(selected=None, force=False, jobs=os.cpu_count(), stages=STAGES):
+    by_name = {stage['name']: stage for stage in stages}
+    requires = dependencies(stages)
+    wanted = set(selected or by_name)
+    pending = list(wanted)
+    while pending:
+        for name in requires[pending.pop()]:
+            if name not in wanted:
+                wanted.add(name)
+                pending.append(name)
+
+    state = load_state()
+    hasher = FileHasher(state['files'])
+    report = {}
+    waiting = [stage['name'] for stage in stages if stage['name'] in wanted]
+    running = {}
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        while waiting or running:
+            for name in list(waiting):
+                if any(report.get(upstream, {}).get('status') in ('failed', 'blocked') for upstream in requires[name]):
+                    report[name] = {'status': 'blocked'}
+                    waiting.remove(name)
+                elif all(upstream in report for upstream in requires[name]):
+                    waiting.remove(name)
+                    stage = by_name[name]
+                    current = fingerprint(stage, hasher)
+                    if not force and is_up_to_date(stage, state['stages'].get(name), current, hasher):
+                        report[name] = {'status': 'skipped'}
+                        metrics.increment('pipeline_stages_total', stage=name, status='skipped')
+                    else:
+                        running[pool.submit(execute, stage)] = (name, current)
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name, current = running.pop(future)
+                code, seconds, peak_mb = future.result()
+                report[name] = {'status': 'ran' if code == 0 else 'failed', 'seconds': seconds, 'peak_mb': peak_mb}
+                metrics.increment('pipeline_stages_total', stage=name, status=report[name]['status'])
+                metrics.observe(f"pipeline.{name}", seconds)
+                if code == 0:
+                    state['stages'][name] = {
+                        'fingerprint': current,
+                        'outputs': {path: hasher.digest(path) for path in by_name[name]['outputs']},
+                    }
+                else:
+                    state['stages'].pop(name, None)
+    save_state(state)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the analysis pipeline, skipping up-to-date stages")
+    parser.add_argument("stages", nargs="*", help="stages to run (default: all)")
+    parser.add_argument("--force", action="store_true", help="run stages even if they are up to date")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="maximum stages running at once")
+    args = parser.parse_args()
+
+    unknown = [name for name in args.stages if name not in {stage['name'] for stage in STAGES}]
+    if unknown:
+        parser.error(f"unknown stages: {unknown}")
+
+    report = run(args.stages, force=args.force, jobs=args.jobs)
+    print(f"{'Stage':<18} {'Status':<8} {'Time':>9} {'Peak memory':>12}")
+    for stage in STAGES:
+        if stage['name'] in report:
+            result = report[stage['name']]
+            timing = f"{result['seconds']:.2f} s" if 'seconds' in result else '-'
+            memory = f"{result['peak_mb']:.0f} MB" if 'peak_mb' in result else '-'
+            print(f"{stage['name']:<18} {result['status']:<8} {timing:>9} {memory:>12}")
+    if any(result['status'] in ('failed', 'blocked') for result in report.values()):
+        print(f"Logs of failed stages are in {LOG_DIR}")
+        sys.exit(1)
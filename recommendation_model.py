@@ -1,26 +1,72 @@
-import pandas as pd
-import numpy as np
+import argparse
+import json
+import os
+from functools import partial
 
-# Load the processed dataset
-dataset_path = "processed_dataset.csv"
-data = pd.read_csv(dataset_path)
+import metrics
+from parallel import map_rows
+from rules import apply_rules, load_rules, rule_columns
+from storage import CACHE_DIR, atomic_write, load_dataset, load_stage, save_stage
 
-# Define a rule-based recommendation system
-def recommend_improvements(row):
-    recommendations = []
+# Define a rule-based recommendation system: each rule adds its text when its condition holds
+RULES = [
+    {
+        'when': {'column': 'weakest_metric', 'op': '==', 'value': 'success_rate'},
+        'text': "Focus on improving task-specific training.",
+    },
+    {
+        'when': {'column': 'weakest_metric', 'op': '==', 'value': 'accuracy_score'},
+        'text': "Enhance data quality and model fine-tuning.",
+    },
+    {
+        'when': {'column': 'weakest_metric', 'op': '==', 'value': 'efficiency_score'},
+        'text': "Optimize computational resources and algorithms.",
+    },
+]
 
-    if row['weakest_metric'] == 'success_rate':
-        recommendations.append("Focus on improving task-specific training.")
-    if row['weakest_metric'] == 'accuracy_score':
-        recommendations.append("Enhance data quality and model fine-tuning.")
-    if row['weakest_metric'] == 'efficiency_score':
-        recommendations.append("Optimize computational resources and algorithms.")
 
-    return ", ".join(recommendations)
+# Rule set the recommendations were last generated with, so that ingest.py
+# recommends appended rows with the same rules
+RULES_PATH = os.path.join(CACHE_DIR, "recommendation_rules.json")
 
-# Apply the recommendation system
-data['recommendations'] = data.apply(recommend_improvements, axis=1)
 
-# Save the dataset with recommendations
-data.to_csv("recommendations_dataset.csv", index=False)
-print("Recommendations added and saved to recommendations_dataset.csv")
\ No newline at end of file
+# Recommendations for every row of a DataFrame, as a Categorical
+def recommend(data, rules=RULES):
+    return apply_rules(data, rules)
+
+
+def save_rules(rules, path=RULES_PATH):
+    with atomic_write(path) as tmp_path, open(tmp_path, 'w', encoding='utf-8') as file:
+        json.dump(rules, file, indent=2)
+
+
+# The stored rule set, or the built-in rules for outputs made before it was stored
+def stage_rules(path=RULES_PATH):
+    return load_rules(path) if os.path.exists(path) else RULES
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate recommendations for every agent")
+    parser.add_argument("--rules", help="JSON file of rules to use instead of the built-in ones")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes applying the rules")
+    args = parser.parse_args()
+    metrics.profile_script('recommendation_model')
+    rules = load_rules(args.rules) if args.rules else RULES
+
+    # Load the weakest metric of each agent, plus any dataset columns the rules need
+    with metrics.span('recommendation_model.load'):
+        data = load_stage('processed')
+        dataset_columns = [column for column in rule_columns(rules) if column not in data]
+        if dataset_columns:
+            data = load_dataset(columns=dataset_columns, stages=['processed'])
+
+    # Apply the recommendation system
+    with metrics.span('recommendation_model.rules'):
+        data['recommendations'] = map_rows(partial(recommend, rules=rules), data, args.workers)
+    metrics.increment('rows_processed_total', len(data), stage='recommend')
+
+    # Save the recommendations column, keyed by agent_id and timestamp
+    with metrics.span('recommendation_model.save'):
+        path = save_stage('recommendations', data, ['recommendations'])
+        save_rules(rules)
+    print(f"Recommendations added and saved to {path}")
@@ -0,0 +1,109 @@
+import json
+import operator
+
+import numpy as np
+import pandas as pd
+
+# Rules are plain data: a condition and the recommendation text added when it
+# holds. A condition compares a column with a value,
+#     {"column": "cost_per_task_cents", "op": ">", "value": 0.03}
+# or combines conditions with {"all": [...]}, {"any": [...]} or {"not": {...}}.
+COMPARISONS = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    'in': lambda column, values: column.isin(values),
+    'not in': lambda column, values: ~column.isin(values),
+}
+
+# Text placed between the recommendations of a row when several rules fire
+SEPARATOR = ", "
+
+
+# Turn a condition into a function computing its boolean mask over a DataFrame
+def compile_condition(condition):
+    if 'all' in condition or 'any' in condition:
+        combine = np.logical_and if 'all' in condition else np.logical_or
+        parts = [compile_condition(part) for part in condition.get('all', condition.get('any'))]
+        if not parts:
+            raise ValueError(f"Empty rule condition: {condition}")
+        return lambda data: combine.reduce([part(data) for part in parts])
+    if 'not' in condition:
+        part = compile_condition(condition['not'])
+        return lambda data: ~part(data)
+
+    if condition.get('op') not in COMPARISONS or 'column' not in condition or 'value' not in condition:
+        raise ValueError(f"Invalid rule condition: {condition}")
+    compare, column, value = COMPARISONS[condition['op']], condition['column'], condition['value']
+
+    def mask(data):
+        if column not in data:
+            raise ValueError(f"Rule condition refers to missing column '{column}'")
+        # Missing values never satisfy a comparison
+        return (compare(data[column], value) & data[column].notna()).to_numpy(dtype=bool)
+    return mask
+
+
+# Columns read by a condition
+def condition_columns(condition):
+    if 'all' in condition or 'any' in condition:
+        parts = condition.get('all', condition.get('any'))
+    elif 'not' in condition:
+        parts = [condition['not']]
+    else:
+        return [condition['column']]
+    return [column for part in parts for column in condition_columns(part)]
+
+
+# Columns read by a rule set, in first-use order
+def rule_columns(rules):
+    return list(dict.fromkeys(column for rule in rules for column in condition_columns(rule['when'])))
+
+
+# Compile rules into a function returning a (rows, rules) matrix of boolean masks
+def compile_rules(rules):
+    conditions = [compile_condition(rule['when']) for rule in rules]
+
+    def masks(data):
+        if not conditions:
+            return np.zeros((len(data), 0), dtype=bool)
+        return np.column_stack([condition(data) for condition in conditions])
+    return masks
+
+
+# Recommendations of every row: the texts of the rules that hold, joined in
+# rule order. Rows are grouped by the combination of rules they satisfy, so
+# each distinct text is built once and the result is a Categorical of codes.
+def apply_rules(data, rules, separator=SEPARATOR):
+    masks = compile_rules(rules)(data)
+    if not len(data):
+        return pd.Categorical([])
+    packed = np.packbits(masks, axis=1, bitorder='little')
+    if packed.shape[1] <= 8:
+        # Up to 64 rules fit in one integer per row
+        keys = np.zeros((len(data), 8), dtype=np.uint8)
+        keys[:, :packed.shape[1]] = packed
+        combinations, inverse = np.unique(keys.view(np.uint64).ravel(), return_inverse=True)
+        combination_masks = np.unpackbits(combinations.view(np.uint8).reshape(-1, 8), axis=1,
+                                          count=len(rules), bitorder='little').astype(bool)
+    else:
+        combinations, inverse = np.unique(packed, axis=0, return_inverse=True)
+        combination_masks = np.unpackbits(combinations, axis=1, count=len(rules), bitorder='little').astype(bool)
+
+    texts = [separator.join(rule['text'] for rule, fired in zip(rules, row) if fired) for row in combination_masks]
+    categories, codes = np.unique(np.array(texts, dtype=object), return_inverse=True)
+    return pd.Categorical.from_codes(codes[inverse.ravel()], categories=categories)
+
+
+# Read rules from a JSON file holding a list of {"when": ..., "text": ...}
+def load_rules(path):
+    with open(path, encoding='utf-8') as file:
+        rules = json.load(file)
+    for rule in rules:
+        if 'when' not in rule or 'text' not in rule:
+            raise ValueError(f"{path}: every rule needs 'when' and 'text': {rule}")
+        compile_condition(rule['when'])
+    return rules
@@ -0,0 +1,127 @@
+import argparse
+
+import pandas as pd
+
+# Declared dtypes of the agent performance dataset, in file column order.
+# Scores bounded to [0, 1] (SCORE_COLUMNS) are float32, whose 7 significant
+# digits exceed the 4 decimals they are exported with; unbounded measurements
+# and ratios keep float64.
+SCHEMA = {
+    'agent_id': 'object',
+    'agent_type': 'category',
+    'model_architecture': 'category',
+    'deployment_environment': 'category',
+    'task_category': 'category',
+    'task_complexity': 'int8',
+    'autonomy_level': 'int8',
+    'success_rate': 'float32',
+    'accuracy_score': 'float32',
+    'efficiency_score': 'float32',
+    'execution_time_seconds': 'float64',
+    'response_latency_ms': 'float64',
+    'memory_usage_mb': 'float64',
+    'cpu_usage_percent': 'float64',
+    'cost_per_task_cents': 'float64',
+    'human_intervention_required': 'bool',
+    'error_recovery_rate': 'float32',
+    'multimodal_capability': 'bool',
+    'edge_compatibility': 'bool',
+    'privacy_compliance_score': 'float32',
+    'bias_detection_score': 'float32',
+    'timestamp': 'datetime64[ns]',
+    'data_quality_score': 'float32',
+    'performance_index': 'float32',
+    'cost_efficiency_ratio': 'float64',
+    'autonomous_capability_score': 'float64',
+}
+
+# Columns added by the pipeline stages
+DERIVED_SCHEMA = {
+    'weakest_metric': 'category',
+    'recommendations': 'category',
+}
+
+CATEGORICAL_COLUMNS = [column for column, dtype in SCHEMA.items() if dtype == 'category']
+DATETIME_COLUMNS = [column for column, dtype in SCHEMA.items() if dtype.startswith('datetime')]
+
+# Value ranges checked by validate()
+LEVEL_COLUMNS = ['task_complexity', 'autonomy_level']
+LEVEL_RANGE = (1, 10)
+SCORE_COLUMNS = [
+    'success_rate', 'accuracy_score', 'efficiency_score', 'error_recovery_rate',
+    'privacy_compliance_score', 'bias_detection_score', 'data_quality_score', 'performance_index',
+]
+SCORE_RANGE = (0.0, 1.0)
+
+
+# Check a file header against the schema before parsing any rows
+def validate_columns(columns):
+    problems = []
+    missing = [column for column in SCHEMA if column not in columns]
+    unexpected = [column for column in columns if column not in SCHEMA and column not in DERIVED_SCHEMA]
+    if missing:
+        problems.append(f"missing columns: {missing}")
+    if unexpected:
+        problems.append(f"unexpected columns: {unexpected}")
+    return problems
+
+
+# Check that a DataFrame has the declared columns, dtypes and value ranges.
+# Raises ValueError listing every problem found.
+def validate(data):
+    problems = validate_columns(list(data.columns))
+    declared = {**SCHEMA, **DERIVED_SCHEMA}
+    for column in data.columns:
+        if column in declared and str(data[column].dtype) != declared[column]:
+            problems.append(f"{column}: dtype {data[column].dtype}, expected {declared[column]}")
+    for columns, (low, high) in [(LEVEL_COLUMNS, LEVEL_RANGE), (SCORE_COLUMNS, SCORE_RANGE)]:
+        for column in columns:
+            if column in data and len(data) and (data[column].min() < low or data[column].max() > high):
+                problems.append(f"{column}: values outside [{low}, {high}]")
+    if problems:
+        raise ValueError("Dataset does not match the schema: " + "; ".join(problems))
+    return data
+
+
+# Convert the columns of a DataFrame to their declared dtypes
+def apply_schema(data):
+    declared = {**SCHEMA, **DERIVED_SCHEMA}
+    dtypes = {column: declared[column] for column in data.columns if column in declared}
+    return data.astype(dtypes)
+
+
+# Read a dataset CSV with the declared dtypes and validate it
+def read_csv(path, **kwargs):
+    problems = validate_columns(list(pd.read_csv(path, nrows=0).columns))
+    if problems:
+        raise ValueError(f"{path} does not match the schema: " + "; ".join(problems))
+    dtypes = {column: dtype for column, dtype in {**SCHEMA, **DERIVED_SCHEMA}.items()
+              if column not in DATETIME_COLUMNS}
+    try:
+        data = pd.read_csv(path, dtype=dtypes, parse_dates=DATETIME_COLUMNS, **kwargs)
+    except (TypeError, ValueError) as error:
+        raise ValueError(f"{path} does not match the schema: {error}") from error
+    if kwargs.get('chunksize'):
+        return (validate(chunk) for chunk in data)
+    return validate(data)
+
+
+# Deep memory usage per column before and after applying the schema
+def memory_report(before, after):
+    report = pd.DataFrame({
+        'before_bytes': before.memory_usage(index=False, deep=True),
+        'after_bytes': after.memory_usage(index=False, deep=True),
+    })
+    report.loc['total'] = report.sum()
+    report['ratio'] = (report['before_bytes'] / report['after_bytes']).round(2)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Validate a dataset CSV and report its memory footprint")
+    parser.add_argument("path", nargs="?", default="agentic_ai_performance_dataset_20250622.csv")
+    args = parser.parse_args()
+
+    before = pd.read_csv(args.path)
+    after = read_csv(args.path)
+    print(memory_report(before, after).to_string())
@@ -0,0 +1,320 @@
+import argparse
+import asyncio
+import contextlib
+import functools
+import json
+import tempfile
+import time
+from http import HTTPStatus
+from urllib.parse import parse_qsl, urlsplit
+
+import answer_table
+import metrics
+import storage
+from answer_table import K, QUERY_COLUMNS, answer_from_agents, answer_key
+from gap_analysis import AGENT_FIELDS, agent_records, has_similar_agents, research_prompt_from_records
+from llm_client import FakeBackend, LLMClient, ResponseCache, get_client
+from neighbors import PROFILE_COLUMNS
+from similarity import BucketIndex, most_similar
+
+HOST = "127.0.0.1"
+PORT = 8600
+
+# LLM calls in flight at once, requests allowed to wait for one, and how
+# long they wait before the service answers 503 instead
+MAX_LLM_CALLS = 8
+MAX_LLM_QUEUE = 64
+LLM_QUEUE_TIMEOUT = 30.0
+
+MAX_K = 50
+# Similar-agent results kept per (query, k)
+SIMILAR_CACHE_ENTRIES = 4096
+MAX_BODY_BYTES = 1 << 16
+# Idle keep-alive connections are closed after this many seconds
+IDLE_TIMEOUT = 15.0
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# Bounds the LLM calls in flight. Requests beyond the limit wait for a slot,
+# up to `queue` of them and `timeout` seconds each; any more are turned away
+# at once with 503, so a burst of users cannot pile up unbounded work.
+class AdmissionControl:
+    def __init__(self, limit=MAX_LLM_CALLS, queue=MAX_LLM_QUEUE, timeout=LLM_QUEUE_TIMEOUT):
+        self.queue = queue
+        self.timeout = timeout
+        self.waiting = 0
+        self._slots = asyncio.Semaphore(limit)
+
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        if self._slots.locked() and self.waiting >= self.queue:
+            metrics.increment('service_admission_total', result='rejected')
+            raise HTTPError(HTTPStatus.SERVICE_UNAVAILABLE, "Too many research requests waiting, retry later")
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            metrics.increment('service_admission_total', result='timeout')
+            raise HTTPError(HTTPStatus.SERVICE_UNAVAILABLE, "Timed out waiting for a research slot, retry later")
+        finally:
+            self.waiting -= 1
+        metrics.increment('service_admission_total', result='admitted')
+        try:
+            yield
+        finally:
+            self._slots.release()
+
+
+# Identical requests in flight share one computation of their response
+class Coalescer:
+    def __init__(self):
+        self.coalesced = 0
+        self._in_flight = {}
+
+    async def run(self, key, compute):
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(compute())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            self.coalesced += 1
+            metrics.increment('service_coalesced_total', endpoint=key[0])
+        # Shield the shared task so one client hanging up does not cancel it for the others
+        return await asyncio.shield(task)
+
+
+# A {task_complexity, autonomy_level, task_category} query from request parameters
+def parse_query(params):
+    missing = [field for field in QUERY_COLUMNS if field not in params]
+    if missing:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"Missing query parameters {missing}")
+    try:
+        return {
+            'task_complexity': int(params['task_complexity']),
+            'autonomy_level': int(params['autonomy_level']),
+            'task_category': str(params['task_category']),
+        }
+    except (TypeError, ValueError):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "task_complexity and autonomy_level must be integers")
+
+
+def parse_k(params):
+    try:
+        k = int(params.get('k', K))
+    except (TypeError, ValueError):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "k must be an integer")
+    if not 1 <= k <= MAX_K:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"k must be between 1 and {MAX_K}")
+    return k
+
+
+# Gap analysis over one warm copy of the dataset, its similarity index and
+# the answer table, loaded at start-up and shared by every request
+class GapService:
+    def __init__(self, source=storage.SOURCE_PATH, client=None):
+        data = storage.load_dataset(source=source)
+        self.data = data
+        self.index = BucketIndex(data)
+        self.answers = answer_table.ensure(data, index=self.index)
+        self.vocabularies = {column: sorted(data[column].unique().tolist()) for column in QUERY_COLUMNS}
+        self.medians = {column: float(data[column].astype(float).median()) for column in PROFILE_COLUMNS}
+        self.client = client or get_client()
+        self.admission = AdmissionControl()
+        self.coalescer = Coalescer()
+        # The dataset does not change while serving, so results can be kept
+        self._similar_records = functools.lru_cache(SIMILAR_CACHE_ENTRIES)(self._similar_records)
+        self.routes = {
+            '/similar': self.similar,
+            '/recommendations': self.recommendations,
+            '/research': self.research,
+            '/vocabularies': self.vocabulary,
+        }
+
+    # Records of the k agents most similar to a query, or [] if none is similar.
+    # Converting a few rows to records costs more than finding them.
+    def _similar_records(self, task_complexity, autonomy_level, task_category, k):
+        query = {'task_complexity': task_complexity, 'autonomy_level': autonomy_level, 'task_category': task_category}
+        similar_agents = most_similar(self.data, query, k=k, index=self.index)
+        if not has_similar_agents(similar_agents):
+            return []
+        return agent_records(similar_agents, ['agent_id'] + AGENT_FIELDS + ['similarity'])
+
+    def similar_records(self, query, k=K):
+        return self._similar_records(query['task_complexity'], query['autonomy_level'], query['task_category'], k)
+
+    async def similar(self, params):
+        query = parse_query(params)
+        return {'query': query, 'agents': self.similar_records(query, parse_k(params))}
+
+    async def recommendations(self, params):
+        query = parse_query(params)
+        if answer_key(query) in self.answers:
+            metrics.increment('answer_lookups_total', result='hit')
+            answer = self.answers[answer_key(query)]
+        else:
+            metrics.increment('answer_lookups_total', result='miss')
+            answer = answer_from_agents(most_similar(self.data, query, k=K, index=self.index))
+        return {'query': query, 'answer': answer}
+
+    async def research(self, params):
+        query = parse_query(params)
+        agents = self.similar_records(query)
+        if not agents:
+            return {'query': query, 'agents': [], 'research_suggestion': None}
+        prompt = research_prompt_from_records([{field: agent[field] for field in AGENT_FIELDS} for agent in agents])
+        messages = [{"role": "user", "content": prompt}]
+        # Cached answers need no LLM call, so only misses wait for a slot
+        suggestion = self.client.cached(messages)
+        if suggestion is None:
+            async with self.admission.slot():
+                suggestion = await self.client.complete(messages)
+        return {'query': query, 'agents': agents, 'research_suggestion': suggestion}
+
+    def health(self):
+        return {'status': 'ok', 'agents': len(self.data), 'coalesced': self.coalescer.coalesced,
+                'research_waiting': self.admission.waiting, 'llm': self.client.stats}
+
+    async def vocabulary(self, params):
+        return {'vocabularies': self.vocabularies, 'medians': self.medians}
+
+    # JSON-ready response to a request; identical requests in flight are coalesced
+    async def respond(self, path, params):
+        handler = self.routes.get(path)
+        if handler is None:
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"Unknown endpoint {path}")
+        key = (path, tuple(sorted((name, str(value)) for name, value in params.items())))
+        with metrics.span(f"service{path.replace('/', '.')}"):
+            return await self.coalescer.run(key, lambda: handler(params))
+
+
+async def _read_request(reader):
+    request_line = await asyncio.wait_for(reader.readline(), IDLE_TIMEOUT)
+    if not request_line:
+        return None
+    try:
+        method, target, version = request_line.decode('latin-1').split()
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Malformed request line")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get('content-length') or 0)
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Content-Length must be an integer")
+    if length < 0:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Content-Length must not be negative")
+    if length > MAX_BODY_BYTES:
+        raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body too large")
+    body = await reader.readexactly(length) if length else b''
+    return method, target, version, headers, body
+
+
+def _response(status, body, keep_alive, content_type='application/json'):
+    payload = body if isinstance(body, bytes) else json.dumps(body).encode('utf-8')
+    headers = [
+        f"HTTP/1.1 {status.value} {status.phrase}",
+        f"Content-Type: {content_type}",
+        f"Content-Length: {len(payload)}",
+        f"Connection: {'keep-alive' if keep_alive else 'close'}",
+    ]
+    if status == HTTPStatus.SERVICE_UNAVAILABLE:
+        headers.append("Retry-After: 1")
+    return ('\r\n'.join(headers) + '\r\n\r\n').encode('latin-1') + payload
+
+
+# Serve HTTP/1.1 requests of one connection, keeping it open between requests.
+# Parameters come from the query string or, for POST, a JSON object body.
+async def handle_connection(service, reader, writer):
+    try:
+        while True:
+            keep_alive, endpoint = False, 'other'
+            try:
+                request = await _read_request(reader)
+                if request is None:
+                    break
+                method, target, version, headers, body = request
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                url = urlsplit(target)
+                if url.path in service.routes or url.path in ('/metrics', '/health'):
+                    endpoint = url.path
+                if url.path == '/metrics':
+                    status, result, content_type = HTTPStatus.OK, metrics.render().encode('utf-8'), 'text/plain'
+                elif url.path == '/health':
+                    status, result, content_type = HTTPStatus.OK, service.health(), 'application/json'
+                elif method not in ('GET', 'POST'):
+                    raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, f"Method {method} not allowed")
+                else:
+                    params = dict(parse_qsl(url.query))
+                    if method == 'POST' and body:
+                        try:
+                            params.update(json.loads(body))
+                        except (ValueError, TypeError):
+                            raise HTTPError(HTTPStatus.BAD_REQUEST, "Body must be a JSON object")
+                    status, result, content_type = HTTPStatus.OK, await service.respond(url.path, params), \
+                        'application/json'
+            except HTTPError as error:
+                status, result, content_type = HTTPStatus(error.status), {'error': str(error)}, 'application/json'
+            except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                break
+            except Exception as error:
+                status, result, content_type = HTTPStatus.INTERNAL_SERVER_ERROR, {'error': repr(error)}, \
+                    'application/json'
+            metrics.increment('service_requests_total', endpoint=endpoint, status=status.value)
+            writer.write(_response(status, result, keep_alive, content_type))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(service, host=HOST, port=PORT):
+    server = await asyncio.start_server(lambda reader, writer: handle_connection(service, reader, writer), host, port)
+    print(f"Serving gap analysis on http://{host}:{port} (/similar, /recommendations, /research)", flush=True)
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve gap analysis as a JSON API")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--source", default=storage.SOURCE_PATH, help="dataset CSV")
+    parser.add_argument("--llm-calls", type=int, default=MAX_LLM_CALLS, help="LLM calls in flight at once")
+    parser.add_argument("--llm-queue", type=int, default=MAX_LLM_QUEUE, help="research requests allowed to wait")
+    parser.add_argument("--fake-llm", type=float, metavar="SECONDS",
+                        help="answer research requests with a canned text after this delay (for load tests)")
+    args = parser.parse_args()
+
+    if args.fake_llm is not None:
+        # Echo the prompt so distinct queries get distinct answers, and cache them apart from real ones
+        client = LLMClient(FakeBackend(lambda model, messages: f"Suggestions for: {messages[-1]['content'][:80]}",
+                                       delay=args.fake_llm),
+                           ResponseCache(tempfile.mkdtemp(prefix="fake_llm_")))
+    else:
+        # openai is imported on the first research request and reads OPENAI_API_KEY then
+        client = None
+    # /metrics is served here, so collect even without AGENT_METRICS_DIR or AGENT_METRICS_PORT
+    metrics.enable()
+    start = time.perf_counter()
+
+    async def main():
+        service = GapService(args.source, client)
+        service.admission = AdmissionControl(args.llm_calls, args.llm_queue)
+        print(f"Loaded {len(service.data)} agents in {time.perf_counter() - start:.1f} s", flush=True)
+        await serve(service, args.host, args.port)
+
+    asyncio.run(main())
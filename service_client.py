@@ -0,0 +1,57 @@
+import json
+import urllib.error
+import urllib.parse
+import urllib.request
+
+# Seconds to wait for a response; research calls the LLM, so allow for it
+TIMEOUT = 120
+
+
+# A request the service answered with an error status
+class ServiceError(Exception):
+    def __init__(self, status, message):
+        super().__init__(f"{status}: {message}")
+        self.status = status
+
+
+# Blocking client of service.py, for the Streamlit app and scripts. Network
+# failures raise OSError (urllib.error.URLError), error responses ServiceError.
+class ServiceClient:
+    def __init__(self, url, timeout=TIMEOUT):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+
+    def _get(self, path, **params):
+        url = f"{self.url}{path}"
+        if params:
+            url += '?' + urllib.parse.urlencode(params)
+        try:
+            with urllib.request.urlopen(url, timeout=self.timeout) as response:
+                return json.load(response)
+        except urllib.error.HTTPError as error:
+            try:
+                message = json.load(error).get('error', error.reason)
+            except ValueError:
+                message = error.reason
+            raise ServiceError(error.code, message) from None
+
+    # Dataset size, waiting research requests and counts of coalesced and cached calls
+    def health(self):
+        return self._get('/health')
+
+    # Sidebar choices and the medians of the profile columns
+    def vocabularies(self):
+        result = self._get('/vocabularies')
+        return result['vocabularies'], result['medians']
+
+    # Records of the k agents most similar to the query (empty if none is similar)
+    def similar(self, query, k=5):
+        return self._get('/similar', k=k, **query)['agents']
+
+    # Precomputed recommendation answer for the query, or None
+    def recommendations(self, query):
+        return self._get('/recommendations', **query)['answer']
+
+    # Similar agents and the LLM's research suggestion for them
+    def research(self, query):
+        return self._get('/research', **query)
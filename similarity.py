@@ -0,0 +1,228 @@
+import numpy as np
+import pandas as pd
+
+import metrics
+
+# Weights of the agent similarity score: every step of difference in
+# complexity or autonomy costs 2 points, a matching task category adds 5
+COMPLEXITY_WEIGHT = 2
+AUTONOMY_WEIGHT = 2
+CATEGORY_BONUS = 5
+
+# Upper bound on the number of scores held in memory per batch block
+BLOCK_ELEMENTS = 1 << 22
+
+
+# Integer-encode the columns the similarity score depends on
+def encode_agents(data):
+    categories = pd.Categorical(data['task_category'].astype(str))
+    return {
+        'task_complexity': data['task_complexity'].to_numpy(dtype=np.int64),
+        'autonomy_level': data['autonomy_level'].to_numpy(dtype=np.int64),
+        'task_category': categories.codes.astype(np.int64),
+        'categories': list(categories.categories),
+    }
+
+
+# Encode one query or a batch of queries (list of dicts or DataFrame) into arrays
+def encode_queries(encoded, queries):
+    if isinstance(queries, dict):
+        queries = [queries]
+    if isinstance(queries, pd.DataFrame):
+        queries = queries.to_dict(orient='records')
+    lookup = {category: code for code, category in enumerate(encoded['categories'])}
+    complexity = np.array([int(q['task_complexity']) for q in queries], dtype=np.int64)
+    autonomy = np.array([int(q['autonomy_level']) for q in queries], dtype=np.int64)
+    # Unknown categories get code -1 and never earn the category bonus
+    category = np.array([lookup.get(str(q['task_category']), -1) for q in queries], dtype=np.int64)
+    return complexity, autonomy, category
+
+
+# Similarity scores of every agent for a block of encoded queries, shape (queries, agents)
+def _block_scores(encoded, complexity, autonomy, category):
+    scores = -COMPLEXITY_WEIGHT * np.abs(encoded['task_complexity'][None, :] - complexity[:, None])
+    scores -= AUTONOMY_WEIGHT * np.abs(encoded['autonomy_level'][None, :] - autonomy[:, None])
+    scores += CATEGORY_BONUS * (encoded['task_category'][None, :] == category[:, None])
+    return scores
+
+
+# Similarity score of every agent for a single query
+def similarity_scores(encoded, query):
+    return _block_scores(encoded, *encode_queries(encoded, query))[0]
+
+
+# Top-k agent positions and scores for a batch of queries.
+# Ties are broken by row order, so the ranking matches a stable descending sort.
+def top_k_batch(encoded, queries, k=5):
+    return top_k_encoded(encoded, *encode_queries(encoded, queries), k=k)
+
+
+# top_k_batch for queries already encoded by encode_queries
+def top_k_encoded(encoded, complexity, autonomy, category, k=5):
+    n = len(encoded['task_complexity'])
+    metrics.increment('similarity_rows_scanned_total', n * len(complexity), method='scan')
+    k = min(k, n)
+    positions = np.empty((len(complexity), k), dtype=np.int64)
+    scores = np.empty((len(complexity), k), dtype=np.int64)
+    if k == 0:
+        return positions, scores
+
+    # Fold the row order into the score so every key is unique and
+    # argpartition selects exactly the rows a stable sort would keep
+    tiebreak = np.arange(n - 1, -1, -1, dtype=np.int64)
+    block = max(1, BLOCK_ELEMENTS // n)
+    for start in range(0, len(complexity), block):
+        stop = start + block
+        keys = _block_scores(encoded, complexity[start:stop], autonomy[start:stop], category[start:stop])
+        keys *= n
+        keys += tiebreak
+        best = np.argpartition(keys, n - k, axis=1)[:, n - k:]
+        order = np.argsort(-np.take_along_axis(keys, best, axis=1), axis=1)
+        best = np.take_along_axis(best, order, axis=1)
+        positions[start:stop] = best
+        scores[start:stop] = np.take_along_axis(keys, best, axis=1) // n
+    return positions, scores
+
+
+# Top-k agent positions and scores for a single query
+def top_k(encoded, query, k=5):
+    positions, scores = top_k_batch(encoded, [query], k)
+    return positions[0], scores[0]
+
+
+# Positions (in row order) and scores of the agents scoring within `radius`
+# points of the best score for a query
+def neighborhood(encoded, query, radius):
+    scores = similarity_scores(encoded, query)
+    metrics.increment('similarity_rows_scanned_total', len(scores), method='scan')
+    if not len(scores):
+        return np.empty(0, dtype=np.int64), scores
+    positions = np.flatnonzero(scores >= scores.max() - radius)
+    return positions, scores[positions]
+
+
+# Agent rows grouped by their (task_complexity, autonomy_level, task_category) key.
+# Every row of a bucket has the same score for a given query, so top-k queries
+# walk the buckets from best to worst score and stop once k rows are collected.
+class BucketIndex:
+    def __init__(self, data=None):
+        self._buckets = {}
+        self._counts = {}
+        self._size = 0
+        self._keys = None
+        if data is not None:
+            self.extend(data)
+
+    def __len__(self):
+        return self._size
+
+    # Index new rows; their positions continue after the rows already indexed
+    def extend(self, data):
+        frame = pd.DataFrame({
+            'task_complexity': data['task_complexity'].to_numpy(dtype=np.int64),
+            'autonomy_level': data['autonomy_level'].to_numpy(dtype=np.int64),
+            'task_category': data['task_category'].astype(str).to_numpy(),
+        })
+        groups = frame.groupby(['task_complexity', 'autonomy_level', 'task_category'], sort=False).indices
+        for (complexity, autonomy, category), rows in groups.items():
+            key = (int(complexity), int(autonomy), str(category))
+            # Positions only grow, so each bucket stays sorted by row order
+            self._buckets.setdefault(key, []).append(rows.astype(np.int64) + self._size)
+            self._counts[key] = self._counts.get(key, 0) + len(rows)
+        self._size += len(frame)
+        self._keys = None
+
+    # Independent index over the same rows; extending the copy leaves this one unchanged
+    def copy(self):
+        index = BucketIndex()
+        index._buckets = {key: list(chunks) for key, chunks in self._buckets.items()}
+        index._counts = dict(self._counts)
+        index._size = self._size
+        return index
+
+    # Number of rows per bucket
+    def counts(self):
+        return pd.DataFrame(
+            [key + (count,) for key, count in self._counts.items()],
+            columns=['task_complexity', 'autonomy_level', 'task_category', 'count'],
+        )
+
+    def _key_arrays(self):
+        if self._keys is None:
+            keys = list(self._buckets)
+            self._keys = (
+                keys,
+                np.array([key[0] for key in keys], dtype=np.int64),
+                np.array([key[1] for key in keys], dtype=np.int64),
+                np.array([key[2] for key in keys], dtype=object),
+            )
+        return self._keys
+
+    # First n row positions of a bucket
+    def _head(self, key, n):
+        rows, total = [], 0
+        for chunk in self._buckets[key]:
+            rows.append(chunk[:n - total])
+            total += len(rows[-1])
+            if total >= n:
+                break
+        return np.concatenate(rows)
+
+    # Top-k agent positions and scores, ranked like top_k()
+    def top_k(self, query, k=5):
+        keys, complexity, autonomy, category = self._key_arrays()
+        scores = -COMPLEXITY_WEIGHT * np.abs(complexity - int(query['task_complexity']))
+        scores -= AUTONOMY_WEIGHT * np.abs(autonomy - int(query['autonomy_level']))
+        scores += CATEGORY_BONUS * (category == str(query['task_category']))
+        order = np.argsort(-scores, kind='stable')
+
+        positions, result_scores = [], []
+        need = min(k, self._size)
+        start = 0
+        while need > 0:
+            level = scores[order[start]]
+            stop = start
+            while stop < len(order) and scores[order[stop]] == level:
+                stop += 1
+            # Rows with equal scores are ranked by row order across all buckets of the level
+            candidates = np.sort(np.concatenate([self._head(keys[b], need) for b in order[start:stop]]))
+            metrics.increment('similarity_rows_scanned_total', len(candidates), method='index')
+            taken = candidates[:need]
+            positions.append(taken)
+            result_scores.append(np.full(len(taken), level, dtype=np.int64))
+            need -= len(taken)
+            start = stop
+        if not positions:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        return np.concatenate(positions), np.concatenate(result_scores)
+
+    # Positions (in row order) and scores of the rows of every bucket scoring
+    # within `radius` points of the best bucket, like neighborhood()
+    def neighborhood(self, query, radius):
+        keys, complexity, autonomy, category = self._key_arrays()
+        if not keys:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        scores = -COMPLEXITY_WEIGHT * np.abs(complexity - int(query['task_complexity']))
+        scores -= AUTONOMY_WEIGHT * np.abs(autonomy - int(query['autonomy_level']))
+        scores += CATEGORY_BONUS * (category == str(query['task_category']))
+        selected = np.flatnonzero(scores >= scores.max() - radius)
+        positions = [np.concatenate(self._buckets[keys[bucket]]) for bucket in selected]
+        row_scores = [np.full(len(rows), scores[bucket], dtype=np.int64) for bucket, rows in zip(selected, positions)]
+        positions, row_scores = np.concatenate(positions), np.concatenate(row_scores)
+        metrics.increment('similarity_rows_scanned_total', len(positions), method='index')
+        order = np.argsort(positions, kind='stable')
+        return positions[order], row_scores[order]
+
+
+# The k agents most similar to the query, with their score in a 'similarity' column.
+# Uses the bucket index when one is given, otherwise scans the encoded columns.
+def most_similar(data, query, k=5, encoded=None, index=None):
+    if index is not None:
+        positions, scores = index.top_k(query, k)
+    else:
+        if encoded is None:
+            encoded = encode_agents(data)
+        positions, scores = top_k(encoded, query, k)
+    similar_agents = data.iloc[positions].copy()
+    similar_agents['similarity'] = scores
+    return similar_agents
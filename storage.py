@@ -0,0 +1,183 @@
+import contextlib
+import glob
+import json
+import os
+import uuid
+
+import pyarrow as pa
+import pyarrow.feather as feather
+
+import metrics
+import schema
+
+SOURCE_PATH = "agentic_ai_performance_dataset_20250622.csv"
+CACHE_DIR = "cache"
+
+# Rows are identified by agent and run time; stage outputs only hold the
+# columns a stage adds, joined back on these keys
+KEY_COLUMNS = ['agent_id', 'timestamp']
+
+
+# Path of the columnar copy of a source CSV
+def dataset_path(source=SOURCE_PATH):
+    name = os.path.splitext(os.path.basename(source))[0]
+    return os.path.join(CACHE_DIR, f"{name}.feather")
+
+
+# Path of the columns written by a pipeline stage
+def stage_path(stage):
+    return os.path.join(CACHE_DIR, f"{stage}.feather")
+
+
+# A table is a base Feather file plus parts appended by incremental ingestion,
+# listed with their row counts and timestamp ranges in a manifest next to it
+def manifest_path(path):
+    return f"{os.path.splitext(path)[0]}.manifest.json"
+
+
+# Path of a temporary file to write in place of `path`, renamed over it when
+# the block ends without error, so readers see the old or the new file and
+# never a partial one. The temporary name is unique, so concurrent writers
+# (threads or processes) never share one; the last rename wins.
+@contextlib.contextmanager
+def atomic_write(path):
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _write(data, path):
+    # Uncompressed so that reads can memory-map the file instead of decoding it
+    with atomic_write(path) as tmp_path:
+        feather.write_feather(data, tmp_path, compression='uncompressed')
+
+
+def _part_entry(data, path):
+    entry = {'path': path, 'rows': len(data)}
+    if 'timestamp' in data and len(data):
+        entry['min_timestamp'] = str(data['timestamp'].min())
+        entry['max_timestamp'] = str(data['timestamp'].max())
+    return entry
+
+
+def _save_manifest(path, parts):
+    with atomic_write(manifest_path(path)) as tmp_path, open(tmp_path, 'w', encoding='utf-8') as file:
+        json.dump({'parts': parts}, file, indent=2)
+
+
+# Entries of a table's files, base file first
+def table_parts(path):
+    try:
+        with open(manifest_path(path), encoding='utf-8') as file:
+            return json.load(file)['parts']
+    except FileNotFoundError:
+        return [{'path': path}]
+
+
+# Replace a table with the given rows, dropping previously appended parts
+def _write_table(data, path):
+    for part in glob.glob(f"{os.path.splitext(path)[0]}.part-*.feather"):
+        os.remove(part)
+    _write(data, path)
+    _save_manifest(path, [_part_entry(data, path)])
+
+
+# Append rows to a table as a new part file
+def _append_table(data, path):
+    parts = table_parts(path)
+    part_path = f"{os.path.splitext(path)[0]}.part-{len(parts):05d}.feather"
+    _write(data, part_path)
+    _save_manifest(path, parts + [_part_entry(data, part_path)])
+    return part_path
+
+
+# Read table files as one DataFrame (memory-mapped, restricted to the requested columns)
+def read_parts(paths, columns=None):
+    with metrics.span('storage.read'):
+        tables = [feather.read_table(path, columns=columns, memory_map=True) for path in paths]
+        table = tables[0] if len(tables) == 1 else pa.concat_tables(tables)
+        metrics.increment('rows_loaded_total', table.num_rows)
+        return table.to_pandas(split_blocks=True)
+
+
+# Whether a converted file stores the numeric columns with their declared
+# dtypes (files written before a schema change do not)
+def _has_declared_types(path):
+    stored = pa.ipc.open_file(pa.memory_map(path)).schema
+    return all(stored.field(column).type == pa.from_numpy_dtype(dtype)
+               for column, dtype in schema.SCHEMA.items()
+               if dtype.startswith(('int', 'float', 'bool')) and column in stored.names)
+
+
+# Convert the source CSV into a Feather file with the declared schema (once, or
+# when the CSV is newer or the schema has changed). The CSV is the full export,
+# so a rebuild drops rows appended by ingestion since the previous conversion.
+# A deployment may ship only the converted files; without the CSV they are used
+# as they are.
+def convert(source=SOURCE_PATH, force=False):
+    path = dataset_path(source)
+    if not force and os.path.exists(path) and (not os.path.exists(source)
+                                               or (os.path.getmtime(path) >= os.path.getmtime(source)
+                                                   and _has_declared_types(path))):
+        return path
+    # Categorical columns are written as dictionary-encoded arrays
+    _write_table(schema.read_csv(source), path)
+    return path
+
+
+# Modification time of a dataset's source CSV, or of its converted copy when
+# only that was shipped (FileNotFoundError if neither exists)
+def source_mtime(source=SOURCE_PATH):
+    try:
+        return os.path.getmtime(source)
+    except FileNotFoundError:
+        return os.path.getmtime(dataset_path(source))
+
+
+# Load the dataset, restricted to the requested columns, joined with stage outputs
+def load_dataset(columns=None, stages=(), source=SOURCE_PATH):
+    if columns is not None and stages:
+        columns = [key for key in KEY_COLUMNS if key not in columns] + list(columns)
+    path = convert(source)
+    data = read_parts([part['path'] for part in table_parts(path)], columns)
+    for stage in stages:
+        data = data.merge(load_stage(stage), on=KEY_COLUMNS, how='left')
+    return data
+
+
+# Replace the stored dataset with the given rows (the first chunk of a
+# streamed conversion; later chunks are added with append_dataset)
+def write_dataset(data, source=SOURCE_PATH):
+    path = dataset_path(source)
+    _write_table(schema.apply_schema(data.reset_index(drop=True)), path)
+    return path
+
+
+# Append new rows to the stored dataset
+def append_dataset(data, source=SOURCE_PATH):
+    return _append_table(schema.apply_schema(data.reset_index(drop=True)), convert(source))
+
+
+# Save the columns a stage adds, keyed by agent_id and timestamp
+def save_stage(stage, data, columns):
+    path = stage_path(stage)
+    _write_table(schema.apply_schema(data[KEY_COLUMNS + list(columns)].reset_index(drop=True)), path)
+    return path
+
+
+# Append the stage columns of newly ingested rows
+def append_stage(stage, data, columns):
+    return _append_table(schema.apply_schema(data[KEY_COLUMNS + list(columns)].reset_index(drop=True)), stage_path(stage))
+
+
+# Load the columns written by a stage, optionally restricted to some of them
+def load_stage(stage, columns=None):
+    if columns is not None:
+        columns = [key for key in KEY_COLUMNS if key not in columns] + list(columns)
+    return read_parts([part['path'] for part in table_parts(stage_path(stage))], columns)
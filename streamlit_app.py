@@ -1,46 +1,46 @@
-import openai
+import base64
 import streamlit as st
-import pandas as pd
 import os
 import random
 from datetime import datetime
 
-# Try to get the OpenAI API key from different sources
-try:
-    openai.api_key = st.secrets["OPENAI_API_KEY"]
-except KeyError:
-    openai.api_key = os.getenv("OPENAI_API_KEY")
-
-if not openai.api_key:
-    st.error("⚠️ OpenAI API key not found!")
-    st.stop()
-
-# Load the dataset
-data_path = "agentic_ai_performance_dataset_20250622.csv"
-try:
-    data = pd.read_csv(data_path)
-except FileNotFoundError:
-    st.error(f"Dataset file not found: {data_path}")
-    st.stop()
-
-# Streamlit app setup with modern design
-st.set_page_config(
-    page_title="Agentic Task Gap Analysis",
-    page_icon="🤖",
-    layout="wide",
-    initial_sidebar_state="expanded"
-)
-
-# Custom CSS for ultra-modern design
-st.markdown(
-    """
+import metrics
+from chat_session import ChatSession, preview
+from llm_client import BackgroundStream, get_client
+from service_client import ServiceClient, ServiceError
+
+# Images and icons bundled with the app, so pages render without other hosts
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+
+# A bundled image as a data URI for inline markup
+@st.cache_data(show_spinner=False)
+def static_uri(name):
+    with open(os.path.join(STATIC_DIR, name), 'rb') as file:
+        return "data:image/svg+xml;base64," + base64.b64encode(file.read()).decode('ascii')
+
+
+# Time (and with AGENT_PROFILE, profile) the whole rerun, including reruns
+# ended early by st.stop() or st.rerun()
+with metrics.rerun('streamlit_app'):
+    # Time until the page shell (title and styles) is sent to the browser
+    first_paint = metrics.span('streamlit_app.first_paint')
+
+    # Streamlit app setup with modern design
+    st.set_page_config(
+        page_title="Agentic Task Gap Analysis",
+        page_icon=os.path.join(STATIC_DIR, "bot.svg"),
+        layout="wide",
+        initial_sidebar_state="expanded"
+    )
+
+    # Custom CSS for ultra-modern design
+    st.markdown(
+        """
     <style>
-    @import url('https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600;700&display=swap');
-    
     /* Global Styles */
     body {
         background: linear-gradient(135deg, #f6f9fc 0%, #ffffff 100%);
-        font-family: 'Inter', sans-serif;
+        font-family: 'Inter', system-ui, -apple-system, 'Segoe UI', Roboto, sans-serif;
         color: #1a1f36;
     }
 
@@ -201,11 +201,11 @@ st.markdown(
     .typing-dot:nth-child(3) { animation-delay: 0.4s; }
     </style>
     """,
-    unsafe_allow_html=True
-)
+        unsafe_allow_html=True
+    )
 
-# Main title with gradient effect and subtitle
-st.markdown("""
+    # Main title with gradient effect and subtitle
+    st.markdown("""
     <div class='main-title'>
         <span style='font-size: 0.4em; display: block; margin-bottom: 0.5rem;'>AI-Powered</span>
         Agentic Task Gap Analysis
@@ -213,64 +213,192 @@ st.markdown("""
     </div>
 """, unsafe_allow_html=True)
 
-# Initialize session states
-if 'chat_history' not in st.session_state:
-    st.session_state.chat_history = []
-if 'is_typing' not in st.session_state:
-    st.session_state.is_typing = False
-
-# Sidebar
-with st.sidebar:
-    st.image("https://img.icons8.com/fluency/96/artificial-intelligence.png", width=50)
-    st.markdown("<div class='sidebar'>", unsafe_allow_html=True)
-    st.markdown("### Task Preferences")
-    
-    # Task complexity
-    try:
-        task_complexity = st.select_slider(
-            "Task Complexity",
-            options=sorted(data['task_complexity'].unique()),
-            value=data['task_complexity'].median()
-        )
-    except Exception:
-        task_complexity = st.slider("Task Complexity", 1, 10, 5)
+    # Everything above draws the page shell; the imports and data loading below
+    # only delay its contents
+    first_paint.end()
 
-    # Autonomy level
+    # Try to get the OpenAI API key from different sources. The openai package
+    # (about 0.3 s to import) is imported by llm_client on the first LLM request
+    # and reads the key from the environment then.
     try:
-        autonomy_level = st.select_slider(
-            "Desired Autonomy Level",
-            options=sorted(data['autonomy_level'].unique()),
-            value=data['autonomy_level'].median()
-        )
-    except Exception:
-        autonomy_level = st.slider("Autonomy Level", 1, 10, 5)
+        api_key = st.secrets["OPENAI_API_KEY"]
+    except KeyError:
+        api_key = os.getenv("OPENAI_API_KEY")
 
-    # Task category
-    try:
-        task_category = st.selectbox(
-            "Task Category",
-            options=sorted(data['task_category'].unique()),
-            index=0
-        )
-    except Exception:
-        task_category = st.text_input("Task Category", "general")
+    if not api_key:
+        st.error("⚠️ OpenAI API key not found!")
+        st.stop()
+    os.environ["OPENAI_API_KEY"] = api_key
+
+    # Load the dataset, its similarity index, sidebar vocabularies and the
+    # precomputed answers for every preference combination (cached per server process).
+    # With AGENT_SERVICE_URL set (e.g. http://127.0.0.1:8600) the app is a thin
+    # client of service.py, which keeps them warm for every user; panels that need
+    # the rows themselves (Pareto ranking, profile search, trends) are then hidden.
+    data_path = "agentic_ai_performance_dataset_20250622.csv"
+    service_url = os.getenv("AGENT_SERVICE_URL")
+    if service_url:
+        service = ServiceClient(service_url)
+        try:
+            with metrics.span('streamlit_app.load_data'):
+                vocabularies, medians = service.vocabularies()
+        except (OSError, ServiceError) as error:
+            st.error(f"Gap analysis service unavailable at {service_url}: {error}")
+            st.stop()
+    else:
+        service = None
+        # The data modules import pandas and numpy (about 0.6 s on first run), so
+        # they load after the page shell is shown, and never in a thin client
+        with st.spinner("Loading agents..."):
+            with metrics.span('streamlit_app.import_data_modules'):
+                from answer_table import K, answer_from_agents, answer_key
+                from app_data import load_answers, load_dataset, load_profile_index, load_trends, load_vocabularies
+                from neighbors import PROFILE_COLUMNS, nearest_agents, neighbors_text
+                from pareto import DEFAULT_OBJECTIVES, OBJECTIVE_LABELS, OBJECTIVES, front_summary, front_text, pareto_rank
+                from similarity import most_similar
+                from trends import GROUP_COLUMNS, PERCENTILES, TREND_METRICS
+            try:
+                with metrics.span('streamlit_app.load_data'):
+                    data, index = load_dataset(data_path)
+                    vocabularies, medians = load_vocabularies(data_path)
+                    answers = load_answers(data_path)
+            except FileNotFoundError:
+                st.error(f"Dataset file not found: {data_path}")
+                st.stop()
 
-    st.markdown("</div>", unsafe_allow_html=True)
+    # Latency records kept per session
+    MAX_RESPONSE_TIMINGS = 100
+
+    SYSTEM_PROMPT = "You are an AI assistant helping users find the right AI agents for their tasks."
+
+    # Windows of the trend charts: (tumbling window, trailing days of a rolling window)
+    TREND_WINDOWS = {
+        "Daily": ('day', None),
+        "Weekly": ('week', None),
+        "Monthly": ('month', None),
+        "7-day rolling": ('day', 7),
+        "30-day rolling": ('day', 30),
+    }
+
+    # Initialize session states: the chat keeps a bounded window of messages
+    # plus a rolling summary of older ones
+    if 'chat' not in st.session_state:
+        st.session_state.chat = ChatSession()
+    # Assistant response currently streaming, and the latency of recent responses
+    if 'pending_response' not in st.session_state:
+        st.session_state.pending_response = None
+    if 'response_timings' not in st.session_state:
+        st.session_state.response_timings = []
+    chat = st.session_state.chat
+
+    # Sidebar
+    with st.sidebar:
+        st.image(os.path.join(STATIC_DIR, "artificial-intelligence.svg"), width=50)
+        st.markdown("<div class='sidebar'>", unsafe_allow_html=True)
+        st.markdown("### Task Preferences")
     
-    # Chat history
-    st.markdown("<div class='sidebar' style='margin-top: 1rem;'>", unsafe_allow_html=True)
-    st.markdown("### Chat History")
-    for message in st.session_state.chat_history[-5:]:  # Show last 5 messages
-        st.markdown(f"<div style='font-size: 0.9em; margin: 0.5rem 0;'>{message}</div>", unsafe_allow_html=True)
-    st.markdown("</div>", unsafe_allow_html=True)
-
-# Chat interface
-st.markdown("<div class='chat-container'>", unsafe_allow_html=True)
-
-# Chat header
-st.markdown("""
+        # Task complexity
+        try:
+            task_complexity = st.select_slider(
+                "Task Complexity",
+                options=vocabularies['task_complexity'],
+                value=medians['task_complexity']
+            )
+        except Exception:
+            task_complexity = st.slider("Task Complexity", 1, 10, 5)
+
+        # Autonomy level
+        try:
+            autonomy_level = st.select_slider(
+                "Desired Autonomy Level",
+                options=vocabularies['autonomy_level'],
+                value=medians['autonomy_level']
+            )
+        except Exception:
+            autonomy_level = st.slider("Autonomy Level", 1, 10, 5)
+
+        # Task category
+        try:
+            task_category = st.selectbox(
+                "Task Category",
+                options=vocabularies['task_category'],
+                index=0
+            )
+        except Exception:
+            task_category = st.text_input("Task Category", "general")
+
+        # Ranking: the closest matches, or the matching agents no other matching
+        # agent beats on every chosen objective
+        ranking = st.radio("Ranking", ["Closest match", "Performance vs cost"], horizontal=True) if service is None \
+            else "Closest match"
+        if ranking == "Performance vs cost":
+            objectives = st.multiselect(
+                "Objectives",
+                options=list(OBJECTIVES),
+                default=DEFAULT_OBJECTIVES,
+                format_func=lambda objective: OBJECTIVE_LABELS[objective][0]
+            )
+
+        st.markdown("</div>", unsafe_allow_html=True)
+
+        # Agents whose numeric profile is closest to an agent's or to a custom one
+        find_similar = False
+        if service is None:
+            st.markdown("<div class='sidebar' style='margin-top: 1rem;'>", unsafe_allow_html=True)
+            st.markdown("### Find Similar Agents")
+            like = st.radio("Like", ["An agent", "A custom profile"], horizontal=True)
+            if like == "An agent":
+                like_agent = st.text_input("Agent ID", placeholder="AG_01012")
+            else:
+                custom_profile = {}
+                with st.expander("Profile"):
+                    for column in PROFILE_COLUMNS:
+                        label = column.replace('_', ' ').capitalize()
+                        if data[column].dtype == bool:
+                            custom_profile[column] = st.checkbox(label, value=medians[column] >= 0.5, key=f"profile_{column}")
+                        else:
+                            custom_profile[column] = st.number_input(label, value=float(medians[column]), key=f"profile_{column}")
+            find_similar = st.button("Find Similar Agents", key="find_similar")
+            st.markdown("</div>", unsafe_allow_html=True)
+    
+        # Chat history
+        st.markdown("<div class='sidebar' style='margin-top: 1rem;'>", unsafe_allow_html=True)
+        st.markdown("### Chat History")
+        for message in chat.recent(5):  # Show last 5 messages
+            speaker = 'User' if message['role'] == 'user' else 'Agent'
+            st.markdown(f"<div style='font-size: 0.9em; margin: 0.5rem 0;'>{speaker}: {preview(message)}</div>", unsafe_allow_html=True)
+        st.markdown("</div>", unsafe_allow_html=True)
+
+    # Agents closest to the current preferences: shown on request and given to
+    # the assistant as context for chat replies. Every combination the sidebar
+    # offers is in the answer table; other values are ranked on the spot.
+    query = {
+        "task_complexity": task_complexity,
+        "autonomy_level": autonomy_level,
+        "task_category": task_category
+    }
+    if service is not None:
+        try:
+            with metrics.span('streamlit_app.service'):
+                answer = service.recommendations(query)
+        except (OSError, ServiceError) as error:
+            st.error(f"Gap analysis service failed: {error}")
+            answer = None
+    elif answer_key(query) in answers:
+        metrics.increment('answer_lookups_total', result='hit')
+        answer = answers[answer_key(query)]
+    else:
+        metrics.increment('answer_lookups_total', result='miss')
+        with metrics.span('streamlit_app.similarity'):
+            answer = answer_from_agents(most_similar(data, query, k=K, index=index))
+
+    # Chat interface
+    st.markdown("<div class='chat-container'>", unsafe_allow_html=True)
+
+    # Chat header
+    st.markdown(f"""
     <div class='chat-header'>
-        <img src='https://img.icons8.com/color/48/bot.png' style='width: 40px; height: 40px;'>
+        <img src='{static_uri("bot.svg")}' style='width: 40px; height: 40px;'>
         <div class='assistant-info'>
             <div class='assistant-name'>AI Assistant</div>
             <div class='assistant-status'>Online • Ready to help</div>
@@ -278,128 +406,153 @@ st.markdown("""
     </div>
 """, unsafe_allow_html=True)
 
-# Display chat messages
-for message in st.session_state.chat_history:
-    if message.startswith("User:"):
-        st.markdown(f"""
-            <div class='chat-message user-message'>
-                <div class='message-content'>{message[6:]}</div>
-            </div>
-        """, unsafe_allow_html=True)
-    else:
-        st.markdown(f"""
-            <div class='chat-message assistant-message'>
-                <div class='message-content'>{message[7:]}</div>
+    # Chat bubble markup for a 'user' or 'assistant' message
+    def message_html(role, content):
+        return f"""
+            <div class='chat-message {role}-message'>
+                <div class='message-content'>{content}</div>
             </div>
-        """, unsafe_allow_html=True)
-
-# Chat input
-placeholders = [
-    "Ask about agent recommendations...",
-    "Describe your task requirements...",
-    "Need help finding the right agent?",
-    "What kind of agent are you looking for?",
-]
-
-col1, col2 = st.columns([6,1])
-with col1:
-    user_input = st.text_input(
-        "Message the AI Assistant:",
-        placeholder=random.choice(placeholders),
-        key="chat_input"
-    )
-with col2:
-    send_button = st.button("Send 📤")
+        """
 
-if user_input and (send_button or True):  # Allow Enter key to also send
-    # Add user message to chat
-    st.session_state.chat_history.append(f"User: {user_input}")
-    
-    # Process user input
-    try:
-        # Show typing indicator
-        st.session_state.is_typing = True
-        st.rerun()
-
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are an AI assistant helping users find the right AI agents for their tasks."},
-                {"role": "user", "content": user_input}
-            ],
-            max_tokens=150
-        )
-        agent_response = response['choices'][0]['message']['content']
-        
-        # Add assistant response to chat
-        st.session_state.chat_history.append(f"Agent: {agent_response}")
-        
-        # Reset typing indicator
-        st.session_state.is_typing = False
-        
-    except Exception as e:
-        st.error(f"Error: {str(e)}")
-        st.session_state.chat_history.append(f"Agent: I apologize, but I encountered an error. Please try again.")
-
-# Show typing indicator if assistant is typing
-if st.session_state.is_typing:
-    st.markdown("""
+    # Markup of a stored message, built once and kept with it
+    def stored_message_html(message):
+        if 'html' not in message:
+            message['html'] = message_html(message['role'], message['content'])
+        return message['html']
+
+    typing_indicator_html = """
         <div class='typing-indicator'>
             <div class='typing-dot'></div>
             <div class='typing-dot'></div>
             <div class='typing-dot'></div>
         </div>
-    """, unsafe_allow_html=True)
+    """
 
-st.markdown("</div>", unsafe_allow_html=True)  # Close chat container
+    # Display chat messages: the window of recent messages as a single element
+    with metrics.span('streamlit_app.render_history'):
+        if chat.summarized:
+            st.caption(f"{chat.summarized} earlier messages are summarized for the assistant")
+        if chat.messages:
+            st.markdown(''.join(stored_message_html(message) for message in chat.messages), unsafe_allow_html=True)
 
-# Button to get recommendations based on current preferences
-if st.button("Get Recommendations for Current Preferences", key="get_recommendations"):
-    # Similar agents calculation
-    query = {
-        "task_complexity": task_complexity,
-        "autonomy_level": autonomy_level,
-        "task_category": task_category
-    }
-    
-    # Calculate similarity scores
-    def similarity(row):
-        score = 0
-        try:
-            score -= abs(int(row['task_complexity']) - int(query['task_complexity'])) * 2
-        except Exception:
-            pass
-        try:
-            score -= abs(int(row['autonomy_level']) - int(query['autonomy_level'])) * 2
-        except Exception:
-            pass
-        score += 5 if str(row.get('task_category')) == str(query.get('task_category')) else 0
-        return score
-
-    data['similarity'] = data.apply(similarity, axis=1)
-    similar_agents = data.sort_values('similarity', ascending=False).head(5)
-
-    # Display recommendations
-    if not similar_agents.empty and similar_agents['similarity'].max() > -10:
-        recommendations = []
-        for _, agent in similar_agents.iterrows():
-            recommendations.append({
-                'agent_type': agent.get('agent_type', 'N/A'),
-                'task_category': agent.get('task_category', 'N/A'),
-                'model_architecture': agent.get('model_architecture', 'N/A'),
-                'accuracy_score': agent.get('accuracy_score', 0),
-                'cost_per_task_cents': agent.get('cost_per_task_cents', 0),
-                'human_intervention_required': agent.get('human_intervention_required', False)
-            })
-        
-        # Format recommendations as a chat message
-        recommendation_text = "Here are the top agent recommendations based on your preferences:\n\n"
-        for i, rec in enumerate(recommendations, 1):
-            recommendation_text += f"{i}. {rec['agent_type']} for {rec['task_category']}\n"
-            recommendation_text += f"   • Model: {rec['model_architecture']}\n"
-            recommendation_text += f"   • Accuracy: {rec['accuracy_score']:.2f}\n"
-            recommendation_text += f"   • Cost: ${rec['cost_per_task_cents']:.4f} per task\n"
-            recommendation_text += f"   • Human Intervention: {'Yes' if rec['human_intervention_required'] else 'No'}\n\n"
-        
-        st.session_state.chat_history.append(f"Agent: {recommendation_text}")
-        st.rerun()
\ No newline at end of file
+    # Stream the pending response into its chat bubble. The request runs on a
+    # background thread, so a rerun mid-stream just resumes showing it here.
+    pending_response = st.session_state.pending_response
+    if pending_response is not None:
+        bubble = st.empty()
+        bubble.markdown(typing_indicator_html, unsafe_allow_html=True)
+        with metrics.span('streamlit_app.stream_response'):
+            agent_response, done = pending_response.wait(0)
+            while not done:
+                if agent_response:
+                    bubble.markdown(message_html('assistant', agent_response + " ▌"), unsafe_allow_html=True)
+                agent_response, done = pending_response.wait()
+
+        if pending_response.error is not None:
+            st.error(f"Error: {str(pending_response.error)}")
+            agent_response = "I apologize, but I encountered an error. Please try again."
+        bubble.markdown(message_html('assistant', agent_response), unsafe_allow_html=True)
+
+        # Add assistant response to chat and record its latency
+        chat.add('assistant', agent_response)
+        st.session_state.response_timings.append({
+            'time_to_first_token': pending_response.time_to_first_token,
+            'total': pending_response.elapsed,
+        })
+        del st.session_state.response_timings[:-MAX_RESPONSE_TIMINGS]
+        st.session_state.pending_response = None
+
+    # Chat input
+    placeholders = [
+        "Ask about agent recommendations...",
+        "Describe your task requirements...",
+        "Need help finding the right agent?",
+        "What kind of agent are you looking for?",
+    ]
+
+    # Add the submitted message to the chat and start streaming the reply. Runs as
+    # a callback before the script, so each submission sends exactly one request.
+    # The prompt holds the recent turns that fit its token budget, the summary of
+    # older ones and the agents matching the current preferences.
+    def send_message(context):
+        user_input = st.session_state.chat_input.strip()
+        if not user_input or st.session_state.pending_response is not None:
+            return
+        session = st.session_state.chat
+        session.add('user', user_input)
+        st.session_state.pending_response = BackgroundStream(
+            get_client(),
+            session.prompt(SYSTEM_PROMPT, context),
+            max_tokens=150
+        )
+
+    # A form sends on Enter or on the button, and clears the input afterwards
+    with st.form("chat_form", clear_on_submit=True):
+        col1, col2 = st.columns([6,1])
+        with col1:
+            st.text_input(
+                "Message the AI Assistant:",
+                placeholder=random.choice(placeholders),
+                key="chat_input"
+            )
+        with col2:
+            st.form_submit_button("Send 📤", on_click=send_message, args=(answer and answer['context'],))
+
+    st.markdown("</div>", unsafe_allow_html=True)  # Close chat container
+
+    # Button to get recommendations based on current preferences: a lookup in the
+    # answer table, or the Pareto front of the matching agents
+    if st.button("Get Recommendations for Current Preferences", key="get_recommendations"):
+        if ranking == "Performance vs cost" and objectives:
+            with metrics.span('streamlit_app.pareto'):
+                front = pareto_rank(data, query, objectives, k=K, index=index)
+            if len(front):
+                chat.add('assistant', front_text(front, objectives), summary=front_summary(front))
+                st.rerun()
+        # Display recommendations
+        elif answer is not None:
+            # Once it leaves the window, the message is summarized as the agents it named
+            chat.add('assistant', answer['text'], summary=answer['summary'])
+            st.rerun()
+
+    # Agents nearest by numeric profile, as a chat message
+    if find_similar:
+        profile_data, profile_index = load_profile_index(data_path)
+        with metrics.span('streamlit_app.neighbors'):
+            try:
+                if like == "An agent":
+                    positions, distances = profile_index.like_agent(like_agent.strip(), K)
+                    heading = f"Agents with the profiles closest to {like_agent.strip()}:"
+                else:
+                    positions, distances = profile_index.like_profile(custom_profile, K)
+                    heading = "Agents closest to your custom profile:"
+            except KeyError:
+                positions = None
+        if positions is None:
+            st.error(f"Agent not found: {like_agent}")
+        else:
+            agents = nearest_agents(profile_data, positions[0], distances[0])
+            chat.add('assistant', neighbors_text(agents, heading),
+                     summary=f"Profiles like {like_agent.strip() if like == 'An agent' else 'a custom profile'}: "
+                             + ", ".join(agents['agent_id']))
+            st.rerun()
+
+    # Trend charts over the dataset's history, merged from pre-aggregated daily
+    # windows rather than recomputed from rows. Loading the aggregates takes about
+    # half a second on first use, so it waits until the charts are switched on.
+    if service is None:
+        with st.expander("Performance Trends"):
+            if st.toggle("Show trends", key="show_trends"):
+                col1, col2, col3, col4 = st.columns(4)
+                with col1:
+                    trend_column = st.selectbox("Group by", GROUP_COLUMNS, format_func=lambda column: column.replace('_', ' ').title())
+                with col2:
+                    trend_metric = st.selectbox("Metric", TREND_METRICS, format_func=lambda metric: metric.replace('_', ' ').title())
+                with col3:
+                    trend_statistic = st.selectbox("Statistic", ['mean'] + list(PERCENTILES) + ['count'])
+                with col4:
+                    trend_window = st.selectbox("Window", list(TREND_WINDOWS), index=3)
+                with metrics.span('streamlit_app.trends'):
+                    frequency, rolling = TREND_WINDOWS[trend_window]
+                    trend = load_trends(data_path).series(trend_column, trend_metric, frequency, rolling)
+                st.line_chart(trend.pivot(index='window', columns='group', values=trend_statistic))
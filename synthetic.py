@@ -0,0 +1,122 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+
+import schema
+import storage
+
+# Rows generated per block; every block has its own seed derived from the
+# generator seed, so output depends only on (rows, seed)
+BLOCK_ROWS = 100_000
+
+# Gaussian noise added to float columns, as a fraction of the column's std
+JITTER = 0.05
+
+FLOAT_COLUMNS = [column for column, dtype in schema.SCHEMA.items() if dtype.startswith('float')]
+
+
+# Number of decimals the values of a column are written with, up to float32
+# precision (None if not rounded)
+def _decimals(values):
+    values = values.dropna().to_numpy(dtype=np.float64)
+    for decimals in range(7):
+        if np.allclose(np.round(values, decimals), values, rtol=1e-6, atol=1e-9):
+            return decimals
+    return None
+
+
+# Value distributions of a reference dataset. Synthetic rows are bootstrapped
+# from its rows, which keeps the categorical mix and the correlations between
+# columns, with float columns jittered and reflected into their observed range.
+def fit(reference):
+    return {
+        'rows': reference.reset_index(drop=True),
+        'std': reference[FLOAT_COLUMNS].std(),
+        'min': reference[FLOAT_COLUMNS].min(),
+        'max': reference[FLOAT_COLUMNS].max(),
+        'decimals': {column: _decimals(reference[column]) for column in FLOAT_COLUMNS},
+        'start': reference['timestamp'].min(),
+        'end': reference['timestamp'].max(),
+    }
+
+
+def load_profile(reference=storage.SOURCE_PATH):
+    return fit(schema.read_csv(reference))
+
+
+# Synthetic rows with the dataset's schema, in DataFrames of at most
+# BLOCK_ROWS rows (one empty DataFrame for no rows). Agent ids are unique and
+# timestamps increase over the reference's time span, like the exports.
+# A larger jitter makes rows less alike the reference rows they come from.
+def generate_chunks(rows, seed=0, profile=None, jitter=JITTER):
+    profile = profile or load_profile()
+    reference = profile['rows']
+    span = (profile['end'] - profile['start']).value
+    for number, start in enumerate(range(0, max(rows, 1), BLOCK_ROWS)):
+        random = np.random.default_rng([seed, number])
+        row_numbers = np.arange(start, min(start + BLOCK_ROWS, rows))
+        chunk = reference.iloc[random.integers(len(reference), size=len(row_numbers))].reset_index(drop=True)
+        for column in FLOAT_COLUMNS:
+            values = chunk[column].to_numpy(dtype=np.float64)
+            low, high = profile['min'][column], profile['max'][column]
+            # Values at the range limits (floors and caps of the export) stay as they are
+            jittered = values + random.normal(0, jitter * profile['std'][column], len(values))
+            jittered = np.clip(high - np.abs(high - (low + np.abs(jittered - low))), low, high)
+            values = np.where((values == low) | (values == high), values, jittered)
+            if profile['decimals'][column] is not None:
+                values = np.round(values, profile['decimals'][column])
+            chunk[column] = values
+        chunk['agent_id'] = [f"AG_{row:05d}" for row in row_numbers]
+        offsets = row_numbers * (span // max(1, rows - 1))
+        chunk['timestamp'] = (profile['start'] + pd.to_timedelta(offsets, unit='ns')).floor('s')
+        yield schema.apply_schema(chunk)
+
+
+def generate(rows, seed=0, profile=None, jitter=JITTER):
+    return schema.apply_schema(pd.concat(generate_chunks(rows, seed, profile, jitter), ignore_index=True))
+
+
+# Arrow schema the CSV is written with: categories as plain strings and
+# timestamps in seconds, as in the exports
+def _csv_schema(table):
+    fields = []
+    for field in table.schema:
+        if pa.types.is_dictionary(field.type):
+            field = field.with_type(pa.string())
+        elif pa.types.is_timestamp(field.type):
+            field = field.with_type(pa.timestamp('s'))
+        fields.append(field)
+    return pa.schema(fields)
+
+
+# Write a synthetic CSV export one block at a time, so any size fits in memory.
+# Arrow's CSV writer is several times faster than DataFrame.to_csv.
+def write_csv(path, rows, seed=0, profile=None):
+    writer = csv_schema = None
+    with storage.atomic_write(path) as tmp_path:
+        try:
+            for chunk in generate_chunks(rows, seed, profile):
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    csv_schema = _csv_schema(table)
+                    writer = pacsv.CSVWriter(tmp_path, csv_schema)
+                writer.write_table(table.cast(csv_schema))
+        finally:
+            if writer is not None:
+                writer.close()
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic agent performance dataset")
+    parser.add_argument("output", help="CSV file to write")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--reference", default=storage.SOURCE_PATH, help="dataset whose distributions are followed")
+    args = parser.parse_args()
+
+    write_csv(args.output, args.rows, args.seed, load_profile(args.reference))
+    print(f"Wrote {args.rows} rows to {args.output}")
@@ -1,21 +1,25 @@
-import openai
 import streamlit as st
-import pandas as pd
 import os
 
-# Set OpenAI API key securely from environment variable
-openai.api_key = os.getenv("OPENAI_API_KEY")
+import metrics
+from gap_analysis import agent_records, has_similar_agents, research_prompt_from_records
+from llm_client import get_client
+from service_client import ServiceClient, ServiceError
 
-# Load the dataset
-data_path = "/workspaces/agents/agentic_ai_performance_dataset_20250622.csv"
-data = pd.read_csv(data_path)
+# The OpenAI API key is read from OPENAI_API_KEY when llm_client first
+# imports openai, on the first research request
 
-# Streamlit app setup with modern design
-st.set_page_config(page_title="Agentic Task Gap Analysis", layout="wide")
+# Time (and with AGENT_PROFILE, profile) the whole rerun, however it ends
+with metrics.rerun('task_gap_agent'):
+    # Time until the page shell (title and styles) is sent to the browser
+    first_paint = metrics.span('task_gap_agent.first_paint')
 
-# Modern agentic design with custom CSS
-st.markdown(
-    """
+    # Streamlit app setup with modern design
+    st.set_page_config(page_title="Agentic Task Gap Analysis", layout="wide")
+
+    # Modern agentic design with custom CSS
+    st.markdown(
+        """
     <style>
     body {background: #f7faff;}
     .main-title {color: #2b6cb0; font-size: 2.8em; font-weight: 700; text-align: center; margin-bottom: 30px;}
@@ -26,58 +30,78 @@ st.markdown(
     .highlight {color: #2b6cb0; font-weight: 600;}
     </style>
     """,
-    unsafe_allow_html=True
-)
+        unsafe_allow_html=True
+    )
 
-# Main title
-st.markdown("<div class='main-title'>Agentic Task Gap Analysis</div>", unsafe_allow_html=True)
+    # Main title
+    st.markdown("<div class='main-title'>Agentic Task Gap Analysis</div>", unsafe_allow_html=True)
+    first_paint.end()
 
-# Sidebar for user inputs
-with st.sidebar:
-    st.markdown("<div class='sidebar'><h3>Your Preferences</h3></div>", unsafe_allow_html=True)
-    task_complexity = st.selectbox("Task Complexity", sorted(data['task_complexity'].unique()))
-    autonomy_level = st.selectbox("Desired Autonomy Level", sorted(data['autonomy_level'].unique()))
-    task_category = st.selectbox("Task Category", sorted(data['task_category'].unique()))
+    # Load the dataset, or with AGENT_SERVICE_URL set leave it to service.py. The
+    # data modules import pandas and numpy, so they load after the shell is shown.
+    data_path = "/workspaces/agents/agentic_ai_performance_dataset_20250622.csv"
+    service_url = os.getenv("AGENT_SERVICE_URL")
+    with st.spinner("Loading agents..."), metrics.span('task_gap_agent.load_data'):
+        if service_url:
+            service = ServiceClient(service_url)
+            try:
+                vocabularies, _ = service.vocabularies()
+            except (OSError, ServiceError) as error:
+                st.error(f"Gap analysis service unavailable at {service_url}: {error}")
+                st.stop()
+        else:
+            from app_data import load_dataset, load_vocabularies
+            from similarity import most_similar
 
-# Find most similar agents (not exact match)
-query = {
-    "task_complexity": task_complexity,
-    "autonomy_level": autonomy_level,
-    "task_category": task_category
-}
+            data, index = load_dataset(data_path)
+            vocabularies, _ = load_vocabularies(data_path)
 
-# Compute similarity (numeric for complexity/autonomy, exact for category)
-def similarity(row):
-    score = 0
-    score -= abs(int(row['task_complexity']) - int(query['task_complexity'])) * 2
-    score -= abs(int(row['autonomy_level']) - int(query['autonomy_level'])) * 2
-    score += 5 if row['task_category'] == query['task_category'] else 0
-    return score
+    # Sidebar for user inputs
+    with st.sidebar:
+        st.markdown("<div class='sidebar'><h3>Your Preferences</h3></div>", unsafe_allow_html=True)
+        task_complexity = st.selectbox("Task Complexity", vocabularies['task_complexity'])
+        autonomy_level = st.selectbox("Desired Autonomy Level", vocabularies['autonomy_level'])
+        task_category = st.selectbox("Task Category", vocabularies['task_category'])
 
-data['similarity'] = data.apply(similarity, axis=1)
-similar_agents = data.sort_values('similarity', ascending=False).head(5)
+    # Find most similar agents (not exact match)
+    query = {
+        "task_complexity": task_complexity,
+        "autonomy_level": autonomy_level,
+        "task_category": task_category
+    }
 
-if not similar_agents.empty and similar_agents['similarity'].max() > -10:
-    st.markdown("<div class='recommendation'><h3>Most Relevant Agents & Research Directions</h3></div>", unsafe_allow_html=True)
-    for _, agent in similar_agents.iterrows():
-        st.markdown(
-            f"<div class='agent-card'>"
-            f"<span class='highlight'>{agent['agent_type']}</span> for <span class='highlight'>{agent['task_category']}</span> | "
-            f"Model: <b>{agent['model_architecture']}</b> | Accuracy: <b>{agent['accuracy_score']:.2f}</b> | Cost: <b>${agent['cost_per_task_cents']:.4f}</b> | Human Intervention: <b>{'Yes' if agent['human_intervention_required'] else 'No'}</b>"
-            f"</div>", unsafe_allow_html=True)
+    # Compute similarity (numeric for complexity/autonomy, exact for category)
+    # and research suggestions for the similar agents, here or by the service
+    if service_url:
+        try:
+            with metrics.span('task_gap_agent.service'):
+                research = service.research(query)
+        except (OSError, ServiceError) as error:
+            st.error(f"Gap analysis service failed: {error}")
+            st.stop()
+        agents, research_suggestion = research['agents'], research['research_suggestion']
+    else:
+        with metrics.span('task_gap_agent.similarity'):
+            similar_agents = most_similar(data, query, k=5, index=index)
+        agents = agent_records(similar_agents) if has_similar_agents(similar_agents) else []
+        if agents:
+            prompt = research_prompt_from_records(agents)
+            # Identical preferences yield identical prompts, so repeats are served from the response cache
+            with metrics.span('task_gap_agent.research_suggestion'):
+                research_suggestion = get_client().complete_sync([{"role": "user", "content": prompt}])
 
-    # Research suggestions
-    research_prompt = (
-        f"Based on the following agent data: {similar_agents[['agent_type','task_category','model_architecture','accuracy_score','cost_per_task_cents','human_intervention_required']].to_dict(orient='records')}, "
-        f"suggest research directions or projects to improve the performance of these agents."
-    )
-    research_response = openai.ChatCompletion.create(
-        model="gpt-3.5-turbo",
-        messages=[{"role": "user", "content": research_prompt}]
-    )
-    research_suggestion = research_response['choices'][0]['message']['content']
-    st.markdown("<div class='recommendation'><h3>Research Suggestions</h3></div>", unsafe_allow_html=True)
-    st.markdown(f"<div class='chat-box'><p>{research_suggestion}</p></div>", unsafe_allow_html=True)
-else:
-    st.markdown("<div class='recommendation'><h3>No Similar Agents Found</h3></div>", unsafe_allow_html=True)
-    st.markdown("<div class='chat-bubble'>No agents closely match your preferences, but you can research new agent architectures or hybrid approaches for this gap.</div>", unsafe_allow_html=True)
\ No newline at end of file
+    if agents:
+        st.markdown("<div class='recommendation'><h3>Most Relevant Agents & Research Directions</h3></div>", unsafe_allow_html=True)
+        for agent in agents:
+            st.markdown(
+                f"<div class='agent-card'>"
+                f"<span class='highlight'>{agent['agent_type']}</span> for <span class='highlight'>{agent['task_category']}</span> | "
+                f"Model: <b>{agent['model_architecture']}</b> | Accuracy: <b>{agent['accuracy_score']:.2f}</b> | Cost: <b>${agent['cost_per_task_cents']:.4f}</b> | Human Intervention: <b>{'Yes' if agent['human_intervention_required'] else 'No'}</b>"
+                f"</div>", unsafe_allow_html=True)
+
+        # Research suggestions
+        st.markdown("<div class='recommendation'><h3>Research Suggestions</h3></div>", unsafe_allow_html=True)
+        st.markdown(f"<div class='chat-box'><p>{research_suggestion}</p></div>", unsafe_allow_html=True)
+    else:
+        st.markdown("<div class='recommendation'><h3>No Similar Agents Found</h3></div>", unsafe_allow_html=True)
+        st.markdown("<div class='chat-bubble'>No agents closely match your preferences, but you can research new agent architectures or hybrid approaches for this gap.</div>", unsafe_allow_html=True)
@@ -0,0 +1,21 @@
+import numpy as np
+import pandas as pd
+
+CATEGORIES = ['coding', 'research', 'support']
+
+
+# Agents with few distinct values per similarity column, so most scores tie
+def random_agents(rows, seed):
+    generator = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'task_complexity': generator.integers(1, 4, rows),
+        'autonomy_level': generator.integers(1, 4, rows),
+        'task_category': generator.choice(CATEGORIES, rows),
+    })
+
+
+# Sidebar queries over the same values, some with a category no agent has
+def random_queries(count, seed):
+    generator = np.random.default_rng(seed)
+    return [{'task_complexity': int(generator.integers(1, 4)), 'autonomy_level': int(generator.integers(1, 4)),
+             'task_category': str(generator.choice(CATEGORIES + ['unknown']))} for _ in range(count)]
@@ -0,0 +1,34 @@
+import numpy as np
+
+import answer_table
+import similarity
+from gap_analysis import MIN_SIMILARITY, agent_records
+from helpers import random_agents
+
+
+# Agents with the fields an answer shows, and many tying similarity scores
+def random_dataset(rows, seed):
+    generator = np.random.default_rng([seed, 2])
+    data = random_agents(rows, seed)
+    data['agent_type'] = generator.choice(['Planner', 'Coder'], rows)
+    data['model_architecture'] = generator.choice(['GPT-4o', 'Claude-3.5'], rows)
+    data['accuracy_score'] = generator.random(rows).round(2)
+    data['cost_per_task_cents'] = generator.random(rows).round(4)
+    data['human_intervention_required'] = generator.integers(0, 2, rows).astype(bool)
+    return data
+
+
+# Answers from a scan of every row, as the table was first built
+def reference_answers(data, k=answer_table.K):
+    queries = answer_table.reachable_queries(data)
+    positions, scores = similarity.top_k_batch(similarity.encode_agents(data), queries, k)
+    return {answer_table.answer_key(query): None if not len(scores[number]) or scores[number].max() <= MIN_SIMILARITY
+            else answer_table._answer(agent_records(data.iloc[positions[number]]))
+            for number, query in enumerate(queries)}
+
+
+def test_build_matches_scan():
+    for rows, seed in [(1, 0), (4, 1), (300, 2), (2000, 3)]:
+        data = random_dataset(rows, seed)
+        assert answer_table.build(data) == reference_answers(data)
+        assert answer_table.build(data, index=similarity.BucketIndex(data)) == reference_answers(data)
@@ -0,0 +1,122 @@
+import collections
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import evaluate_metrics
+from evaluate_metrics import bootstrap, evaluate, report, scores
+
+CLASSES = ['success_rate', 'accuracy_score', 'efficiency_score', 'cost_efficiency_ratio']
+
+
+# Predictions of 60 agents (a few without one) and 400 labels, some for
+# agents the dataset lacks and some without a value
+@pytest.fixture
+def labelled(tmp_path, monkeypatch):
+    generator = np.random.default_rng(0)
+    agents = [f"AGT_{number:03d}" for number in range(60)]
+    predictions = pd.Series(generator.choice(CLASSES[:3], len(agents)), dtype='category')
+    predictions[generator.random(len(agents)) < 0.1] = np.nan
+    monkeypatch.setattr(evaluate_metrics, 'load_predictions',
+                        lambda column, source: (pd.Index(agents), predictions))
+
+    labels = pd.DataFrame({
+        'agent_id': generator.choice(agents + ['AGT_900', 'AGT_901'], 400),
+        'weakest_metric': generator.choice(CLASSES, 400),
+    })
+    labels.loc[generator.random(400) < 0.05, 'weakest_metric'] = np.nan
+    labels.to_csv(tmp_path / 'labels.csv', index=False)
+    return dict(zip(agents, predictions)), labels, str(tmp_path / 'labels.csv')
+
+
+# Confusion counts, unmatched and unlabeled rows of the labels, one row at a time
+def reference_confusion(predicted, labels):
+    pairs = collections.Counter()
+    unmatched = unlabeled = 0
+    for agent_id, label in zip(labels['agent_id'], labels['weakest_metric']):
+        if agent_id not in predicted:
+            unmatched += 1
+        elif pd.isna(label):
+            unlabeled += 1
+        elif not pd.isna(predicted[agent_id]):
+            pairs[label, predicted[agent_id]] += 1
+    return pairs, unmatched, unlabeled
+
+
+# Precision, recall and F1 per class from (truth, prediction) pair counts
+def reference_scores(pairs, classes):
+    result = {}
+    for name in classes:
+        correct = pairs[name, name]
+        predicted = sum(count for (_, guess), count in pairs.items() if guess == name)
+        support = sum(count for (truth, _), count in pairs.items() if truth == name)
+        precision = correct / predicted if predicted else 0.0
+        recall = correct / support if support else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        result[name] = (precision, recall, f1, support)
+    return result
+
+
+# Chunks of 1 and 7 rows meet each class first in different chunks
+@pytest.mark.parametrize('chunksize', [1, 7, 1000])
+def test_evaluate_matches_per_row_counts(labelled, chunksize):
+    predicted, labels, path = labelled
+    confusion, unmatched, unlabeled = evaluate(path, 'weakest_metric', chunksize=chunksize)
+    pairs, expected_unmatched, expected_unlabeled = reference_confusion(predicted, labels)
+    assert (unmatched, unlabeled) == (expected_unmatched, expected_unlabeled)
+    assert unmatched > 0 and unlabeled > 0
+    counts = {(truth, guess): int(confusion.counts[row, column])
+              for row, truth in enumerate(confusion.classes) for column, guess in enumerate(confusion.classes)
+              if confusion.counts[row, column]}
+    assert counts == dict(pairs)
+
+
+def test_report_scores_match_per_row_computation(labelled):
+    predicted, labels, path = labelled
+    confusion, _, _ = evaluate(path, 'weakest_metric', chunksize=7)
+    result = report(confusion, samples=200)
+    pairs, _, _ = reference_confusion(predicted, labels)
+    classes = sorted({name for pair in pairs for name in pair})
+    # A class that is only ever a label but never predicted still counts, with precision 0
+    assert sorted(result['classes']) == classes == sorted(CLASSES)
+
+    expected = reference_scores(pairs, classes)
+    total = sum(pairs.values())
+    assert result['rows'] == total
+    assert result['accuracy']['value'] == pytest.approx(sum(pairs[name, name] for name in classes) / total)
+    for name, (precision, recall, f1, support) in expected.items():
+        class_scores = result['per_class'][name]
+        assert class_scores['support'] == support
+        assert class_scores['precision']['value'] == pytest.approx(precision)
+        assert class_scores['recall']['value'] == pytest.approx(recall)
+        assert class_scores['f1']['value'] == pytest.approx(f1)
+    assert result['macro_f1']['value'] == pytest.approx(np.mean([value[2] for value in expected.values()]))
+    assert result['weighted_f1']['value'] == pytest.approx(
+        sum(f1 * support for _, _, f1, support in expected.values()) / total)
+    for name in ['accuracy', 'macro_f1', 'weighted_f1']:
+        assert result[name]['low'] <= result[name]['value'] <= result[name]['high']
+
+
+# The multinomial draws match resampling the rows of each class: every replicate
+# keeps the class supports, and the scores spread alike
+def test_bootstrap_matches_row_resampling():
+    counts = np.array([[50, 10, 5], [8, 30, 2], [0, 0, 0]])
+    observed = np.array([True, True, True])
+    replicates = bootstrap(counts, observed, samples=4000, seed=1, batch=300)
+    assert replicates['accuracy'].shape == (4000,)
+
+    truth = np.repeat(np.arange(3), counts.sum(axis=1))
+    predicted = np.concatenate([np.repeat(np.arange(3), row) for row in counts])
+    generator = np.random.default_rng(2)
+    resampled = np.zeros((4000, 3, 3), dtype=np.int64)
+    for number in range(4000):
+        rows = np.concatenate([generator.choice(np.flatnonzero(truth == label), (truth == label).sum())
+                               for label in range(2)])
+        np.add.at(resampled[number], (truth[rows], predicted[rows]), 1)
+    expected = scores(resampled, observed)
+    for name in ['accuracy', 'macro_f1', 'weighted_f1']:
+        assert replicates[name].mean() == pytest.approx(expected[name].mean(), abs=0.005)
+        assert replicates[name].std() == pytest.approx(expected[name].std(), rel=0.1)
+    # Class 2 has no rows and is never drawn; its precision stays 0
+    assert (replicates['precision'][:, 2] == 0).all()
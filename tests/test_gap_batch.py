@@ -0,0 +1,24 @@
+import asyncio
+import json
+
+import gap_batch
+from llm_client import FakeBackend, LLMClient, ResponseCache
+
+
+def answer(model, messages):
+    if 'fail' in messages[0]['content']:
+        raise ConnectionError("backend unavailable")
+    return "Try retrieval."
+
+
+# One failed call is recorded on its own query; the rest of the batch keeps its suggestions
+def test_failed_suggestion_is_recorded_per_query(tmp_path):
+    client = LLMClient(FakeBackend(answer), ResponseCache(str(tmp_path / 'cache')))
+    results = [{'research_prompt': prompt} for prompt in ["ok 1", "fail", None, "ok 2"]]
+    asyncio.run(gap_batch.suggest(results, concurrency=2, client=client))
+    assert [result.get('research_suggestion') for result in results] == ["Try retrieval.", None, None, "Try retrieval."]
+    assert [('error' in result) for result in results] == [False, True, False, False]
+    assert 'backend unavailable' in results[1]['error']
+
+    gap_batch.write_results(results, tmp_path / 'results.jsonl')
+    assert [json.loads(line) for line in open(tmp_path / 'results.jsonl')] == results
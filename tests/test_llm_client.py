@@ -0,0 +1,79 @@
+import asyncio
+import threading
+
+from llm_client import BackgroundStream, FakeBackend, LLMClient, ResponseCache
+
+MESSAGES = [{"role": "user", "content": "Suggest research directions"}]
+
+
+# Two threads with their own event loops (as two Streamlit sessions calling
+# complete_sync) send the same prompt at once: one backend call serves both
+def test_complete_sync_shares_call_across_threads(tmp_path):
+    backend = FakeBackend("Try retrieval.", delay=0.2)
+    client = LLMClient(backend, ResponseCache(str(tmp_path)))
+    barrier = threading.Barrier(2)
+    results, errors = [], []
+
+    def ask():
+        barrier.wait()
+        try:
+            results.append(client.complete_sync(MESSAGES))
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=ask) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert results == ["Try retrieval.", "Try retrieval."]
+    assert len(backend.calls) == 1
+    assert client.stats == {'hits': 0, 'misses': 1, 'coalesced': 1}
+
+
+def test_concurrent_calls_in_one_loop_share_call(tmp_path):
+    backend = FakeBackend("Try retrieval.", delay=0.05)
+    client = LLMClient(backend, ResponseCache(str(tmp_path)))
+
+    async def ask_three():
+        return await asyncio.gather(*(client.complete(MESSAGES) for _ in range(3)))
+
+    assert asyncio.run(ask_three()) == ["Try retrieval."] * 3
+    assert len(backend.calls) == 1
+    assert client.complete_sync(MESSAGES) == "Try retrieval."
+    assert client.stats['hits'] == 1
+
+
+def test_failed_call_reaches_every_caller(tmp_path):
+    def fail(model, messages):
+        raise RuntimeError("rate limited")
+
+    client = LLMClient(FakeBackend(fail, delay=0.05), ResponseCache(str(tmp_path)))
+
+    async def ask_twice():
+        return await asyncio.gather(*(client.complete(MESSAGES) for _ in range(2)), return_exceptions=True)
+
+    assert [str(error) for error in asyncio.run(ask_twice())] == ["rate limited", "rate limited"]
+    assert client._in_flight == {}
+
+
+# Sessions streaming the same prompt at once all store the response under one key
+def test_concurrent_streams_of_one_prompt(tmp_path):
+    client = LLMClient(FakeBackend("Try retrieval and planning.", delay=0.01), ResponseCache(str(tmp_path)))
+    for _ in range(5):
+        client.cache.clear()
+        streams = [BackgroundStream(client, MESSAGES) for _ in range(6)]
+        for stream in streams:
+            stream._thread.join()
+        assert [stream.error for stream in streams] == [None] * 6
+        assert {stream.text for stream in streams} == {"Try retrieval and planning."}
+
+
+# A response that cannot be cached is still returned
+def test_failed_cache_write_is_not_fatal(tmp_path):
+    (tmp_path / 'cache').write_text('not a directory')
+    client = LLMClient(FakeBackend("Try retrieval."), ResponseCache(str(tmp_path / 'cache')))
+    assert client.complete_sync(MESSAGES) == "Try retrieval."
+    assert ''.join(client.stream_sync(MESSAGES)) == "Try retrieval."
@@ -0,0 +1,56 @@
+import pytest
+
+import metrics
+
+
+# Collect metrics into a fresh registry and a metrics file under tmp_path
+@pytest.fixture(autouse=True)
+def collected(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, '_histograms', {})
+    monkeypatch.setattr(metrics, '_counters', metrics.collections.Counter())
+    monkeypatch.setattr(metrics, '_directory', str(tmp_path))
+    monkeypatch.setattr(metrics, '_enabled', True)
+    monkeypatch.setattr(metrics, '_program', metrics._program)
+    return tmp_path
+
+
+class StopScript(Exception):
+    pass
+
+
+# A run ended early (st.stop() and st.rerun() raise) is still timed and flushed
+def test_rerun_recorded_when_script_stops(collected):
+    with pytest.raises(StopScript):
+        with metrics.rerun('app'):
+            raise StopScript()
+    assert 'agents_span_seconds_count{span="app.rerun"} 1' in metrics.render()
+    assert 'agents_span_seconds_count{span="app.rerun"} 1' in (collected / 'app.prom').read_text()
+
+
+def test_label_values_are_escaped():
+    metrics.increment('requests_total', endpoint='say "hi"\\now\nthen')
+    metrics.observe('quote"d', 0.1)
+    text = metrics.render()
+    assert 'agents_requests_total{endpoint="say \\"hi\\"\\\\now\\nthen"} 1' in text
+    assert 'agents_span_seconds_count{span="quote\\"d"} 1' in text
+
+
+# An unwritable metrics file neither ends the run nor replaces its exception
+def test_rerun_keeps_exception_when_flush_fails(collected, monkeypatch):
+    monkeypatch.setattr(metrics, '_directory', str(collected / 'file'))
+    (collected / 'file').write_text('not a directory')
+    with pytest.raises(StopScript):
+        with metrics.rerun('app'):
+            raise StopScript()
+    with metrics.rerun('app'):
+        pass
+
+
+# A process finding the port taken (a pipeline stage under a served parent) runs on without serving
+def test_serve_skips_port_in_use(monkeypatch):
+    server = metrics.ThreadingHTTPServer(('127.0.0.1', 0), metrics._MetricsHandler)
+    try:
+        monkeypatch.setattr(metrics, '_server', None)
+        assert metrics.serve(server.server_address[1]) is None
+    finally:
+        server.server_close()
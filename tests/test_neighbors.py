@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import neighbors
+from neighbors import PROFILE_COLUMNS, ProfileIndex, exact_search, profile_vectors, recall
+
+
+# Agent profiles around a few dozen cluster centres, as agents of one type and model resemble each other
+def random_profiles(rows, seed, start=0):
+    generator = np.random.default_rng(seed)
+    centres = np.random.default_rng(0).normal(0, 3, (40, len(PROFILE_COLUMNS)))
+    values = centres[generator.integers(len(centres), size=rows)] + generator.normal(0, 1, (rows, len(PROFILE_COLUMNS)))
+    data = pd.DataFrame(values, columns=PROFILE_COLUMNS)
+    data.insert(0, 'agent_id', [f"AGT_{number:06d}" for number in range(start, start + rows)])
+    return data
+
+
+# Brute-force squared distances from every query to every vector
+def reference_search(vectors, queries, k, exclude):
+    distances = ((queries[:, None].astype(np.float64) - vectors[None]) ** 2).sum(axis=2)
+    distances[np.arange(len(queries))[exclude >= 0], exclude[exclude >= 0]] = np.inf
+    rows = np.argsort(distances, axis=1, kind='stable')[:, :k]
+    return rows, np.take_along_axis(distances, rows, axis=1)
+
+
+# Blocks of a few rows and queries, so results are merged across blocks
+@pytest.mark.parametrize('block_elements, query_block', [(1 << 22, 256), (50, 7)])
+def test_exact_search_matches_brute_force(block_elements, query_block, monkeypatch):
+    monkeypatch.setattr(neighbors, 'BLOCK_ELEMENTS', block_elements)
+    monkeypatch.setattr(neighbors, 'QUERY_BLOCK', query_block)
+    generator = np.random.default_rng(0)
+    vectors = generator.normal(size=(300, 5)).astype(np.float32)
+    queries = vectors[:40] + generator.normal(0, 0.01, (40, 5)).astype(np.float32)
+    exclude = np.where(np.arange(40) % 3 == 0, -1, np.arange(40))
+
+    rows, distances = exact_search(vectors, (vectors * vectors).sum(axis=1), queries, 6, exclude)
+    expected_rows, expected_distances = reference_search(vectors, queries, 6, exclude)
+    np.testing.assert_array_equal(rows, expected_rows)
+    np.testing.assert_allclose(distances, expected_distances, rtol=1e-4, atol=1e-4)
+    assert not (rows == exclude[:, None]).any()
+
+
+# Probes are tuned on a sample of rows; queries outside it still reach the target recall
+def test_ivf_search_reaches_target_recall():
+    data = random_profiles(20000, seed=1)
+    index = ProfileIndex(data, lists=100)
+    assert 1 <= index.probes < 100
+
+    queries = profile_vectors(random_profiles(300, seed=2), index.scaler)
+    truth, _ = index.search(queries, 10, exact=True)
+    found, distances = index.search(queries, 10)
+    assert recall(found, truth) >= neighbors.TARGET_RECALL
+    # Probing every list is the exact search
+    np.testing.assert_array_equal(index.search(queries, 10, probes=100)[0], truth)
+    # Found rows are ordered by distance, which is their distance to the query
+    assert (np.diff(distances, axis=1) >= 0).all()
+    expected = ((profile_vectors(data.iloc[found.ravel()], index.scaler) - np.repeat(queries, 10, axis=0)) ** 2).sum(axis=1)
+    np.testing.assert_allclose(distances.ravel(), expected, rtol=1e-3, atol=1e-3)
+
+
+# Appended rows are found by their position in the grown dataset, and by agent id
+@pytest.mark.parametrize('lists', [1, 20])
+def test_extend_finds_appended_rows(lists):
+    data = random_profiles(3000, seed=3)
+    appended = random_profiles(500, seed=4, start=3000)
+    index = ProfileIndex(data, lists=lists)
+    index.extend(appended)
+    grown = pd.concat([data, appended], ignore_index=True)
+    assert len(index) == len(grown)
+
+    vectors = profile_vectors(grown, index.scaler)
+    queries = profile_vectors(appended.iloc[:50], index.scaler)
+    exclude = np.arange(3000, 3050)
+    positions, _ = index.search(queries, 5, exact=True, exclude=exclude)
+    expected, _ = reference_search(vectors, queries, 5, exclude)
+    np.testing.assert_array_equal(positions, expected)
+
+    positions, _ = index.like_agent('AGT_003010', k=5, exact=True)
+    np.testing.assert_array_equal(positions[0], expected[10])
@@ -0,0 +1,63 @@
+from functools import partial
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import parallel
+from analyze_dataset import KEY_METRICS, weakest_metric
+from helpers import random_agents, random_queries
+from parallel import map_rows, shard_ranges, top_k_batch_parallel
+from recommendation_model import RULES, recommend
+from similarity import encode_agents, top_k_batch
+
+
+# Agents with tying key metrics as well as tying similarity columns
+def random_agents_with_metrics(rows, seed):
+    data = random_agents(rows, seed)
+    generator = np.random.default_rng([seed, 1])
+    for metric in KEY_METRICS:
+        data[metric] = generator.choice([0.5, 0.7, 0.9], rows)
+    return data
+
+
+@pytest.fixture(autouse=True)
+def shard_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(parallel, 'SHARD_DIR', str(tmp_path))
+
+
+@pytest.mark.parametrize('rows, shards', [(0, 3), (1, 3), (5, 8), (10, 3), (1000, 7)])
+def test_shard_ranges_cover_rows(rows, shards):
+    ranges = shard_ranges(rows, shards)
+    assert ranges[0][0] == 0 and ranges[-1][1] == rows
+    assert all(stop == start for (_, stop), (start, _) in zip(ranges, ranges[1:]))
+    assert len(ranges) <= max(1, shards)
+
+
+@pytest.mark.parametrize('workers', [2, 3])
+def test_map_rows_matches_serial(workers, tmp_path):
+    data = random_agents_with_metrics(301, seed=workers)
+    data.index = data.index * 2 + 10
+    data['weakest_metric'] = weakest_metric(data)
+
+    serial = weakest_metric(data[KEY_METRICS])
+    sharded = map_rows(weakest_metric, data[KEY_METRICS], workers)
+    pd.testing.assert_series_equal(sharded, serial)
+
+    function = partial(recommend, rules=RULES)
+    serial = function(data)
+    sharded = map_rows(function, data, workers)
+    assert list(sharded) == list(serial)
+    assert list(sharded.categories) == list(serial.categories)
+    # The shard file is removed once the results are merged
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.parametrize('rows, k, workers', [(7, 5, 3), (300, 1, 2), (300, 5, 4), (300, 120, 3)])
+def test_top_k_batch_parallel_matches_serial(rows, k, workers):
+    encoded = encode_agents(random_agents(rows, seed=rows + k))
+    queries = random_queries(25, seed=k)
+    serial_positions, serial_scores = top_k_batch(encoded, queries, k)
+    positions, scores = top_k_batch_parallel(encoded, queries, k, workers)
+    np.testing.assert_array_equal(positions, serial_positions)
+    np.testing.assert_array_equal(scores, serial_scores)
@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+from pareto import _front_nd, pareto_front
+
+
+# Brute-force check of every pair of rows
+def reference_front(values):
+    dominated = np.all(values[:, None] <= values[None], axis=2) & np.any(values[:, None] < values[None], axis=2)
+    return ~dominated.any(axis=0)
+
+
+# Few distinct values per column, so many rows tie in some or all objectives
+@pytest.mark.parametrize('columns', [1, 2, 3, 4])
+def test_front_matches_pairwise_check(columns):
+    generator = np.random.default_rng(columns)
+    for _ in range(100):
+        rows = int(generator.integers(1, 120))
+        values = generator.integers(0, generator.integers(1, 6), (rows, columns)).astype(np.float64)
+        np.testing.assert_array_equal(pareto_front(values), reference_front(values))
+
+
+def test_front_3d_matches_skyline_on_continuous_values():
+    generator = np.random.default_rng(0)
+    x, y = generator.random(3000), generator.random(3000)
+    values = np.column_stack([x, y, 2 - x - y + generator.random(3000) * 0.05])
+    np.testing.assert_array_equal(pareto_front(values), _front_nd(values))
+
+
+# Every row is on the front and each one enters ahead of the rows kept so far
+def test_front_3d_of_a_long_staircase():
+    steps = np.arange(20000, dtype=np.float64)
+    assert pareto_front(np.column_stack([steps, -steps, steps])).all()
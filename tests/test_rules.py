@@ -0,0 +1,98 @@
+import operator
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from recommendation_model import RULES, recommend
+from rules import SEPARATOR, apply_rules
+
+METRICS = ['success_rate', 'accuracy_score', 'efficiency_score']
+OPERATORS = {'==': operator.eq, '!=': operator.ne, '<': operator.lt, '<=': operator.le,
+             '>': operator.gt, '>=': operator.ge}
+
+
+# Few distinct values and some missing ones, so many rows share a combination of fired rules
+def random_rows(rows, seed):
+    generator = np.random.default_rng(seed)
+    cost = generator.choice([0.01, 0.02, 0.03, 0.04], rows)
+    cost[generator.random(rows) < 0.1] = np.nan
+    return pd.DataFrame({
+        'weakest_metric': generator.choice(METRICS, rows),
+        'cost_per_task_cents': cost,
+        'autonomy_level': generator.integers(1, 6, rows),
+    })
+
+
+def random_condition(generator, depth=0):
+    kind = generator.integers(5) if depth < 2 else 0
+    if kind == 1:
+        return {'all': [random_condition(generator, depth + 1) for _ in range(generator.integers(1, 3))]}
+    if kind == 2:
+        return {'any': [random_condition(generator, depth + 1) for _ in range(generator.integers(1, 3))]}
+    if kind == 3:
+        return {'not': random_condition(generator, depth + 1)}
+    column = ['weakest_metric', 'cost_per_task_cents', 'autonomy_level'][generator.integers(3)]
+    if column == 'weakest_metric':
+        if generator.integers(2):
+            return {'column': column, 'op': 'in', 'value': list(generator.choice(METRICS, 2))}
+        return {'column': column, 'op': str(generator.choice(['==', '!='])), 'value': str(generator.choice(METRICS))}
+    value = float(generator.choice([0.01, 0.02, 0.03])) if column == 'cost_per_task_cents' else int(generator.integers(1, 6))
+    return {'column': column, 'op': str(generator.choice(list(OPERATORS))), 'value': value}
+
+
+def random_rules(count, seed):
+    generator = np.random.default_rng(seed)
+    return [{'when': random_condition(generator), 'text': f"Rule {number}"} for number in range(count)]
+
+
+# Evaluate a condition for one row, as a row-wise apply would
+def holds(condition, row):
+    if 'all' in condition:
+        return all(holds(part, row) for part in condition['all'])
+    if 'any' in condition:
+        return any(holds(part, row) for part in condition['any'])
+    if 'not' in condition:
+        return not holds(condition['not'], row)
+    value = row[condition['column']]
+    if pd.isna(value):
+        return False
+    if condition['op'] == 'in':
+        return value in condition['value']
+    return OPERATORS[condition['op']](value, condition['value'])
+
+
+def reference_apply(data, rules):
+    return data.apply(lambda row: SEPARATOR.join(rule['text'] for rule in rules if holds(rule['when'], row)), axis=1)
+
+
+# The per-row function the built-in rules replaced
+def recommend_improvements(row):
+    recommendations = []
+    if row['weakest_metric'] == 'success_rate':
+        recommendations.append("Focus on improving task-specific training.")
+    if row['weakest_metric'] == 'accuracy_score':
+        recommendations.append("Enhance data quality and model fine-tuning.")
+    if row['weakest_metric'] == 'efficiency_score':
+        recommendations.append("Optimize computational resources and algorithms.")
+    return ", ".join(recommendations)
+
+
+def test_builtin_rules_match_row_function():
+    data = random_rows(500, seed=0)
+    assert list(recommend(data, RULES)) == list(data.apply(recommend_improvements, axis=1))
+
+
+# 70 rules take the path for more than 64 rules, packed into several bytes per row
+@pytest.mark.parametrize('rows, count, seed', [(1, 3, 0), (300, 1, 1), (300, 8, 2), (300, 20, 3), (300, 70, 4)])
+def test_apply_rules_matches_row_wise_apply(rows, count, seed):
+    data = random_rows(rows, seed)
+    rules = random_rules(count, seed)
+    result = apply_rules(data, rules)
+    assert list(result) == list(reference_apply(data, rules))
+    assert list(result.categories) == sorted(result.categories)
+
+
+def test_apply_rules_without_rows_or_rules():
+    assert len(apply_rules(random_rows(0, seed=0), RULES)) == 0
+    assert list(apply_rules(random_rows(4, seed=0), [])) == [""] * 4
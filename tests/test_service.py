@@ -0,0 +1,60 @@
+import asyncio
+from http import HTTPStatus
+
+import pytest
+
+from gap_analysis import AGENT_FIELDS
+from llm_client import FakeBackend, LLMClient, ResponseCache
+from service import AdmissionControl, GapService, HTTPError, _read_request
+
+QUERY = {'task_complexity': '3', 'autonomy_level': '2', 'task_category': 'coding'}
+
+
+def read(raw):
+    async def run():
+        reader = asyncio.StreamReader()
+        reader.feed_data(raw)
+        reader.feed_eof()
+        return await _read_request(reader)
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize('length', [b'abc', b'-5', b'1.5'])
+def test_invalid_content_length_is_bad_request(length):
+    with pytest.raises(HTTPError) as error:
+        read(b'POST /similar HTTP/1.1\r\nContent-Length: ' + length + b'\r\n\r\n{}')
+    assert error.value.status == HTTPStatus.BAD_REQUEST
+
+
+def test_request_body_is_read():
+    assert read(b'POST /similar HTTP/1.1\r\nContent-Length: 2\r\n\r\n{}') == \
+        ('POST', '/similar', 'HTTP/1.1', {'content-length': '2'}, b'{}')
+
+
+# A service without a dataset: every query has one similar agent, of the
+# query's category, and research requests may not wait for a slot
+def service_without_data(tmp_path):
+    service = GapService.__new__(GapService)
+    service.client = LLMClient(FakeBackend("Try retrieval."), ResponseCache(str(tmp_path)))
+    service.admission = AdmissionControl(limit=1, queue=0)
+    service.similar_records = lambda query: [{field: query[field] if field == 'task_category' else 'value'
+                                              for field in AGENT_FIELDS}]
+    return service
+
+
+# With every slot taken, a cached answer is still served while a miss is rejected
+def test_research_cache_hit_needs_no_slot(tmp_path):
+    service = service_without_data(tmp_path)
+
+    async def run():
+        first = await service.research(QUERY)
+        await service.admission._slots.acquire()
+        cached = await service.research(QUERY)
+        with pytest.raises(HTTPError) as error:
+            await service.research({**QUERY, 'task_category': 'research'})
+        return first, cached, error.value.status
+
+    first, cached, status = asyncio.run(run())
+    assert first['research_suggestion'] == cached['research_suggestion'] == "Try retrieval."
+    assert status == HTTPStatus.SERVICE_UNAVAILABLE
+    assert service.client.stats == {'hits': 1, 'misses': 1, 'coalesced': 0}
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from helpers import random_agents, random_queries
+from similarity import BucketIndex, encode_agents, encode_queries, top_k, top_k_batch, top_k_encoded
+
+# The row-wise score and stable descending sort the vectorized versions replaced
+def reference_top_k(data, query, k):
+    def similarity(row):
+        score = -abs(int(row['task_complexity']) - int(query['task_complexity'])) * 2
+        score -= abs(int(row['autonomy_level']) - int(query['autonomy_level'])) * 2
+        score += 5 if str(row['task_category']) == str(query['task_category']) else 0
+        return score
+
+    scores = data.apply(similarity, axis=1)
+    ranked = scores.sort_values(ascending=False, kind='stable').head(k)
+    return ranked.index.to_numpy(), ranked.to_numpy()
+
+
+@pytest.mark.parametrize('rows, k', [(1, 5), (7, 5), (200, 1), (200, 5), (200, 50), (500, 500)])
+def test_top_k_matches_stable_sort(rows, k):
+    data = random_agents(rows, seed=rows + k)
+    encoded = encode_agents(data)
+    queries = random_queries(20, seed=k)
+    positions, scores = top_k_batch(encoded, queries, k)
+    encoded_positions, encoded_scores = top_k_encoded(encoded, *encode_queries(encoded, queries), k=k)
+    index = BucketIndex(data)
+    for number, query in enumerate(queries):
+        expected_positions, expected_scores = reference_top_k(data, query, k)
+        np.testing.assert_array_equal(positions[number], expected_positions)
+        np.testing.assert_array_equal(scores[number], expected_scores)
+        np.testing.assert_array_equal(encoded_positions[number], expected_positions)
+        np.testing.assert_array_equal(encoded_scores[number], expected_scores)
+        index_positions, index_scores = index.top_k(query, k)
+        np.testing.assert_array_equal(index_positions, expected_positions)
+        np.testing.assert_array_equal(index_scores, expected_scores)
+        single_positions, _ = top_k(encoded, query, k)
+        np.testing.assert_array_equal(single_positions, expected_positions)
+
+
+# Batches larger than one block are scored block by block
+def test_top_k_batch_across_blocks(monkeypatch):
+    monkeypatch.setattr('similarity.BLOCK_ELEMENTS', 300)
+    data = random_agents(100, seed=1)
+    queries = random_queries(10, seed=2)
+    positions, scores = top_k_batch(encode_agents(data), queries, k=8)
+    for number, query in enumerate(queries):
+        expected_positions, expected_scores = reference_top_k(data, query, 8)
+        np.testing.assert_array_equal(positions[number], expected_positions)
+        np.testing.assert_array_equal(scores[number], expected_scores)
+
+
+# An index extended part by part ranks like one built from all rows at once
+def test_extended_index_matches_stable_sort():
+    data = random_agents(300, seed=3)
+    index = BucketIndex(data.iloc[:100])
+    index.extend(data.iloc[100:250])
+    index.extend(data.iloc[250:])
+    for query in random_queries(20, seed=4):
+        expected_positions, expected_scores = reference_top_k(data, query, 30)
+        positions, scores = index.top_k(query, 30)
+        np.testing.assert_array_equal(positions, expected_positions)
+        np.testing.assert_array_equal(scores, expected_scores)
@@ -0,0 +1,59 @@
+import threading
+
+import pytest
+
+import storage
+
+
+# Threads writing the same file never see each other's temporary file
+def test_atomic_write_from_many_threads(tmp_path):
+    path = str(tmp_path / 'out' / 'state.json')
+    errors = []
+
+    def write(number):
+        try:
+            for _ in range(200):
+                with storage.atomic_write(path) as temporary, open(temporary, 'w', encoding='utf-8') as file:
+                    file.write(str(number))
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=write, args=(number,)) for number in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert open(path, encoding='utf-8').read() in {str(number) for number in range(8)}
+    assert [entry.name for entry in (tmp_path / 'out').iterdir()] == ['state.json']
+
+
+# A failed write leaves the previous file and no temporary file behind
+def test_atomic_write_keeps_old_file_on_error(tmp_path):
+    path = tmp_path / 'state.json'
+    path.write_text('old')
+    with pytest.raises(RuntimeError):
+        with storage.atomic_write(str(path)) as temporary:
+            open(temporary, 'w').write('partial')
+            raise RuntimeError()
+    assert path.read_text() == 'old'
+    assert [entry.name for entry in tmp_path.iterdir()] == ['state.json']
+
+
+# A converted file written under an earlier schema (float32 measurements) is
+# rebuilt even though it is newer than the CSV
+def test_convert_rebuilds_file_with_other_dtypes(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, 'CACHE_DIR', str(tmp_path / 'cache'))
+    source = tmp_path / 'agents.csv'
+    with open(storage.SOURCE_PATH, encoding='utf-8') as file:
+        source.write_text(''.join(file.readline() for _ in range(51)))
+    path = storage.convert(str(source))
+    assert str(storage.load_dataset(source=str(source))['memory_usage_mb'].dtype) == 'float64'
+
+    data = storage.load_dataset(source=str(source))
+    storage._write(data.astype({'memory_usage_mb': 'float32'}), path)
+    assert not storage._has_declared_types(path)
+    data = storage.load_dataset(source=str(source))
+    assert str(data['memory_usage_mb'].dtype) == 'float64'
+    assert str(data['success_rate'].dtype) == 'float32'
+    assert len(data) == 50
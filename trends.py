@@ -0,0 +1,198 @@
+import argparse
+import gzip
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+import metrics
+import storage
+from stats import ColumnStats, QuantileSketch
+
+TRENDS_PATH = os.path.join(storage.CACHE_DIR, "trends.json.gz")
+
+# Trends are kept per value of each of these columns
+GROUP_COLUMNS = ['model_architecture', 'agent_type']
+TREND_METRICS = ['success_rate', 'response_latency_ms', 'cost_per_task_cents']
+PERCENTILES = {'p50': 0.5, 'p90': 0.9}
+
+# Sketches of one window and group hold few values, so a small capacity keeps
+# the stored aggregates compact (rank error around 1%)
+SKETCH_CAPACITY = 256
+
+# Coarser tumbling windows, as pandas period frequencies
+FREQUENCIES = {'day': 'D', 'week': 'W', 'month': 'M'}
+
+# Bump when the layout of the stored aggregates changes, so they are rebuilt
+FORMAT_VERSION = 1
+
+
+# Mergeable aggregates of the trend metrics per day and group value. Days
+# are the smallest tumbling window: weeks, months and rolling windows are
+# merged from them, so queries cost in proportion to the number of windows,
+# not rows. New rows are added with update() without reading the old ones.
+class TrendAggregates:
+    def __init__(self):
+        # column -> group value -> 'YYYY-MM-DD' -> metric -> (ColumnStats, QuantileSketch)
+        self.cells = {column: {} for column in GROUP_COLUMNS}
+        self.rows = 0
+
+    def update(self, data):
+        if data.empty:
+            return self
+        days = data['timestamp'].dt.strftime('%Y-%m-%d').to_numpy()
+        values = {metric: data[metric].to_numpy(dtype=np.float64) for metric in TREND_METRICS}
+        for column in GROUP_COLUMNS:
+            groups = pd.DataFrame({'group': data[column].astype(str).to_numpy(), 'day': days})
+            for (group, day), rows in groups.groupby(['group', 'day'], sort=False).indices.items():
+                cell = self.cells[column].setdefault(group, {}).setdefault(day, {})
+                for metric in TREND_METRICS:
+                    batch = values[metric][rows]
+                    if metric in cell:
+                        column_stats, sketch = cell[metric]
+                        cell[metric] = (column_stats.merge(ColumnStats.of(batch)), sketch.update(batch))
+                    else:
+                        cell[metric] = (ColumnStats.of(batch), QuantileSketch(SKETCH_CAPACITY).update(batch))
+        self.rows += len(data)
+        return self
+
+    def groups(self, column):
+        return sorted(self.cells[column])
+
+    # Days with data, over all groups
+    def days(self):
+        return sorted({day for groups in self.cells.values() for days in groups.values() for day in days})
+
+    # Aggregates of one metric per window and group value, as rows of window
+    # start, group, count, mean, std and PERCENTILES. Windows are tumbling
+    # days, weeks or months, or with `rolling` the trailing number of days
+    # ending on every calendar day of the data.
+    def series(self, column, metric, frequency='day', rolling=None, groups=None):
+        records = []
+        days = self.days()
+        calendar = pd.date_range(days[0], days[-1], freq='D') if days and rolling else None
+        for group in groups or self.groups(column):
+            cells = self.cells[column].get(group, {})
+            for window, window_days in self._windows(cells, frequency, rolling, calendar):
+                present = [cells[day][metric] for day in window_days if day in cells]
+                if not present:
+                    continue
+                column_stats, sketch = present[0][0], QuantileSketch(SKETCH_CAPACITY).merge(present[0][1])
+                for other_stats, other_sketch in present[1:]:
+                    column_stats = column_stats.merge(other_stats)
+                    sketch.merge(other_sketch)
+                record = {'window': window, 'group': group, 'count': column_stats.count,
+                          'mean': column_stats.mean, 'std': column_stats.std}
+                record.update(zip(PERCENTILES, sketch.quantiles(PERCENTILES.values())))
+                records.append(record)
+        return pd.DataFrame(records, columns=['window', 'group', 'count', 'mean', 'std'] + list(PERCENTILES))
+
+    # (window start, days of the window) pairs covering the given days;
+    # rolling windows end on every day of the calendar
+    @staticmethod
+    def _windows(cells, frequency, rolling, calendar=None):
+        if not cells:
+            return []
+        if rolling:
+            days = calendar.strftime('%Y-%m-%d').tolist()
+            starts = (calendar - pd.Timedelta(days=rolling - 1)).strftime('%Y-%m-%d').tolist()
+            # Days of data in a sliding range, found with two pointers over the sorted days
+            sorted_days = sorted(cells)
+            windows, first, last = [], 0, 0
+            for day, start in zip(days, starts):
+                while last < len(sorted_days) and sorted_days[last] <= day:
+                    last += 1
+                while first < last and sorted_days[first] < start:
+                    first += 1
+                windows.append((pd.Timestamp(day), sorted_days[first:last]))
+            return windows
+        windows = {}
+        for day in sorted(cells):
+            windows.setdefault(pd.Period(day, FREQUENCIES[frequency]).start_time, []).append(day)
+        return list(windows.items())
+
+    def to_dict(self):
+        return {
+            'rows': self.rows,
+            'cells': {column: {group: {day: {metric: [column_stats.to_dict(), sketch.to_dict()]
+                                             for metric, (column_stats, sketch) in cell.items()}
+                                       for day, cell in days.items()}
+                               for group, days in groups.items()}
+                      for column, groups in self.cells.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, values):
+        aggregates = cls()
+        aggregates.rows = values['rows']
+        for column, groups in values['cells'].items():
+            aggregates.cells[column] = {
+                group: {day: {metric: (ColumnStats.from_dict(column_stats), QuantileSketch.from_dict(sketch))
+                              for metric, (column_stats, sketch) in cell.items()}
+                        for day, cell in days.items()}
+                for group, days in groups.items()
+            }
+        return aggregates
+
+
+def _base_file(parts):
+    stat = os.stat(parts[0]['path'])
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def save(aggregates, parts, path=TRENDS_PATH):
+    with storage.atomic_write(path) as tmp_path, gzip.open(tmp_path, 'wt', encoding='utf-8') as file:
+        json.dump({'format': FORMAT_VERSION, 'parts': parts, 'base': _base_file(parts),
+                   'aggregates': aggregates.to_dict()}, file, separators=(',', ':'))
+
+
+# The stored aggregates, or None if they are missing or unreadable
+def load(path=TRENDS_PATH):
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, EOFError, ValueError):
+        return None
+
+
+# Aggregates of the stored dataset. Only dataset parts appended since the
+# stored aggregates were saved are read; a replaced dataset is read in full.
+def refresh(source=storage.SOURCE_PATH, path=TRENDS_PATH, force=False):
+    parts = storage.table_parts(storage.convert(source))
+    stored = None if force else load(path)
+    if (stored is not None and stored['format'] == FORMAT_VERSION and stored['base'] == _base_file(parts)
+            and stored['parts'] == parts[:len(stored['parts'])]):
+        aggregates = TrendAggregates.from_dict(stored['aggregates'])
+        new_parts = parts[len(stored['parts']):]
+        if not new_parts:
+            metrics.increment('trend_refresh_total', result='current')
+            return aggregates
+        metrics.increment('trend_refresh_total', result='append')
+    else:
+        aggregates, new_parts = TrendAggregates(), parts
+        metrics.increment('trend_refresh_total', result='rebuild')
+    columns = ['timestamp'] + GROUP_COLUMNS + TREND_METRICS
+    with metrics.span('trends.update'):
+        aggregates.update(storage.read_parts([part['path'] for part in new_parts], columns))
+    save(aggregates, parts, path)
+    return aggregates
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Update the time-windowed trend aggregates and show one trend")
+    parser.add_argument("--source", default=storage.SOURCE_PATH, help="dataset CSV")
+    parser.add_argument("--force", action="store_true", help="rebuild from all rows")
+    parser.add_argument("--column", choices=GROUP_COLUMNS, default=GROUP_COLUMNS[0])
+    parser.add_argument("--metric", choices=TREND_METRICS, default=TREND_METRICS[0])
+    parser.add_argument("--statistic", choices=['count', 'mean', 'std'] + list(PERCENTILES), default='mean')
+    parser.add_argument("--frequency", choices=list(FREQUENCIES), default='month')
+    parser.add_argument("--rolling", type=int, help="trailing days per window instead of tumbling windows")
+    args = parser.parse_args()
+    metrics.profile_script('trends')
+
+    aggregates = refresh(args.source, force=args.force)
+    trend = aggregates.series(args.column, args.metric, args.frequency, args.rolling)
+    print(f"{aggregates.rows} rows aggregated into {len(aggregates.days())} days at {TRENDS_PATH}\n")
+    print(f"{args.statistic} of {args.metric} by {args.column}:")
+    print(trend.pivot(index='window', columns='group', values=args.statistic).to_string())